@@ -0,0 +1,125 @@
+#!/usr/bin/python
+
+from mininet.log import info
+
+from bringup import BatchIntf, BatchLink
+
+# Bottleneck queue disciplines. tbf is TCLink's tbf shaper in front of a
+# netem FIFO of max_queue_size packets; fq_codel, pie and red sit under an
+# htb shaper, and cake shapes by itself.
+AQMS = ('tbf', 'fq_codel', 'cake', 'pie', 'red')
+
+# max_queue_size (packets) of the tbf FIFO when no limit is given
+TBF_LIMIT = 17
+
+# red options that are not given, the ones TCLink uses with enable_red
+RED_DEFAULTS = {'limit': 1000000, 'min': 30000, 'max': 35000, 'avpkt': 1500, 'burst': 20, 'probability': 1}
+
+# In front of an AQM netem only delays; its limit (which counts the packets
+# queued below it too) must never be what drops
+NETEM_LIMIT = 100000
+
+# TCLink parameters that describe the qdiscs, replaced by the AQM tree
+_SHAPING = ('bw', 'delay', 'jitter', 'loss', 'max_queue_size', 'speedup', 'use_hfsc', 'use_tbf',
+            'latency_ms', 'enable_ecn', 'enable_red')
+
+def parse_aqm(spec):
+    """'kind[:option=value,flag,...]' -> (kind, {option: value, flag: None}).
+
+    Options are passed to tc as they are, e.g.
+    'fq_codel:target=5ms,interval=100ms,limit=1000', 'pie:target=15ms,ecn'
+    or 'cake:rtt=20ms,flows'. For tbf, `limit` is the FIFO size in packets.
+    """
+    kind, _, rest = spec.partition(':')
+    if kind not in AQMS:
+        raise ValueError(f"unknown queue discipline '{kind}', expected one of {AQMS}")
+    options = {}
+    for item in filter(None, rest.split(',')):
+        name, sep, value = item.partition('=')
+        options[name.strip()] = value.strip() if sep else None
+    if kind == 'tbf' and set(options) - {'limit'}:
+        raise ValueError(f"tbf only takes a limit, got {spec}")
+    return kind, options
+
+def aqm_params(spec):
+    """TCLink parameters selecting `spec` on an AQMLink ({} for None: TCLink's own qdiscs).
+
+    All parameters that differ between the disciplines are set, so the
+    result can be passed to ExperimentSession.configure_link() to switch
+    a link from one to another.
+    """
+    if spec is None:
+        return {}
+    kind, options = parse_aqm(spec)
+    if kind == 'tbf':
+        return {'aqm': None, 'use_tbf': True, 'max_queue_size': int(options.get('limit', TBF_LIMIT))}
+    return {'aqm': spec}
+
+def aqm_commands(intf, spec, bw=None, delay=None, jitter=None, loss=None, verb='add'):
+    """tc lines (without 'tc') building the qdiscs of `spec` on `intf`, or changing them with verb='change'.
+
+    netem (10:, for delay, jitter and loss) is the root, so packets are
+    delayed before they queue; the shaper (htb 5: with class 5:1) and the
+    AQM (6:) are below it. delay and jitter take TCLink's strings ('10ms').
+    Changes leave out the htb qdisc itself and fq_codel and pie, whose
+    options do not depend on the link's parameters.
+    """
+    kind, options = parse_aqm(spec)
+    lines, parent = [], 'root'
+    if delay is not None or jitter or loss:
+        netem = ('delay %s ' % delay if delay is not None else '') + ('%s ' % jitter if jitter else '') \
+            + ('loss %.5f ' % loss if loss else '') + 'limit %d' % NETEM_LIMIT
+        lines.append(f'qdisc {verb} dev {intf} root handle 10: netem {netem}')
+        parent = 'parent 10:1'
+
+    options = dict(options)
+    if kind == 'cake':
+        # The link's rate goes first, as cake parses its options in order
+        options = dict({'bandwidth': f'{bw:f}Mbit'} if bw else {'unlimited': None}, **options)
+    elif bw:
+        if verb != 'change':
+            lines.append(f'qdisc {verb} dev {intf} {parent} handle 5: htb default 1')
+        lines.append(f'class {verb} dev {intf} parent 5: classid 5:1 htb rate {bw:f}Mbit burst 15k')
+        parent = 'parent 5:1'
+    if kind == 'red':
+        options = dict(RED_DEFAULTS, **options)
+        if bw:
+            options['bandwidth'] = f'{bw:f}mbit'
+    if verb == 'change' and kind in ('fq_codel', 'pie'):
+        return lines
+    leaf = ' '.join(name if value is None else f'{name} {value}' for name, value in options.items())
+    lines.append(f'qdisc {verb} dev {intf} {parent} handle 6: {kind} {leaf}'.rstrip())
+    return lines
+
+class AQMIntf(BatchIntf):
+    """TCIntf that installs an AQM tree (aqm_commands()) when the `aqm` parameter is set.
+
+    Without it, it is a BatchIntf: TCLink's qdiscs, batched while a
+    BatchMininet bring-up batch is open. TCLink's bw, delay, jitter and
+    loss keep their meaning; the tbf, hfsc, red and max_queue_size options
+    do not apply to an AQM tree.
+    """
+
+    def config(self, aqm=None, **params):
+        if not aqm:
+            return super().config(**params)
+        shaping = {name: params.pop(name, None) for name in _SHAPING}
+        result = super().config(**params) or {}
+
+        # Clear existing configuration, as TCIntf does
+        tcoutput = self.cmd(f'tc qdisc show dev {self}')
+        cmds = [] if 'priomap' in tcoutput or 'noqueue' in tcoutput else [f'qdisc del dev {self} root']
+        cmds += aqm_commands(self, aqm, shaping['bw'], shaping['delay'], shaping['jitter'], shaping['loss'])
+        info(f'({aqm}) ')
+        result['tcoutputs'] = [self.cmd(f'tc {cmd}') for cmd in cmds]
+        # tc prints nothing on success; a missing qdisc module would otherwise leave htb's
+        # default leaf in place and results labelled with the wrong discipline
+        for cmd, output in zip(cmds, result['tcoutputs']):
+            if output.strip():
+                raise RuntimeError(f"{self}: tc {cmd}: {output.strip()}")
+        return result
+
+class AQMLink(BatchLink):
+    """BatchLink (and so TCLink outside a batch) that takes an `aqm` parameter, see aqm_params()."""
+
+    intf = AQMIntf
@@ -0,0 +1,168 @@
+#!/usr/bin/python
+
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from subprocess import PIPE, STDOUT
+
+from mininet.net import Mininet
+from mininet.link import Link, TCIntf
+from mininet.util import ipAdd, macColonHex
+
+# Commands recorded while a batch is open, or None
+_batch = None
+
+class _Batch:
+    def __init__(self):
+        self.pairs = []      # (intf1, intf2, addr1, addr2, node1, node2)
+        self.commands = {}   # node: [shell command, ...]
+        self.created = set()
+
+    def record(self, node, command):
+        self.commands.setdefault(node, []).append(command)
+
+    def flush(self):
+        """Create the recorded veth pairs, then run every node's commands, all nodes in parallel."""
+        if self.pairs:
+            lines = []
+            for intf1, intf2, addr1, addr2, node1, node2 in self.pairs:
+                lines.append(f'link add name {intf1}' + (f' address {addr1}' if addr1 else '')
+                             + f' netns {node1.pid} type veth peer name {intf2}'
+                             + (f' address {addr2}' if addr2 else '') + f' netns {node2.pid}')
+            result = subprocess.run(['ip', '-batch', '-'], input='\n'.join(lines) + '\n',
+                                    stdout=PIPE, stderr=STDOUT, universal_newlines=True)
+            if result.returncode != 0:
+                raise Exception(f"Error creating {len(self.pairs)} interface pairs: {result.stdout}")
+            self.pairs = []
+
+        procs = {}
+        for node, commands in self.commands.items():
+            tc = [c[len('tc '):] for c in commands if c.startswith('tc ')]
+            script = '\n'.join(c for c in commands if not c.startswith('tc '))
+            if tc:
+                script += "\ntc -force -batch - <<'EOF'\n" + '\n'.join(tc) + '\nEOF\n'
+            procs[node] = node.popen(['sh', '-c', script], stdout=PIPE, stderr=STDOUT)
+        self.commands = {}
+        self.created = set()
+
+        failed = {}
+        for node, proc in procs.items():
+            output = proc.communicate()[0].decode()
+            if proc.returncode != 0:
+                failed[node.name] = output
+        return failed
+
+class BatchIntf(TCIntf):
+    """TCIntf whose configuration commands are batched while a bring-up batch is open.
+
+    Mininet configures every interface through a few shell round-trips
+    to its node (ifconfig, ethtool, one `tc` per qdisc), one interface at a
+    time. Inside BatchMininet.batched() those commands are recorded
+    instead and run per node in one shell, with all `tc` lines in one
+    `tc -batch`, for all nodes at once. Outside a batch it is a TCIntf.
+    """
+
+    def cmd(self, *args, **kwargs):
+        if _batch is None:
+            return super().cmd(*args, **kwargs)
+        command = ' '.join(str(arg) for arg in args)
+        if command.startswith('tc ') and ' qdisc show ' in command:
+            # Read back to decide whether a root qdisc must be deleted first;
+            # a veth created in this batch has none
+            return 'noqueue' if self.name in _batch.created else ''
+        _batch.record(self.node, command)
+        return ''
+
+class BatchLink(Link):
+    """TCLink (same parameters) whose veth pair creation and shaping are batched."""
+
+    # Interface class of both ends
+    intf = BatchIntf
+
+    def __init__(self, node1, node2, port1=None, port2=None, intfName1=None, intfName2=None,
+                 addr1=None, addr2=None, **params):
+        Link.__init__(self, node1, node2, port1=port1, port2=port2,
+                      intfName1=intfName1, intfName2=intfName2,
+                      cls1=self.intf, cls2=self.intf,
+                      addr1=addr1, addr2=addr2,
+                      params1=params, params2=params)
+
+    @classmethod
+    def makeIntfPair(cls, intfname1, intfname2, addr1=None, addr2=None,
+                     node1=None, node2=None, deleteIntfs=True):
+        if _batch is None or node1 is None or node2 is None:
+            return Link.makeIntfPair(intfname1, intfname2, addr1, addr2, node1, node2,
+                                     deleteIntfs=deleteIntfs)
+        _batch.pairs.append((intfname1, intfname2, addr1, addr2, node1, node2))
+        _batch.created.update((intfname1, intfname2))
+        return None
+
+class BatchMininet(Mininet):
+    """Mininet whose bring-up runs in parallel where Mininet runs it serially.
+
+    Host shells are started from a thread pool. Veth pairs are created in
+    one `ip -batch` in the root namespace, and interface addressing and
+    qdisc installation (BatchIntf) run as one batch per node, all nodes
+    concurrently, during build() and again for the qdiscs that OVS
+    switches reapply in start(). Use it with link=BatchLink.
+    """
+
+    def __init__(self, *args, workers=32, **params):
+        self.workers = workers
+        self.failed = {}
+        params.setdefault('link', BatchLink)
+        super().__init__(*args, **params)
+
+    @contextmanager
+    def batched(self):
+        """Record interface commands inside the block and run them in parallel at its end."""
+        global _batch
+        if _batch is not None:
+            yield
+            return
+        _batch = _Batch()
+        try:
+            yield
+            batch = _batch
+        finally:
+            _batch = None
+        failed = batch.flush()
+        for name, output in failed.items():
+            print(f"WARNING: interface setup failed on {name}:\n{output}")
+        self.failed.update(failed)
+
+    def addHost(self, name, cls=None, **params):
+        # Hosts started ahead by buildFromTopo()
+        if name in self.nameToNode:
+            return self.nameToNode[name]
+        return super().addHost(name, cls, **params)
+
+    def buildFromTopo(self, topo=None):
+        # Start all host shells concurrently, with the addresses Mininet would give them
+        names = topo.hosts()
+        hosts = []
+        for i, name in enumerate(names):
+            params = dict(topo.nodeInfo(name))
+            params.setdefault('ip', ipAdd(self.nextIP + i, ipBaseNum=self.ipBaseNum,
+                                          prefixLen=self.prefixLen) + '/%s' % self.prefixLen)
+            if self.autoSetMacs:
+                params.setdefault('mac', macColonHex(self.nextIP + i))
+            hosts.append((name, params.pop('cls', None) or self.host, params))
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            nodes = list(pool.map(lambda host: host[1](host[0], **host[2]), hosts))
+        for node in nodes:
+            self.hosts.append(node)
+            self.nameToNode[node.name] = node
+        self.nextIP += len(names)
+        super().buildFromTopo(topo)
+
+    def build(self):
+        with self.batched():
+            super().build()
+
+    def start(self):
+        # The veth pairs must exist before the switches add them as ports
+        if not self.built:
+            self.build()
+        with self.batched():
+            super().start()
@@ -0,0 +1,240 @@
+#!/usr/bin/python
+
+import glob
+import os
+import re
+import signal
+import subprocess
+import sys
+import time
+
+from run_metadata import read_metadata, write_metadata
+
+# Ethernet + IPv4 + TCP with options; the analyzers take payload sizes from the IP header
+SNAPLEN = 128
+
+# Kernel capture buffer (KiB)
+BUFFER_KIB = 8192
+
+_STATS = re.compile(r'(\d+) packets? (captured|received by filter|dropped by kernel|dropped by interface)')
+_STAT_NAMES = {'captured': 'captured', 'received by filter': 'received',
+               'dropped by kernel': 'dropped_kernel', 'dropped by interface': 'dropped_interface'}
+
+class Capture:
+    """tcpdump on one interface that keeps headers only and bounds its files.
+
+    The capture is written to `<prefix>.pcap`, and with `segment_mb`
+    (millions of bytes) and/or `segment_seconds` rotated into segments;
+    `ring` keeps only the last N segments of a size-rotated capture with
+    compress=False.
+    `direction` ('in' or 'out') restricts it to one direction.
+    tcpdump gzips every finished segment in the background (`-z`), and
+    stop() compresses the last one. segments() lists the files in capture
+    order for pcap_analyzer.analyze() or PcapReader, which read `.gz`
+    segments directly. The packet and drop counters tcpdump prints on exit
+    are returned by stop() and can be stored in run metadata with
+    record().
+    """
+
+    def __init__(self, procs, node, intf, prefix, snaplen=SNAPLEN, segment_mb=None,
+                 segment_seconds=None, ring=None, compress=True, expression='',
+                 direction=None, buffer_kib=BUFFER_KIB, name=None):
+        self.procs = procs
+        self.node = node
+        self.intf = intf
+        self.prefix = prefix
+        self.snaplen = snaplen
+        self.segment_mb = segment_mb
+        self.segment_seconds = segment_seconds
+        self.ring = ring
+        self.compress = compress
+        self.expression = expression
+        self.direction = direction
+        self.buffer_kib = buffer_kib
+        self.name = name or f'{node.name}-{intf}'
+        self.log_file = prefix + '.log'
+        self.proc = None
+        self.stats = None
+        self.cpu_seconds = None
+
+    def command(self):
+        # Time-rotated file names must be strftime patterns
+        path = self.prefix + ('-%Y%m%d-%H%M%S.pcap' if self.segment_seconds else '.pcap')
+        # -Z root: tcpdump would otherwise drop privileges and fail to open the next segment
+        cmd = f'tcpdump -i {self.intf} -n -s {self.snaplen} -B {self.buffer_kib} -Z root -w {path}'
+        if self.direction:
+            cmd += f' -Q {self.direction}'
+        if self.segment_mb:
+            cmd += f' -C {self.segment_mb}'
+        if self.segment_seconds:
+            cmd += f' -G {self.segment_seconds}'
+        if self.ring:
+            if self.segment_seconds:
+                raise ValueError("ring is only supported for size-rotated captures")
+            if self.compress:
+                # tcpdump reuses the segment names, and gzip will not replace the old .gz
+                raise ValueError("ring is only supported for uncompressed captures (compress=False)")
+            cmd += f' -W {self.ring}'
+        if self.compress and (self.segment_mb or self.segment_seconds):
+            cmd += ' -z gzip'
+        if self.expression:
+            cmd += f' {self.expression}'
+        return cmd
+
+    def start(self, timeout=5.0):
+        """Start tcpdump and return once it is capturing."""
+        os.makedirs(os.path.dirname(self.prefix) or '.', exist_ok=True)
+        for path in self.segments():
+            os.remove(path)
+        self.proc = self.procs.start(self.node, self.command(), self.log_file, name='tcpdump')
+        deadline = time.monotonic() + timeout
+        while 'listening on' not in self._log():
+            if not self.proc.running() or time.monotonic() > deadline:
+                raise RuntimeError(f"capture on {self.node.name}:{self.intf} did not start, see {self.log_file}")
+            time.sleep(0.01)
+        return self
+
+    def _log(self):
+        with open(self.log_file) as f:
+            return f.read()
+
+    def _cpu_seconds(self):
+        # utime, stime and those of reaped children (the gzip runs); fields after the command name
+        with open(f'/proc/{self.proc.pid}/stat') as f:
+            fields = f.read().rsplit(')', 1)[1].split()
+        return sum(int(v) for v in fields[11:15]) / os.sysconf('SC_CLK_TCK')
+
+    def stop(self, compress=True):
+        """Stop tcpdump, compress the last segment and return its packet and drop counters."""
+        if self.proc is None:
+            return self.stats
+        try:
+            self.cpu_seconds = self._cpu_seconds()
+        except (OSError, IndexError):
+            pass
+        # SIGINT makes tcpdump flush its buffer and print its statistics
+        self.procs.stop(signal.SIGINT, pid=self.proc.pid)
+        self.proc = None
+        self.stats = {name: 0 for name in _STAT_NAMES.values()}
+        for count, what in _STATS.findall(self._log()):
+            self.stats[_STAT_NAMES[what]] = int(count)
+        if compress and self.compress and (self.segment_mb or self.segment_seconds):
+            # tcpdump leaves the segment open at exit (or one whose gzip it interrupted)
+            pending = [path for path in self.segments() if not path.endswith('.gz')]
+            if pending:
+                subprocess.run(['gzip', '-f'] + pending)
+        return self.stats
+
+    def segments(self):
+        """Capture files in the order they were written."""
+        prefix = glob.escape(self.prefix)
+        paths = [path for path in glob.glob(prefix + '.pcap*') + glob.glob(prefix + '-*.pcap*')
+                 if os.path.getsize(path) > 0]
+        return sorted(paths, key=lambda path: (os.path.getmtime(path), path))
+
+    def disk_bytes(self):
+        return sum(os.path.getsize(path) for path in self.segments())
+
+    def summary(self):
+        summary = dict(self.stats or {}, interface=f'{self.node.name}:{self.intf}', snaplen=self.snaplen,
+                       segments=len(self.segments()), disk_bytes=self.disk_bytes())
+        if self.cpu_seconds is not None:
+            summary['cpu_seconds'] = round(self.cpu_seconds, 3)
+        return summary
+
+    def record(self, run_dir):
+        """Add this capture's counters to the 'captures' field of the run metadata."""
+        captures = read_metadata(run_dir).get('captures', {})
+        captures[self.name] = self.summary()
+        write_metadata(run_dir, captures=captures)
+        if self.stats and (self.stats['dropped_kernel'] or self.stats['dropped_interface']):
+            print(f"WARNING: capture {self.name} dropped {self.stats['dropped_kernel']} packets in the kernel "
+                  f"and {self.stats['dropped_interface']} at the interface")
+
+# Capture modes compared by the benchmark: (snaplen, segment_mb, compress), None for no capture
+BENCH_MODES = {
+    'none': None,
+    'full': (65535, None, False),
+    'headers': (SNAPLEN, 100, True),
+}
+
+def capture_overhead(session, rate, mode, duration, out_dir):
+    """Throughput of one h1 -> h2 transfer at `rate` Mbps (None: unshaped) with the capture `mode` on h2."""
+    from iperf_stream import run_client
+    from launcher import start_server
+
+    session.configure_link('h1', 'h2', bw=rate)
+    with session.trial() as net:
+        h1, h2 = net.get('h1', 'h2')
+        start_server(h2, 'iperf3 -s -p 5201', 5201, supervisor=session.procs)
+        capture = None
+        if BENCH_MODES[mode]:
+            snaplen, segment_mb, compress = BENCH_MODES[mode]
+            capture = Capture(session.procs, h2, h2.defaultIntf().name,
+                              os.path.join(out_dir, f'{rate or "unshaped"}-{mode}'),
+                              snaplen=snaplen, segment_mb=segment_mb, compress=compress)
+            capture.start()
+        try:
+            client = run_client(h1, f'iperf3 -c {h2.IP()} -p 5201 -t {duration}', session.procs,
+                                timeout=duration + 10)
+        finally:
+            if capture:
+                capture.stop()
+        row = {'rate': rate, 'mode': mode, 'mbps': client.summary()['mbps'],
+               'retransmits': client.summary()['retransmits']}
+        if capture:
+            row.update(capture.summary())
+        return row
+
+def benchmark(rates, modes, duration, out_dir):
+    from mininet.topo import Topo
+    from mininet.link import TCLink
+    from session import ExperimentSession
+
+    topo = Topo()
+    topo.addLink(topo.addHost('h1'), topo.addHost('h2'), cls=TCLink)
+    rows = []
+    print('%10s %-8s %9s %8s %10s %10s %9s' % ('rate', 'mode', 'Mbps', 'CPU (s)', 'disk (MB)', 'captured', 'dropped'))
+    with ExperimentSession(topo) as session:
+        for rate in rates:
+            for mode in modes:
+                row = capture_overhead(session, rate, mode, duration, out_dir)
+                rows.append(row)
+                print('%10s %-8s %9.1f %8.2f %10.1f %10d %9d' % (
+                    rate or 'unshaped', mode, row['mbps'], row.get('cpu_seconds', 0),
+                    row.get('disk_bytes', 0) / 1e6, row.get('captured', 0),
+                    row.get('dropped_kernel', 0) + row.get('dropped_interface', 0)))
+    return rows
+
+def parse_args(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(description='Capture overhead of full and header-only rotating captures')
+    parser.add_argument('--rates', nargs='+', default=['100', '1000', 'unshaped'],
+                        help="link rates (Mbps, or 'unshaped' for the bare veth)")
+    parser.add_argument('--modes', nargs='+', default=list(BENCH_MODES), choices=list(BENCH_MODES))
+    parser.add_argument('--duration', type=int, default=10, help='seconds per transfer')
+    parser.add_argument('--dir', default='capture_bench', help='directory for the capture files')
+    parser.add_argument('--out', help='write the results to this CSV file')
+    return parser.parse_args(argv)
+
+def main():
+    import csv
+    args = parse_args()
+    rates = [None if rate == 'unshaped' else float(rate) for rate in args.rates]
+    rows = benchmark(rates, args.modes, args.duration, args.dir)
+    if args.out:
+        fields = ['rate', 'mode', 'mbps', 'retransmits', 'cpu_seconds', 'disk_bytes', 'segments',
+                  'captured', 'received', 'dropped_kernel', 'dropped_interface']
+        with open(args.out, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fields, extrasaction='ignore')
+            writer.writeheader()
+            writer.writerows(rows)
+
+if __name__ == '__main__':
+    if os.geteuid() != 0:
+        print("This script must be run as root.")
+        print("Please run with: sudo python %s" % sys.argv[0])
+        sys.exit(1)
+    from mininet.log import setLogLevel
+    setLogLevel('warning')
+    main()
@@ -0,0 +1,175 @@
+#!/usr/bin/python
+
+import abc
+import math
+import os
+import threading
+import time
+
+# Column order of the counters in /proc/net/dev
+FIELDS = ('rx_bytes', 'rx_packets', 'rx_errs', 'rx_drop', 'rx_fifo', 'rx_frame',
+          'rx_compressed', 'rx_multicast', 'tx_bytes', 'tx_packets', 'tx_errs',
+          'tx_drop', 'tx_fifo', 'tx_colls', 'tx_carrier', 'tx_compressed')
+
+class NodeCounters:
+    """Persistent counter handle for the network namespace of one node.
+
+    /proc/<pid>/net/dev reflects the namespace of <pid>, so the node's
+    interface counters can be read without a round-trip through its shell.
+    """
+
+    def __init__(self, node, intfs=None):
+        self.node = node
+        if intfs is None:
+            intfs = [name for name in node.intfNames() if name != 'lo']
+        self.intfs = list(intfs)
+        self.fd = os.open('/proc/%d/net/dev' % node.pid, os.O_RDONLY)
+
+    def read(self):
+        """Return {intf: tuple of counters in FIELDS order} for the tracked interfaces."""
+        data = os.pread(self.fd, 65536, 0).decode()
+        counters = {}
+        for line in data.splitlines()[2:]:
+            name, _, values = line.partition(':')
+            name = name.strip()
+            if name in self.intfs:
+                counters[name] = tuple(int(v) for v in values.split())
+        return counters
+
+    def close(self):
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+
+class PeriodicSampler(abc.ABC):
+    """Call sample(t) on a phase-locked monotonic schedule.
+
+    Tick k is due at t0 + k * interval. A late tick does not shift the ones
+    after it; ticks that are missed entirely are counted in `missed`.
+    t is the monotonic time of the tick's read relative to t0, so samplers
+    started with the same t0 produce aligned series.
+
+    If sample() raises in the background thread started by start(), the
+    thread ends with the exception, which stop() then re-raises as a
+    RuntimeError.
+    """
+
+    def __init__(self, interval=0.1):
+        self.interval = interval
+        self.t0 = None
+        self.samples = 0
+        self.missed = 0
+        self.error = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    @abc.abstractmethod
+    def sample(self, t):
+        """Take one sample; t is seconds since t0."""
+
+    def run(self, duration=None, t0=None):
+        """Sample in the calling thread until stop() or `duration` seconds after t0.
+
+        Pass a shared t0 (time.monotonic() based) to align samples with other
+        recorders; otherwise the schedule starts now.
+        """
+        interval = self.interval
+        if t0 is None:
+            t0 = time.monotonic()
+        self.t0 = t0
+        # Join the schedule at the next tick if t0 has already passed
+        tick = max(0, math.ceil((time.monotonic() - t0) / interval))
+        self._stop.wait(max(0.0, t0 + tick * interval - time.monotonic()))
+        while not self._stop.is_set():
+            self.sample(time.monotonic() - t0)
+            self.samples += 1
+
+            tick += 1
+            due = t0 + tick * interval
+            if duration is not None and due - t0 > duration + 1e-9:
+                break
+            now = time.monotonic()
+            if now >= due:
+                # Overran one or more ticks: skip them to stay phase-locked
+                skipped = int((now - due) / interval) + 1
+                self.missed += skipped
+                tick += skipped
+                due = t0 + tick * interval
+            self._stop.wait(due - now)
+
+    def _run_thread(self, duration, t0):
+        try:
+            self.run(duration, t0)
+        except BaseException as e:
+            # Kept for stop(); re-raised so the thread's traceback is printed right away
+            self.error = e
+            raise
+
+    def start(self, duration=None, t0=None):
+        self._stop.clear()
+        self.error = None
+        self._thread = threading.Thread(target=self._run_thread, args=(duration, t0))
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if self.error is not None:
+            error, self.error = self.error, None
+            raise RuntimeError(f"{type(self).__name__} failed after {self.samples} samples: {error!r}") from error
+
+class CounterSampler(PeriodicSampler):
+    """Sample interface counters of every node on a phase-locked monotonic schedule.
+
+    Each sample is passed to `callback(t, values)` where t is the monotonic
+    read time relative to t0 and values is aligned with `columns`.
+    """
+
+    def __init__(self, net, interval=0.1, nodes=None, intfs=None,
+                 fields=('rx_bytes', 'tx_bytes'), callback=None):
+        super().__init__(interval)
+        if nodes is None:
+            nodes = [node.name for node in net.hosts + net.switches]
+        self.fields = tuple(fields)
+        self.callback = callback
+        self.handles = []
+        for name in nodes:
+            node = net.get(name)
+            node_intfs = None
+            if intfs is not None:
+                node_intfs = [i for i in intfs if i in node.intfNames()]
+                if not node_intfs:
+                    continue
+            self.handles.append(NodeCounters(node, node_intfs))
+
+        self._index = [FIELDS.index(field) for field in self.fields]
+        self.columns = ['%s.%s' % (intf, field)
+                        for handle in self.handles
+                        for intf in handle.intfs
+                        for field in self.fields]
+
+    def read(self):
+        """Read all tracked counters once, in `columns` order."""
+        values = []
+        for handle in self.handles:
+            counters = handle.read()
+            for intf in handle.intfs:
+                row = counters.get(intf)
+                for i in self._index:
+                    values.append(row[i] if row else 0)
+        return values
+
+    def sample(self, t):
+        values = self.read()
+        if self.callback:
+            self.callback(t, values)
+
+    def close(self):
+        try:
+            self.stop()
+        finally:
+            for handle in self.handles:
+                handle.close()
@@ -0,0 +1,119 @@
+#!/usr/bin/python
+
+import os
+import sys
+import time
+
+from mininet.topo import Topo
+from mininet.link import TCLink
+from mininet.net import Mininet
+
+from bringup import BatchLink, BatchMininet
+from aqm import AQMLink
+from netconf import check_connectivity
+
+# Bottleneck between r1 and r2 and access links of each pair, as in the
+# original two-pair tcp_fair_test topology
+BOTTLENECK = {'bw': 10, 'delay': '10ms', 'jitter': '1ms', 'max_queue_size': 17, 'use_tbf': True}
+ACCESS = {'bw': 100, 'delay': '5ms'}
+
+def client_ip(i):
+    """Address of client<i> (i from 1): 10.1.x.y/8."""
+    return f'10.1.{i >> 8}.{i & 255}'
+
+def server_ip(i):
+    return f'10.2.{i >> 8}.{i & 255}'
+
+class DumbbellTopo(Topo):
+    """N client/server pairs across one bottleneck: client<i> - r1 - r2 - server<i>.
+
+    r1 and r2 are switches, so all hosts share 10.0.0.0/8; clients are
+    10.1.x.y and servers 10.2.x.y. `access` is one set of TCLink
+    parameters for every pair or a list with one per pair (the same on the
+    client and server side). `bottleneck` overrides BOTTLENECK, and
+    `bw_bottleneck` its bandwidth; aqm.aqm_params() selects its queue
+    discipline (with link=BatchLink the bottleneck is an AQMLink).
+    """
+
+    def build(self, pairs=2, bw_bottleneck=None, bottleneck=None, access=None, link=BatchLink):
+        if access is None or isinstance(access, dict):
+            access = [dict(ACCESS, **(access or {}))] * pairs
+        if len(access) != pairs:
+            raise ValueError(f"{len(access)} access link settings for {pairs} pairs")
+        bottleneck = dict(BOTTLENECK, **(bottleneck or {}))
+        if bw_bottleneck is not None:
+            bottleneck['bw'] = bw_bottleneck
+
+        r1 = self.addSwitch('r1')
+        r2 = self.addSwitch('r2')
+        for i in range(1, pairs + 1):
+            client = self.addHost(f'client{i}', ip=f'{client_ip(i)}/8')
+            server = self.addHost(f'server{i}', ip=f'{server_ip(i)}/8')
+            self.addLink(client, r1, cls=link, **access[i - 1])
+            self.addLink(r2, server, cls=link, **access[i - 1])
+        self.addLink(r1, r2, cls=AQMLink if link is BatchLink else link, **bottleneck)
+
+def pair_checks(pairs):
+    """Reachability checks for check_connectivity(): every client to its server."""
+    return [(f'client{i}', server_ip(i)) for i in range(1, pairs + 1)]
+
+def bringup_time(pairs, serial=False, check=True):
+    """Seconds to build and start an N-pair dumbbell, and to stop it again.
+
+    serial=True uses plain Mininet with TCLink for comparison. Returns
+    (start seconds, unreachable pairs, stop seconds).
+    """
+    if serial:
+        topo = DumbbellTopo(pairs, link=TCLink)
+        start = time.monotonic()
+        net = Mininet(topo=topo, link=TCLink)
+    else:
+        topo = DumbbellTopo(pairs)
+        start = time.monotonic()
+        net = BatchMininet(topo=topo)
+    try:
+        net.start()
+        elapsed = time.monotonic() - start
+        unreachable = 0
+        if check:
+            unreachable = sum(not ok for ok in check_connectivity(net, pair_checks(pairs), count=1, timeout=2).values())
+    finally:
+        stop = time.monotonic()
+        net.stop()
+    return elapsed, unreachable, time.monotonic() - stop
+
+def parse_args(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(description='Bring-up time of N-pair dumbbell topologies')
+    parser.add_argument('--pairs', type=int, nargs='+', default=[2, 10, 50, 100, 200],
+                        help='numbers of client/server pairs')
+    parser.add_argument('--serial', action='store_true',
+                        help="also time Mininet's serial bring-up (plain TCLink)")
+    parser.add_argument('--no-check', action='store_true', help="skip the client-to-server reachability check")
+    parser.add_argument('--out', help='write the results to this CSV file')
+    return parser.parse_args(argv)
+
+def main():
+    args = parse_args()
+    modes = ['batched'] + (['serial'] if args.serial else [])
+    rows = []
+    print('%6s %-8s %10s %10s %12s' % ('pairs', 'mode', 'start (s)', 'stop (s)', 'unreachable'))
+    for pairs in args.pairs:
+        for mode in modes:
+            elapsed, unreachable, stopped = bringup_time(pairs, mode == 'serial', not args.no_check)
+            rows.append((pairs, mode, elapsed, stopped, unreachable))
+            print('%6d %-8s %10.2f %10.2f %12d' % rows[-1])
+    if args.out:
+        with open(args.out, 'w') as f:
+            f.write('pairs,mode,start_s,stop_s,unreachable\n')
+            for row in rows:
+                f.write('%d,%s,%.3f,%.3f,%d\n' % row)
+
+if __name__ == '__main__':
+    if os.geteuid() != 0:
+        print("This script must be run as root.")
+        print("Please run with: sudo python %s" % sys.argv[0])
+        sys.exit(1)
+    from mininet.log import setLogLevel
+    setLogLevel('warning')
+    main()
@@ -0,0 +1,281 @@
+#!/usr/bin/python
+
+import asyncio
+import json
+import os
+import signal
+import socket
+import struct
+import sys
+import time
+
+import numpy as np
+
+from metrics_sink import MetricsSink, load
+
+FLOWGEN = os.path.abspath(__file__)
+FLOWGEN_PORT = 5301
+
+# A flow opens with its id; the sink answers EOF with the bytes it received
+_HEADER = struct.Struct('!I')
+_TOTAL = struct.Struct('!Q')
+
+CHUNK = 1 << 16
+MIN_CHUNK = 1448
+PACING_QUANTUM = 0.01
+
+# Flow status in the results file
+OK, FAILED, TIMED_OUT = 0, 1, 2
+
+# Per-flow results written by the client (times in microseconds after t0)
+FLOW_COLUMNS = ('flow', 'start_us', 'connect_us', 'end_us', 'sent', 'received', 'status')
+# Per-flow received bytes sampled by the sink
+SERIES_COLUMNS = ('flow', 'bytes')
+
+def make_flows(count, dst, port=FLOWGEN_PORT, first_id=0, start=0.0, stagger=0.0,
+               size=None, duration=None, rate=None, cc=None):
+    """`count` flow specs to `dst`, started `stagger` seconds apart from `start`.
+
+    A flow ends after `size` bytes or `duration` seconds, whichever comes
+    first (at least one of them is required); `rate` caps it in bit/s.
+    `cc` sets the flow's congestion control algorithm (default: the
+    node's net.ipv4.tcp_congestion_control).
+    """
+    if size is None and duration is None:
+        raise ValueError("a flow needs a size or a duration")
+    return [{'id': first_id + i, 'dst': dst, 'port': port, 'start': start + i * stagger,
+             'bytes': size, 'duration': duration, 'rate': rate, 'cc': cc} for i in range(count)]
+
+async def _connect(dst, port, cc=None):
+    if not cc:
+        return await asyncio.open_connection(dst, port)
+    # TCP_CONGESTION has to be set before the connection is opened to cover its first cwnd
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    try:
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_CONGESTION, cc.encode())
+        sock.setblocking(False)
+        await asyncio.get_running_loop().sock_connect(sock, (dst, port))
+    except BaseException:
+        sock.close()
+        raise
+    return await asyncio.open_connection(sock=sock)
+
+async def _flow(spec, t0, sink, payload, timeout):
+    def us(t):
+        return int((t - t0) * 1e6)
+
+    await asyncio.sleep(max(0.0, t0 + spec['start'] - time.monotonic()))
+    started = time.monotonic()
+    connected = None
+    sent = received = 0
+    status = FAILED
+    size, duration, rate = spec.get('bytes'), spec.get('duration'), spec.get('rate')
+    try:
+        reader, writer = await asyncio.wait_for(_connect(spec['dst'], spec['port'], spec.get('cc')), timeout)
+        connected = time.monotonic()
+        writer.transport.set_write_buffer_limits(high=4 * CHUNK)
+        writer.write(_HEADER.pack(spec['id']))
+        deadline = connected + duration if duration else None
+        # Paced flows write about PACING_QUANTUM seconds of data at a time
+        chunk = min(CHUNK, max(MIN_CHUNK, int(rate / 8 * PACING_QUANTUM))) if rate else CHUNK
+        while size is None or sent < size:
+            now = time.monotonic()
+            if deadline is not None and now >= deadline:
+                break
+            if rate:
+                # Pace to the rate: wait until the bytes sent so far are due
+                due = connected + sent * 8 / rate
+                if due > now:
+                    await asyncio.sleep(due - now)
+            n = chunk if size is None else min(chunk, size - sent)
+            writer.write(payload[:n])
+            sent += n
+            # Data that stops leaving times the flow out; a timed flow stops sending at its deadline
+            wait = timeout if deadline is None else min(timeout, max(0.0, deadline - time.monotonic()))
+            try:
+                await asyncio.wait_for(writer.drain(), wait)
+            except asyncio.TimeoutError:
+                if deadline is None or time.monotonic() < deadline:
+                    raise
+                break
+        writer.write_eof()
+        # The sink replies once it has read everything, so this is the completion time
+        received = _TOTAL.unpack(await asyncio.wait_for(reader.readexactly(_TOTAL.size), timeout))[0]
+        status = OK
+        writer.close()
+    except asyncio.TimeoutError:
+        status = TIMED_OUT
+    except (OSError, asyncio.IncompleteReadError):
+        status = FAILED
+    end = time.monotonic()
+    sink.append(end - t0, (spec['id'], us(started), us(connected) if connected else -1, us(end),
+                           sent, received, status))
+
+async def run_client(flows, out_file, t0=None, timeout=30.0):
+    """Run every flow in `flows` concurrently; one results record per flow goes to `out_file`."""
+    if t0 is None:
+        t0 = time.monotonic()
+    sink = MetricsSink(out_file, FLOW_COLUMNS, meta={'t0': t0, 'flows': len(flows)})
+    payload = memoryview(bytes(CHUNK))
+    try:
+        await asyncio.gather(*(_flow(spec, t0, sink, payload, timeout) for spec in flows))
+    finally:
+        sink.close()
+
+class _Receiver(asyncio.Protocol):
+    def __init__(self, active, finished):
+        self.active = active
+        self.finished = finished
+        self.flow = None
+        self.bytes = 0
+        self.header = b''
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def data_received(self, data):
+        if self.flow is None:
+            self.header += data
+            if len(self.header) < _HEADER.size:
+                return
+            self.flow = _HEADER.unpack_from(self.header)[0]
+            data = self.header[_HEADER.size:]
+            self.active[self.flow] = self
+        self.bytes += len(data)
+
+    def eof_received(self):
+        if self.flow is not None:
+            # Recorded at the next sample, so the series ends on the bytes reported to the client
+            self.finished[self.flow] = self.bytes
+            self.active.pop(self.flow, None)
+        self.transport.write(_TOTAL.pack(self.bytes))
+        self.transport.close()
+
+    def connection_lost(self, exc):
+        if self.flow is not None:
+            self.active.pop(self.flow, None)
+
+async def run_server(port=FLOWGEN_PORT, series_file=None, interval=0.1, t0=None):
+    """Sink every flow sent to `port` until SIGTERM/SIGINT.
+
+    With `series_file`, the bytes received so far by every open flow, and
+    the total of every flow that ended since the last sample, are recorded
+    every `interval` seconds (SERIES_COLUMNS), on the schedule of t0 so
+    that series from several hosts line up.
+    """
+    if t0 is None:
+        t0 = time.monotonic()
+    loop = asyncio.get_running_loop()
+    stop = asyncio.Event()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, stop.set)
+
+    active, finished = {}, {}
+    server = await loop.create_server(lambda: _Receiver(active, finished), port=port, reuse_address=True,
+                                      family=socket.AF_INET, backlog=1024)
+    sink = MetricsSink(series_file, SERIES_COLUMNS, meta={'t0': t0, 'interval': interval}) \
+        if series_file else None
+    try:
+        tick = max(0, int((time.monotonic() - t0) / interval) + 1)
+        while not stop.is_set():
+            try:
+                await asyncio.wait_for(stop.wait(), max(0.0, t0 + tick * interval - time.monotonic()))
+            except asyncio.TimeoutError:
+                pass
+            if sink:
+                t = time.monotonic() - t0
+                for flow, receiver in list(active.items()):
+                    sink.append(t, (flow, receiver.bytes))
+                for flow, received in finished.items():
+                    sink.append(t, (flow, received))
+            finished.clear()
+            tick = max(tick + 1, int((time.monotonic() - t0) / interval) + 1)
+    finally:
+        server.close()
+        if sink:
+            sink.close()
+
+def start_sink(procs, node, port=FLOWGEN_PORT, series_file=None, interval=0.1, t0=None,
+               log_file='/dev/null'):
+    """Start a flowgen sink on `node` and return once it listens."""
+    from launcher import start_server
+    cmd = f'python3 {FLOWGEN} server --port {port} --interval {interval}'
+    if series_file:
+        cmd += f' --series {series_file}'
+    if t0 is not None:
+        cmd += f' --t0 {t0!r}'
+    return start_server(node, cmd, port, log_file, supervisor=procs, name='flowgen')
+
+def start_flows(procs, node, flows, out_file, t0=None, timeout=30.0, log_file=None):
+    """Drive `flows` (make_flows() specs) from one flowgen process on `node`.
+
+    The specs are written next to `out_file`; the process exits once
+    every flow has finished.
+    """
+    spec_file = out_file + '.flows.json'
+    with open(spec_file, 'w') as f:
+        json.dump(flows, f)
+    cmd = f'python3 {FLOWGEN} client --spec {spec_file} --out {out_file} --timeout {timeout}'
+    if t0 is not None:
+        cmd += f' --t0 {t0!r}'
+    return procs.start(node, cmd, log_file=log_file, name='flowgen')
+
+def load_results(*paths):
+    """Per-flow results of one or more client files, with fct (s) and goodput (Mbps) added.
+
+    Goodput is the bytes the sink confirmed over the time from the start
+    of the flow to its completion; failed flows get NaN.
+    """
+    records = np.concatenate([load(path) for path in paths])
+    dtype = np.dtype([(name, '<i8') for name in FLOW_COLUMNS] + [('fct', '<f8'), ('goodput_mbps', '<f8')])
+    results = np.empty(len(records), dtype=dtype)
+    for name in FLOW_COLUMNS:
+        results[name] = records[name]
+    results['fct'] = (records['end_us'] - records['start_us']) / 1e6
+    ok = records['status'] == OK
+    results['goodput_mbps'] = np.where(ok, records['received'] * 8 / np.maximum(results['fct'], 1e-9) / 1e6,
+                                       np.nan)
+    return np.sort(results, order='flow')
+
+def load_series(*paths):
+    """{flow: (times, goodput Mbps per interval)} from one or more sink series files."""
+    flows = {}
+    for path in paths:
+        records = load(path)
+        for flow in np.unique(records['flow']):
+            rows = records[records['flow'] == flow]
+            flows[int(flow)] = (rows['t'], rows['bytes'].astype(np.float64))
+    series = {}
+    for flow, (t, received) in flows.items():
+        series[flow] = (t[1:], np.diff(received) * 8 / np.diff(t) / 1e6)
+    return series
+
+def parse_args(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(description='Many TCP flows from one asyncio process')
+    sub = parser.add_subparsers(dest='mode', required=True)
+    client = sub.add_parser('client', help='drive the flows of a spec file')
+    client.add_argument('--spec', required=True, help='JSON list of flows (see make_flows)')
+    client.add_argument('--out', required=True, help='per-flow results file')
+    client.add_argument('--t0', type=float, help='CLOCK_MONOTONIC time flow starts are relative to')
+    client.add_argument('--timeout', type=float, default=30.0,
+                        help='seconds to wait for a connection, for sent data to leave and for the sink '
+                             'to confirm a flow')
+    server = sub.add_parser('server', help='sink flows and sample their received bytes')
+    server.add_argument('--port', type=int, default=FLOWGEN_PORT)
+    server.add_argument('--series', help='per-flow received bytes time series file')
+    server.add_argument('--interval', type=float, default=0.1, help='series interval (seconds)')
+    server.add_argument('--t0', type=float, help='CLOCK_MONOTONIC time the series is relative to')
+    return parser.parse_args(argv)
+
+def main():
+    args = parse_args()
+    if args.mode == 'client':
+        with open(args.spec) as f:
+            flows = json.load(f)
+        asyncio.run(run_client(flows, args.out, args.t0, args.timeout))
+    else:
+        asyncio.run(run_server(args.port, args.series, args.interval, args.t0))
+
+if __name__ == '__main__':
+    sys.exit(main())
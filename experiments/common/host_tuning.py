@@ -0,0 +1,94 @@
+#!/usr/bin/python
+
+import subprocess
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from subprocess import PIPE
+
+# Named sysctl profiles
+PROFILES = {
+    'fairness': {
+        'net.ipv4.tcp_rmem': '4096 87380 16777216',
+        'net.ipv4.tcp_wmem': '4096 16384 16777216',
+        'net.ipv4.tcp_no_metrics_save': '1',
+        'net.ipv4.tcp_slow_start_after_idle': '0',
+        'net.ipv4.tcp_ecn': '1',
+        'net.ipv4.tcp_adv_win_scale': '1',
+        'net.ipv4.tcp_app_win': '31',
+        'net.ipv4.tcp_moderate_rcvbuf': '1',
+    },
+}
+
+AVAILABLE_CC = '/proc/sys/net/ipv4/tcp_available_congestion_control'
+
+def congestion_controls(load=()):
+    """Congestion control algorithms the kernel offers, after loading tcp_<name> for those of `load` missing.
+
+    The list is the same in every network namespace, as the algorithms
+    are kernel modules.
+    """
+    with open(AVAILABLE_CC) as f:
+        available = f.read().split()
+    missing = [name for name in load if name not in available]
+    if missing:
+        try:
+            for name in missing:
+                subprocess.run(['modprobe', '-q', f'tcp_{name}'], stdout=subprocess.DEVNULL,
+                               stderr=subprocess.DEVNULL)
+        except FileNotFoundError:
+            # No modprobe: only what is built in or already loaded
+            pass
+        with open(AVAILABLE_CC) as f:
+            available = f.read().split()
+    return available
+
+def check_cc(algorithms):
+    """Load the congestion control modules of `algorithms` (None entries skipped); exit if any is missing."""
+    wanted = [algorithm for algorithm in algorithms if algorithm]
+    missing = set(wanted) - set(congestion_controls(wanted))
+    if missing:
+        sys.exit(f"Congestion control not available in this kernel: {', '.join(sorted(missing))}")
+
+def make_profile(base=None, **overrides):
+    """Return a copy of a named profile (or {}) with dotted-key overrides.
+
+    Keyword names use '__' for dots, e.g. net__ipv4__tcp_congestion_control='bbr'.
+    """
+    profile = dict(PROFILES[base]) if base else {}
+    for key, value in overrides.items():
+        profile[key.replace('__', '.')] = str(value)
+    return profile
+
+def tune_host(host, profile):
+    """Write and read back a profile in a single invocation on one host.
+
+    Returns {key: (wanted, actual)} for values that did not take effect.
+    """
+    keys = list(profile)
+    assignments = ' '.join(f"{key}='{value}'" for key, value in profile.items())
+    script = f"sysctl -q -w {assignments} >/dev/null 2>&1; " \
+             f"for k in {' '.join(keys)}; do sysctl -n $k 2>/dev/null || echo; done"
+    proc = host.popen(['sh', '-c', script], stdout=PIPE, stderr=PIPE)
+    output = proc.communicate()[0].decode().split('\n')
+
+    mismatches = {}
+    for key, actual in zip(keys, output):
+        wanted = profile[key]
+        if actual.split() != wanted.split():
+            mismatches[key] = (wanted, actual.strip())
+    return mismatches
+
+def apply_profile(hosts, profile, workers=32):
+    """Apply a profile to every host in parallel.
+
+    Returns {host name: mismatches} for hosts where verification failed.
+    """
+    if isinstance(profile, str):
+        profile = PROFILES[profile]
+    hosts = list(hosts)
+    if not hosts:
+        return {}
+    with ThreadPoolExecutor(max_workers=min(workers, len(hosts))) as pool:
+        results = pool.map(lambda host: tune_host(host, profile), hosts)
+        return {host.name: mismatches
+                for host, mismatches in zip(hosts, results) if mismatches}
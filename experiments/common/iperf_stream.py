@@ -0,0 +1,211 @@
+#!/usr/bin/python
+
+import json
+import subprocess
+import threading
+import time
+from subprocess import PIPE
+
+import numpy as np
+
+from supervisor import ProcessSupervisor
+
+IPERF3_PORT = 5201
+
+# One row per stream and reporting interval. Fields the client does not
+# report (sender-side retransmits, cwnd and RTT when it receives, i.e. -R)
+# are -1. rtt is in microseconds, as reported by iperf3.
+INTERVAL_DTYPE = np.dtype([('start', '<f8'), ('end', '<f8'), ('stream', '<i4'),
+                           ('bytes', '<i8'), ('bits_per_second', '<f8'),
+                           ('retransmits', '<i8'), ('snd_cwnd', '<i8'), ('rtt', '<i8')])
+
+class IperfError(RuntimeError):
+    pass
+
+_json_stream = None
+
+def json_stream_supported():
+    """Whether the installed iperf3 has --json-stream (3.17+); otherwise -J is used."""
+    global _json_stream
+    if _json_stream is None:
+        try:
+            help_text = subprocess.run(['iperf3', '--help'], stdout=PIPE, stderr=subprocess.STDOUT,
+                                       universal_newlines=True).stdout
+        except OSError:
+            help_text = ''
+        _json_stream = '--json-stream' in help_text
+    return _json_stream
+
+def _rows(interval):
+    rows = []
+    for i, stream in enumerate(interval['streams']):
+        rows.append((stream['start'], stream['end'], stream.get('socket', i),
+                     stream['bytes'], stream['bits_per_second'],
+                     stream.get('retransmits', -1), stream.get('snd_cwnd', -1),
+                     stream.get('rtt', -1)))
+    return rows
+
+class Iperf3Client:
+    """An iperf3 client whose JSON output is ingested while it runs.
+
+    With --json-stream every interval record is parsed as soon as iperf3
+    prints it, so per-interval results are available during the test (and
+    passed to `callback(client, rows)`). Older iperf3 versions fall back to
+    -J, which is parsed when the client exits. Errors reported by iperf3,
+    or a client that exits without results, raise IperfError from wait()
+    instead of turning into a throughput of 0.
+
+    `cmd` is the client command line without output options, e.g.
+    'iperf3 -c 10.0.0.2 -t 10'; it is started through `procs`. The raw
+    JSON is copied to `log_file` if given.
+    """
+
+    def __init__(self, procs, node, cmd, log_file=None, callback=None, name=None):
+        self.procs = procs
+        self.node = node
+        self.cmd = cmd
+        self.log_file = log_file
+        self.callback = callback
+        self.name = name or node.name
+        self.streaming = json_stream_supported()
+        self.rows = []
+        self.sum = []
+        self.start_info = None
+        self.end = None
+        self.error = None
+        self.messages = []
+        self.proc = None
+        self.launched = None
+        self._reader = None
+
+    def start(self):
+        options = '--json-stream --forceflush' if self.streaming else '-J'
+        self.launched = time.monotonic()
+        self.proc = self.procs.start(self.node, f'{self.cmd} {options}', stdout=PIPE,
+                                     name='iperf3', universal_newlines=True)
+        self._reader = threading.Thread(target=self._read)
+        self._reader.daemon = True
+        self._reader.start()
+        return self
+
+    def _read(self):
+        log = open(self.log_file, 'w') if self.log_file else None
+        document = []
+        try:
+            for line in self.proc.popen.stdout:
+                if log:
+                    log.write(line)
+                if not self.streaming:
+                    document.append(line)
+                    continue
+                if not line.startswith('{'):
+                    self.messages.append(line.strip())
+                    continue
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    self.messages.append(line.strip())
+                    continue
+                self._event(record.get('event'), record.get('data'))
+            if document:
+                self._document(''.join(document))
+        finally:
+            if log:
+                log.close()
+
+    def _document(self, text):
+        try:
+            doc = json.loads(text)
+        except ValueError:
+            self.messages.append(text.strip())
+            return
+        self._event('start', doc.get('start'))
+        for interval in doc.get('intervals', []):
+            self._event('interval', interval)
+        if 'error' in doc:
+            self._event('error', doc['error'])
+        self._event('end', doc.get('end'))
+
+    def _event(self, event, data):
+        if event == 'start':
+            self.start_info = data
+        elif event == 'interval':
+            rows = _rows(data)
+            self.rows.extend(rows)
+            total = data['sum']
+            self.sum.append((total['start'], total['end'], total['bytes'], total['bits_per_second']))
+            if self.callback:
+                self.callback(self, rows)
+        elif event == 'end':
+            self.end = data
+        elif event == 'error':
+            self.error = data
+
+    def running(self):
+        return self.proc is not None and self.proc.running()
+
+    def wait(self, timeout=None):
+        """Wait for the client to finish; raises IperfError if it produced no results."""
+        if self._reader is None:
+            raise IperfError(f"{self.name}: not started")
+        self._reader.join(timeout)
+        if self._reader.is_alive():
+            raise IperfError(f"{self.name}: iperf3 still running after {timeout}s")
+        code = self.proc.popen.wait()
+        self.procs.reap()
+        if self.error or not self.end:
+            detail = self.error or '; '.join(self.messages) or f'exit code {code}'
+            raise IperfError(f"{self.name}: {self.cmd}: {detail}")
+        return self
+
+    def intervals(self, t0=None):
+        """Per-stream interval records as an INTERVAL_DTYPE array.
+
+        Times are relative to the start of the test, or to the monotonic
+        `t0` if given (taking the launch time of the client as its start).
+        """
+        rows = np.array(self.rows, dtype=INTERVAL_DTYPE)
+        if t0 is not None and len(rows):
+            rows['start'] += self.launched - t0
+            rows['end'] += self.launched - t0
+        return rows
+
+    def latest_mbps(self):
+        """Throughput of the last reported interval (all streams)."""
+        return self.sum[-1][3] / 1e6 if self.sum else None
+
+    def summary(self):
+        """Totals from the end record: received Mbps, sent Mbps and retransmits."""
+        if not self.end:
+            raise IperfError(f"{self.name}: no results")
+        sent = self.end.get('sum_sent', {})
+        received = self.end.get('sum_received', {})
+        return {'mbps': received.get('bits_per_second', 0) / 1e6,
+                'sent_mbps': sent.get('bits_per_second', 0) / 1e6,
+                'bytes': received.get('bytes', 0),
+                'retransmits': sent.get('retransmits', -1)}
+
+def run_client(node, cmd, procs=None, timeout=None, **kwargs):
+    """Run an Iperf3Client to completion and return it."""
+    if procs is None:
+        procs = ProcessSupervisor()
+    return Iperf3Client(procs, node, cmd, **kwargs).start().wait(timeout)
+
+def write_intervals_csv(clients, path, t0=None):
+    """Per-stream interval records of several clients in one CSV (Flow is the client name)."""
+    with open(path, 'w') as f:
+        f.write('Flow,' + ','.join(INTERVAL_DTYPE.names) + '\n')
+        for client in clients:
+            for row in client.intervals(t0):
+                f.write('%s,%.3f,%.3f,%d,%d,%.0f,%d,%d,%d\n' % ((client.name,) + tuple(row)))
+
+def load_intervals_csv(path):
+    """Read a write_intervals_csv() file back as a structured array with a 'Flow' field."""
+    dtype = np.dtype([('Flow', 'U64')] + INTERVAL_DTYPE.descr)
+    rows = []
+    with open(path) as f:
+        next(f)
+        for line in f:
+            flow, *values = line.rstrip('\n').split(',')
+            rows.append((flow, *values))
+    return np.array(rows, dtype=dtype)
@@ -0,0 +1,109 @@
+#!/usr/bin/python
+
+import time
+
+from supervisor import ProcessSupervisor
+
+# Socket state of a listening TCP socket in /proc/net/tcp{,6}
+TCP_LISTEN = '0A'
+
+class ServerStartError(RuntimeError):
+    pass
+
+def listening_ports(pid, proto='tcp'):
+    """Ports with a listening socket in the network namespace of `pid`.
+
+    For UDP every bound port counts, as UDP sockets have no listen state.
+    """
+    ports = set()
+    for table in (proto, proto + '6'):
+        try:
+            with open(f'/proc/{pid}/net/{table}') as f:
+                lines = f.readlines()[1:]
+        except FileNotFoundError:
+            continue
+        for line in lines:
+            fields = line.split()
+            if proto == 'tcp' and fields[3] != TCP_LISTEN:
+                continue
+            ports.add(int(fields[1].rsplit(':', 1)[1], 16))
+    return ports
+
+def _alive(pid):
+    # A zombie has exited even though its /proc entry is still there
+    try:
+        with open(f'/proc/{pid}/stat') as f:
+            return f.read().rsplit(')', 1)[1].split()[0] != 'Z'
+    except (FileNotFoundError, ProcessLookupError):
+        return False
+
+def wait_all_listening(servers, port, proto='tcp', timeout=5.0):
+    """Poll the sockets of several servers' nodes with back-off until `port` is listening on all of them.
+
+    `servers` is a list of (node, pid of the server process or None); every
+    round polls all nodes still pending, so N servers take about as long
+    as the slowest one. Returns {node: ServerStartError} of the servers
+    that exited before listening or were not listening after `timeout`.
+    """
+    start = time.monotonic()
+    delay = 0.001
+    pending = list(servers)
+    failed = {}
+    while pending:
+        waiting = []
+        for node, pid in pending:
+            if port in listening_ports(node.pid, proto):
+                continue
+            if pid is not None and not _alive(pid):
+                failed[node] = ServerStartError(
+                    f"{node.name}: server (PID {pid}) exited before listening on {proto}/{port}")
+            else:
+                waiting.append((node, pid))
+        pending = waiting
+        if pending and time.monotonic() - start > timeout:
+            for node, _ in pending:
+                failed[node] = ServerStartError(
+                    f"{node.name}: nothing listening on {proto}/{port} after {timeout:.1f}s")
+            break
+        if pending:
+            time.sleep(delay)
+            delay = min(delay * 2, 0.05)
+    return failed
+
+def wait_listening(node, port, proto='tcp', timeout=5.0, pid=None):
+    """Poll the node's sockets with back-off until `port` is listening.
+
+    Returns the time waited. Raises ServerStartError on timeout, or as soon
+    as `pid` (the server process, if given) has exited.
+    """
+    start = time.monotonic()
+    failed = wait_all_listening([(node, pid)], port, proto, timeout)
+    if failed:
+        raise failed[node]
+    return time.monotonic() - start
+
+def _log_tail(log_file, lines=5):
+    try:
+        with open(log_file) as f:
+            return ''.join(f.readlines()[-lines:]).strip()
+    except OSError:
+        return ''
+
+def start_server(node, cmd, port, log_file='/dev/null', proto='tcp', timeout=5.0,
+                 supervisor=None, name=None):
+    """Start `cmd` in the background on `node` and return its Process once `port` is listening.
+
+    The process is started and tracked by `supervisor` (a ProcessSupervisor;
+    a private one is used if none is given).
+    """
+    if supervisor is None:
+        supervisor = ProcessSupervisor()
+    proc = supervisor.start(node, cmd, log_file, name)
+    try:
+        waited = wait_listening(node, port, proto, timeout, proc.pid)
+    except ServerStartError as e:
+        supervisor.stop(pid=proc.pid, timeout=1.0)
+        tail = _log_tail(log_file) if log_file != '/dev/null' else ''
+        raise ServerStartError(f"{e}: {cmd}" + (f"\n{tail}" if tail else '')) from None
+    print(f"{proc.name} server listening on {node.name}:{port} (PID {proc.pid}) after {waited * 1000:.0f} ms")
+    return proc
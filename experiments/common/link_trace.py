@@ -0,0 +1,365 @@
+#!/usr/bin/python
+
+import os
+import re
+import sys
+import threading
+import time
+from contextlib import nullcontext
+from subprocess import PIPE
+
+import numpy as np
+
+from metrics_sink import MetricsSink, load, load_meta, update_meta, export_csv
+from aqm import aqm_commands
+
+# Link parameters a trace can vary and their units in trace files:
+# bw in Mbps, delay and jitter in ms, loss in percent
+PARAMS = ('bw', 'delay', 'jitter', 'loss')
+
+# Netem is only installed by TCIntf when one of these is set
+_NETEM = ('delay', 'jitter', 'loss')
+
+_UNITS = {'us': 1e-3, 'ms': 1.0, 's': 1e3}
+
+def _ms(value):
+    """Mininet delay ('10ms', '1.5s', '200us' or a number of ms) in ms."""
+    if value is None or isinstance(value, (int, float)):
+        return value
+    match = re.fullmatch(r'\s*([0-9.]+)\s*(us|ms|s)?\s*', value)
+    if not match:
+        raise ValueError(f"cannot parse delay '{value}'")
+    return float(match.group(1)) * _UNITS[match.group(2) or 'ms']
+
+def load_trace(path, param='bw'):
+    """Read a trace file into (times, {param: values}).
+
+    A CSV whose header row names the columns, `t` (seconds from the start
+    of the run) followed by any of PARAMS, or a file of bare `time,value`
+    lines, which set `param`. Values hold until the next line; an empty
+    cell leaves that parameter unchanged. Lines starting with '#' are
+    comments.
+    """
+    with open(path) as f:
+        lines = [line.strip() for line in f if line.strip() and not line.lstrip().startswith('#')]
+    if not lines:
+        raise ValueError(f"{path}: empty trace")
+    header = [c.strip() for c in re.split(r'[,\s]+', lines[0])]
+    try:
+        float(header[0])
+        columns = ['t', param]
+    except ValueError:
+        columns, lines = header, lines[1:]
+    if columns[0] not in ('t', 'time'):
+        raise ValueError(f"{path}: the first column must be the time, got '{columns[0]}'")
+    unknown = set(columns[1:]) - set(PARAMS)
+    if unknown:
+        raise ValueError(f"{path}: unknown trace columns {sorted(unknown)}, expected some of {PARAMS}")
+
+    rows = np.full((len(lines), len(columns)), np.nan)
+    for i, line in enumerate(lines):
+        cells = line.split(',') if ',' in line else line.split()
+        for j, cell in enumerate(cells[:len(columns)]):
+            if cell.strip():
+                rows[i, j] = float(cell)
+    times = rows[:, 0]
+    if np.isnan(times).any() or (np.diff(times) < 0).any():
+        raise ValueError(f"{path}: times must be given on every line and must not decrease")
+    values = {name: rows[:, j] for j, name in enumerate(columns[1:], 1)}
+    if 'bw' in values and (values['bw'] <= 0).any():
+        raise ValueError(f"{path}: bandwidth must be positive")
+    if 'loss' in values and ((values['loss'] < 0) | (values['loss'] > 100)).any():
+        raise ValueError(f"{path}: loss must be between 0 and 100%")
+    return times, values
+
+def change_commands(intf, params):
+    """`tc -batch` lines changing the qdiscs TCIntf installed for `params` in place.
+
+    `params` are TCLink parameters with delay and jitter in ms. The
+    qdisc layout (htb/hfsc class or tbf at 5:, red at 6:, netem at 10:)
+    must already be the one TCIntf.config() builds for them; each line
+    restates all of a qdisc's options, since `change` resets the ones
+    left out. Interfaces with an `aqm` parameter have aqm_commands()'s layout.
+    """
+    if params.get('aqm'):
+        p = _mininet_params(params)
+        return aqm_commands(intf, p['aqm'], p.get('bw'), p.get('delay'), p.get('jitter'), p.get('loss'),
+                            verb='change')
+    lines, parent = [], 'root'
+    bw = params.get('bw')
+    if bw is not None:
+        if params.get('use_hfsc'):
+            lines.append(f'class change dev {intf} parent 5:0 classid 5:1 hfsc sc rate {bw:f}Mbit ul rate {bw:f}Mbit')
+        elif params.get('use_tbf'):
+            latency_ms = params.get('latency_ms') or 15.0 * 8 / bw
+            lines.append(f'qdisc change dev {intf} root handle 5: tbf rate {bw:f}Mbit burst 15000 latency {latency_ms:f}ms')
+        else:
+            lines.append(f'class change dev {intf} parent 5:0 classid 5:1 htb rate {bw:f}Mbit burst 15k')
+        parent = 'parent 5:1'
+        if params.get('enable_ecn') or params.get('enable_red'):
+            lines.append(f'qdisc change dev {intf} {parent} handle 6: red limit 1000000 min 30000 max 35000 '
+                         f'avpkt 1500 burst 20 bandwidth {bw:f}mbit probability 1'
+                         + (' ecn' if params.get('enable_ecn') else ''))
+            parent = 'parent 6:'
+
+    netem = ''
+    if params.get('delay') is not None:
+        netem += f"delay {params['delay']:g}ms "
+        if params.get('jitter'):
+            netem += f"{params['jitter']:g}ms "
+    if params.get('loss'):
+        netem += f"loss {params['loss']:.5f} "
+    if params.get('max_queue_size') is not None:
+        netem += f"limit {int(params['max_queue_size'])}"
+    if netem:
+        lines.append(f'qdisc change dev {intf} {parent} handle 10: netem {netem.strip()}')
+    return lines
+
+def _intf_params(intf):
+    params = dict(intf.params)
+    for name in ('delay', 'jitter'):
+        params[name] = _ms(params.get(name))
+    return params
+
+def _mininet_params(params):
+    # Back to the units TCIntf.config() takes
+    params = dict(params)
+    for name in ('delay', 'jitter'):
+        if params.get(name) is not None:
+            params[name] = f'{params[name]:g}ms'
+    return params
+
+class LinkTrace:
+    """Replay bandwidth, delay, jitter and loss traces on links of a running network.
+
+    Traces are attached per link with add(). prepare() reconfigures each
+    traced interface once so that it starts at the trace's first values
+    and has every qdisc the trace changes (a netem for a delay or loss
+    trace, a shaping qdisc for a bandwidth trace), and opens one `tc
+    -batch` process per node. During the run every change is a line
+    written to that process, which changes the qdiscs in place: queued
+    packets and qdisc counters survive, and there is no fork per change.
+    Changes are dispatched on a monotonic schedule from t0 and every one
+    is recorded in a MetricsSink file (`out_file`) with its planned and
+    actual time and the values in effect afterwards, so the trace can be
+    read next to throughput samples taken on the same t0.
+
+    Interface parameters (intf.params) are not touched, so
+    ExperimentSession.reset() restores the topology's static links.
+    """
+
+    def __init__(self, net, procs, out_file, name='link_trace'):
+        self.net = net
+        self.procs = procs
+        self.out_file = out_file
+        self.name = name
+        self.links = []
+        self.events = []
+        self.batches = {}
+        self.sink = None
+        self.t0 = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def add(self, node1, node2, trace, params=None, name=None):
+        """Replay `trace` ((times, {param: values}) from load_trace()) on the node1-node2 link.
+
+        Both interfaces of every connection between the nodes follow the
+        trace, as both carry the link's TCLink parameters. `params`
+        restricts the trace to some of its columns.
+        """
+        times, values = trace
+        if params is not None:
+            values = {param: values[param] for param in params if param in values}
+        n1, n2 = self.net.get(node1, node2)
+        intfs = [intf for pair in n1.connectionsTo(n2) for intf in pair]
+        if not intfs:
+            raise ValueError(f"{node1} and {node2} are not connected")
+        self.links.append({'name': name or f'{node1}-{node2}', 'intfs': intfs,
+                           'times': np.asarray(times, dtype=np.float64), 'values': values})
+        return self
+
+    def columns(self):
+        return ['planned'] + [f"{link['name']}.{param}" for link in self.links for param in link['values']]
+
+    def prepare(self):
+        """Put the traced interfaces into their initial state and plan every change."""
+        with getattr(self.net, 'batched', nullcontext)():
+            for link in self.links:
+                link['state'] = []
+                for intf in link['intfs']:
+                    params = _intf_params(intf)
+                    for param, values in link['values'].items():
+                        first = values[~np.isnan(values)]
+                        if len(first):
+                            params[param] = float(first[0])
+                    # A netem is needed to change delay or loss later, even if they start at 0
+                    if any(param in link['values'] for param in _NETEM) and params.get('delay') is None:
+                        params['delay'] = 0.0
+                    link['state'].append(params)
+                    intf.config(**_mininet_params(params))
+
+        # One event per distinct time: {node: batch lines} and the values recorded for it
+        changes = {}
+        for index, link in enumerate(self.links):
+            for i, t in enumerate(link['times']):
+                changed = {param: float(values[i]) for param, values in link['values'].items()
+                           if not np.isnan(values[i])}
+                if changed:
+                    changes.setdefault(float(t), []).append((index, changed))
+        current = [[float(values[~np.isnan(values)][0]) if (~np.isnan(values)).any() else np.nan
+                    for values in link['values'].values()] for link in self.links]
+        self.events = []
+        for t in sorted(changes):
+            lines = {}
+            for index, changed in changes[t]:
+                link = self.links[index]
+                for intf, params in zip(link['intfs'], link['state']):
+                    params.update(changed)
+                    lines.setdefault(intf.node, []).extend(change_commands(intf, params))
+                current[index] = [link['state'][0].get(param, np.nan) for param in link['values']]
+            data = {node: ''.join(line + '\n' for line in node_lines).encode() for node, node_lines in lines.items()}
+            self.events.append((t, data, [t] + [v for values in current for v in values]))
+
+        out_dir = os.path.dirname(self.out_file) or '.'
+        os.makedirs(out_dir, exist_ok=True)
+        self.batches = {}
+        for node in {node for _, data, _ in self.events for node in data}:
+            log_file = os.path.join(out_dir, f'{self.name}_{node.name}_tc.log')
+            self.batches[node] = self.procs.start(node, ['tc', '-force', '-batch', '-'], log_file,
+                                                  name='tc-batch', stdin=PIPE)
+        self.sink = MetricsSink(self.out_file, self.columns(), dtype='<f8',
+                                meta={'links': [{'name': link['name'], 'intfs': [f'{i.node.name}:{i.name}' for i in link['intfs']],
+                                                 'params': list(link['values'])} for link in self.links]})
+        return self
+
+    def run(self, t0=None):
+        """Dispatch the changes in the calling thread until the last one or stop()."""
+        if self.sink is None:
+            self.prepare()
+        if t0 is None:
+            t0 = time.monotonic()
+        self.t0 = t0
+        for t, data, values in self.events:
+            if self._stop.wait(max(0.0, t0 + t - time.monotonic())):
+                break
+            for node, lines in data.items():
+                stdin = self.batches[node].popen.stdin
+                stdin.write(lines)
+                stdin.flush()
+            self.sink.append(time.monotonic() - t0, values)
+
+    def start(self, t0=None):
+        """Dispatch the changes from a background thread."""
+        if self.sink is None:
+            self.prepare()
+        self._thread = threading.Thread(target=self.run, args=(t0,))
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop dispatching, let tc finish the lines it was given and close the record."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        for proc in self.batches.values():
+            proc.popen.stdin.close()
+            self.procs.wait(timeout=5.0, pid=proc.pid)
+            self.procs.stop(pid=proc.pid)
+        if self.sink is not None:
+            self.sink.close()
+            update_meta(self.out_file, **self.summary())
+
+    def errors(self):
+        """tc error lines of the batches, per node (htb quantum warnings are left out)."""
+        errors = {}
+        for node, proc in self.batches.items():
+            with open(proc.log_file) as f:
+                lines = [line.strip() for line in f if line.strip() and not line.startswith('Warning:')]
+            if lines:
+                errors[node.name] = lines
+        return errors
+
+    def summary(self):
+        """Planned and applied changes and how late they were dispatched (ms)."""
+        records = load(self.out_file)
+        lag = (records['t'] - records['planned']) * 1000
+        summary = {'changes': len(self.events), 'applied': len(records),
+                   'tc_errors': sum(len(lines) for lines in self.errors().values())}
+        if len(lag):
+            summary.update(lag_p50_ms=round(float(np.percentile(lag, 50)), 3),
+                           lag_p99_ms=round(float(np.percentile(lag, 99)), 3),
+                           lag_max_ms=round(float(lag.max()), 3))
+        return summary
+
+    def write_csv(self, path):
+        """Applied trace as CSV: t (dispatch time), planned, then <link>.<param> columns."""
+        export_csv(path, load(self.out_file))
+        return path
+
+    def metadata(self, csv_file=None):
+        """Traced links and dispatch statistics for run metadata."""
+        meta = load_meta(self.out_file)
+        if csv_file:
+            meta['file'] = os.path.basename(csv_file)
+        return meta
+
+def print_summary(summary, info=sys.stdout.write):
+    if 'lag_p50_ms' not in summary:
+        info(f"   link trace: none of {summary['changes']} changes applied\n")
+        return
+    info(f"   link trace: {summary['applied']}/{summary['changes']} changes applied, dispatch lag "
+         f"p50 {summary['lag_p50_ms']:.2f} ms, p99 {summary['lag_p99_ms']:.2f} ms, "
+         f"max {summary['lag_max_ms']:.2f} ms\n")
+    if summary['tc_errors']:
+        info(f"   WARNING: tc reported {summary['tc_errors']} errors, see the *_tc.log files\n")
+
+def square_trace(duration, step, low=5.0, high=20.0, period=1.0):
+    """Synthetic trace for the benchmark: bw alternating between `low` and `high`
+    Mbps every period/2 and a delay ramp from 5 to 50 ms, one line every `step` seconds."""
+    times = np.arange(0, duration, step)
+    bw = np.where((times % period) < period / 2, high, low)
+    delay = 5 + 45 * (times % period) / period
+    return times, {'bw': bw, 'delay': np.round(delay, 3)}
+
+def benchmark(duration, step, out_dir):
+    """Replay square_trace() on a shaped h1-h2 link and report the dispatch lag."""
+    from mininet.topo import Topo
+    from mininet.link import TCLink
+    from session import ExperimentSession
+
+    topo = Topo()
+    topo.addLink(topo.addHost('h1'), topo.addHost('h2'), cls=TCLink, bw=10, delay='10ms', max_queue_size=100)
+    with ExperimentSession(topo) as session:
+        with session.trial() as net:
+            trace = LinkTrace(net, session.procs, os.path.join(out_dir, 'link_trace.bin'))
+            trace.add('h1', 'h2', square_trace(duration, step))
+            trace.prepare()
+            cpu = time.process_time()
+            trace.run(time.monotonic() + 0.1)
+            cpu = time.process_time() - cpu
+            trace.stop()
+            summary = trace.summary()
+    print_summary(summary)
+    print(f"   {summary['applied'] / duration:.0f} changes/s on 2 interfaces, {cpu:.2f} s CPU in the scheduler")
+    return summary
+
+def parse_args(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(description='Dispatch lag of a link trace replayed with in-place tc changes')
+    parser.add_argument('--duration', type=float, default=10, help='trace length (seconds)')
+    parser.add_argument('--step', type=float, default=0.01, help='trace granularity (seconds)')
+    parser.add_argument('--dir', default='link_trace_bench', help='directory for the applied trace')
+    return parser.parse_args(argv)
+
+if __name__ == '__main__':
+    if os.geteuid() != 0:
+        print("This script must be run as root.")
+        print("Please run with: sudo python %s" % sys.argv[0])
+        sys.exit(1)
+    from mininet.log import setLogLevel
+    setLogLevel('warning')
+    args = parse_args()
+    benchmark(args.duration, args.step, args.dir)
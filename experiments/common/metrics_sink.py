@@ -0,0 +1,155 @@
+#!/usr/bin/python
+
+import json
+import os
+import queue
+import threading
+
+import numpy as np
+
+class MetricsSink:
+    """Buffered writer of fixed-width time-series records.
+
+    Rows are collected in a ring of preallocated NumPy blocks. Full blocks
+    (and partial ones, every `flush_interval` seconds, or at the next row if
+    the sampler is busy then) are appended to `path` as raw records by a
+    background thread, so the file is opened once per run and nothing is
+    formatted on the sampling path. Column names and the record dtype go to
+    `path + '.json'`; use load() to map the file back.
+    """
+
+    def __init__(self, path, columns, dtype='<i8', block_size=4096, blocks=8,
+                 flush_interval=1.0, meta=None):
+        # The writer holds one block while the sampler fills the next
+        if blocks < 2:
+            raise ValueError(f"a sink needs at least 2 blocks, got {blocks}")
+        self.path = path
+        self.columns = list(columns)
+        self.dtype = np.dtype([('t', '<f8')] + [(c, dtype) for c in self.columns])
+        self.flush_interval = flush_interval
+        self.rows = 0
+
+        with open(path + '.json', 'w') as f:
+            json.dump({'columns': self.columns, 'dtype': self.dtype.descr,
+                       'meta': meta or {}}, f, indent=2)
+
+        self._free = queue.Queue()
+        for _ in range(blocks):
+            self._free.put(np.empty(block_size, dtype=self.dtype))
+        self._filled = queue.Queue()
+        self._lock = threading.Lock()
+        self._block = self._free.get()
+        self._fill = 0
+        # Set by the writer when a partial block is due but the sampler holds the lock
+        self._flush_due = threading.Event()
+        self._file = open(path, 'wb')
+        self._closed = threading.Event()
+        self._writer = threading.Thread(target=self._write_loop)
+        self._writer.daemon = True
+        self._writer.start()
+
+    def append(self, t, values):
+        """Add one row; `values` is aligned with `columns`."""
+        with self._lock:
+            self._block[self._fill] = (t, *values)
+            self._fill += 1
+            self.rows += 1
+            if self._fill == len(self._block) or self._flush_due.is_set():
+                self._flush_due.clear()
+                self._swap()
+
+    def extend(self, t, values):
+        """Add many rows: `t` is an array of times, `values` one array per column."""
+        with self._lock:
+            done = 0
+            while done < len(t):
+                n = min(len(t) - done, len(self._block) - self._fill)
+                rows = self._block[self._fill:self._fill + n]
+                rows['t'] = t[done:done + n]
+                for column, value in zip(self.columns, values):
+                    rows[column] = value[done:done + n]
+                self._fill += n
+                self.rows += n
+                done += n
+                if self._fill == len(self._block):
+                    self._swap()
+            if self._fill and self._flush_due.is_set():
+                self._flush_due.clear()
+                self._swap()
+
+    def _swap(self):
+        # Caller holds the lock; blocks here only if every block awaits the disk
+        self._filled.put((self._block, self._fill))
+        self._block = self._free.get()
+        self._fill = 0
+
+    def flush(self):
+        """Hand the current partial block to the writer."""
+        with self._lock:
+            if self._fill:
+                self._swap()
+
+    def _flush_partial(self):
+        # The writer never waits for the lock: its holder may be waiting in
+        # _swap() for the writer to free a block
+        if not self._lock.acquire(blocking=False):
+            self._flush_due.set()
+            return
+        try:
+            # Only the writer frees blocks, so one free now is still free in _swap()
+            if self._fill and not self._free.empty():
+                self._swap()
+        finally:
+            self._lock.release()
+
+    def _write_loop(self):
+        while True:
+            try:
+                block, n = self._filled.get(timeout=self.flush_interval)
+            except queue.Empty:
+                self._flush_partial()
+                continue
+            if block is None:
+                break
+            self._file.write(block[:n].tobytes())
+            self._file.flush()
+            self._free.put(block)
+
+    def close(self):
+        if self._closed.is_set():
+            return
+        self.flush()
+        self._closed.set()
+        self._filled.put((None, 0))
+        self._writer.join()
+        self._file.close()
+
+def load(path, mode='r'):
+    """Map the records written by a MetricsSink as a structured array."""
+    with open(path + '.json') as f:
+        header = json.load(f)
+    dtype = np.dtype([tuple(field) for field in header['dtype']])
+    if os.path.getsize(path) == 0:
+        return np.empty(0, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode=mode)
+
+def load_meta(path):
+    with open(path + '.json') as f:
+        return json.load(f)['meta']
+
+def update_meta(path, **fields):
+    """Merge `fields` into the metadata of a MetricsSink file, e.g. totals known only after close()."""
+    with open(path + '.json') as f:
+        header = json.load(f)
+    header['meta'].update(fields)
+    with open(path + '.json', 'w') as f:
+        json.dump(header, f, indent=2)
+
+def export_csv(path, records, columns=None, fmt='%.6f'):
+    """Write selected columns of `records` (including 't') to a CSV file."""
+    if columns is None:
+        columns = records.dtype.names
+    data = np.column_stack([records[c] for c in columns]) if len(records) else \
+        np.empty((0, len(columns)))
+    np.savetxt(path, data, delimiter=',', header=','.join(columns),
+               comments='', fmt=fmt)
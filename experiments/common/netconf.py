@@ -0,0 +1,61 @@
+#!/usr/bin/python
+
+from subprocess import PIPE, STDOUT
+
+def batch_commands(config):
+    """Translate one node's entry of a routing table into `ip -batch` lines.
+
+    `config` holds 'addrs': [(intf, 'a.b.c.d/len'), ...],
+    'routes': [('default' or 'net/len', gateway), ...] and optionally
+    'commands': further `ip` commands run after them, e.g. rules or
+    'mptcp endpoint add ...'.
+    """
+    lines = []
+    intfs = []
+    for intf, cidr in config.get('addrs', []):
+        if intf not in intfs:
+            lines.append(f'addr flush dev {intf}')
+            lines.append(f'link set {intf} up')
+            intfs.append(intf)
+        lines.append(f'addr add {cidr} dev {intf}')
+    for dst, gw in config.get('routes', []):
+        lines.append(f'route replace {dst} via {gw}')
+    lines.extend(config.get('commands', []))
+    return lines
+
+def apply_table(net, table):
+    """Apply a routing table with one `ip -batch` process per node, all in parallel.
+
+    Returns {node: output} for nodes whose batch failed.
+    """
+    procs = {}
+    for name, config in table.items():
+        node = net.get(name)
+        script = '\n'.join(batch_commands(config)) + '\n'
+        proc = node.popen(['ip', '-force', '-batch', '-'],
+                          stdin=PIPE, stdout=PIPE, stderr=STDOUT)
+        proc.stdin.write(script.encode())
+        proc.stdin.close()
+        procs[name] = proc
+
+        # Keep Mininet's view of the interface addresses in sync
+        for intf, cidr in config.get('addrs', []):
+            ip, prefix = cidr.split('/')
+            node.intf(intf).ip = ip
+            node.intf(intf).prefixLen = int(prefix)
+
+    failed = {}
+    for name, proc in procs.items():
+        output = proc.stdout.read().decode()
+        if proc.wait() != 0:
+            failed[name] = output
+    return failed
+
+def check_connectivity(net, pairs, count=1, timeout=2.0):
+    """Probe every (source, destination address) pair concurrently with rtt_probe.
+
+    Returns {(source, address): median RTT in seconds, or None if no probe
+    was echoed within `timeout`}, so the result also reads as True/False.
+    """
+    from rtt_probe import probe_rtts
+    return probe_rtts(net, pairs, count, timeout)
@@ -0,0 +1,224 @@
+#!/usr/bin/python
+
+import ctypes
+import os
+import socket
+import struct
+import threading
+
+# netlink protocols
+NETLINK_ROUTE = 0
+NETLINK_SOCK_DIAG = 4
+
+# nlmsghdr flags and control message types
+NLM_F_REQUEST = 0x1
+NLM_F_DUMP = 0x300
+NLMSG_ERROR = 2
+NLMSG_DONE = 3
+
+# rtnetlink message types and attributes
+RTM_GETLINK = 18
+RTM_GETQDISC = 38
+IFLA_IFNAME = 3
+TCA_KIND = 1
+TCA_STATS2 = 7
+TCA_STATS_BASIC = 1
+TCA_STATS_QUEUE = 3
+
+# sock_diag
+SOCK_DIAG_BY_FAMILY = 20
+INET_DIAG_INFO = 2
+
+# TCP states (include/net/tcp_states.h)
+TCP_STATES = ('', 'ESTABLISHED', 'SYN_SENT', 'SYN_RECV', 'FIN_WAIT1', 'FIN_WAIT2',
+              'TIME_WAIT', 'CLOSE', 'CLOSE_WAIT', 'LAST_ACK', 'LISTEN', 'CLOSING')
+# Sockets that carry data; listening, closed and TIME_WAIT sockets are left out
+DATA_STATES = sum(1 << TCP_STATES.index(state) for state in
+                  ('ESTABLISHED', 'SYN_SENT', 'SYN_RECV', 'FIN_WAIT1', 'FIN_WAIT2',
+                   'CLOSE_WAIT', 'LAST_ACK', 'CLOSING'))
+
+CLONE_NEWNET = 0x40000000
+
+_NLMSGHDR = struct.Struct('=IHHII')
+_RTATTR = struct.Struct('=HH')
+_TCMSG = struct.Struct('=BxxxiIII')
+_IFINFOMSG = struct.Struct('=BxHiII')
+# inet_diag_req_v2 with its inet_diag_sockid
+_INET_DIAG_REQ = struct.Struct('=BBBxI')
+_INET_DIAG_PORTS = struct.Struct('>HH')
+_INET_DIAG_SOCKID = struct.Struct('=4x16s16sIQ')
+_INET_DIAG_MSG_LEN = 72
+_GNET_BASIC = struct.Struct('=QI')
+_GNET_QUEUE = struct.Struct('=IIIII')
+
+# (name, format, offset) of the struct tcp_info fields that are kept
+TCP_INFO_FIELDS = (
+    ('state', 'B', 0),
+    ('ca_state', 'B', 1),
+    ('rto_us', 'I', 8),
+    ('snd_mss', 'I', 16),
+    ('unacked', 'I', 24),
+    ('lost', 'I', 32),
+    ('rtt_us', 'I', 68),
+    ('rttvar_us', 'I', 72),
+    ('ssthresh', 'I', 76),
+    ('cwnd', 'I', 80),
+    ('total_retrans', 'I', 100),
+    ('pacing_rate', 'Q', 104),
+    ('bytes_acked', 'Q', 120),
+    ('min_rtt_us', 'I', 148),
+    ('delivery_rate', 'Q', 160),
+    ('bytes_retrans', 'Q', 208),
+)
+_TCP_INFO = struct.Struct('=' + ''.join(
+    ('%dx' % (offset - end) if offset > end else '') + fmt
+    for (_, fmt, offset), end in zip(
+        TCP_INFO_FIELDS,
+        [0] + [offset + struct.calcsize(fmt) for _, fmt, offset in TCP_INFO_FIELDS])))
+
+QDISC_STATS = ('bytes', 'packets', 'qlen', 'backlog', 'drops', 'requeues', 'overlimits')
+
+_libc = None
+
+def _setns(fd):
+    global _libc
+    if _libc is None:
+        _libc = ctypes.CDLL(None, use_errno=True)
+    if _libc.setns(fd, CLONE_NEWNET) != 0:
+        errno = ctypes.get_errno()
+        raise OSError(errno, os.strerror(errno))
+
+def netns_socket(pid, protocol):
+    """Netlink socket bound to the network namespace of process `pid`.
+
+    A socket belongs to the namespace it was created in, so the socket is
+    created in a short-lived thread that first joins the namespace of
+    `pid`; the calling thread is never moved. The socket is then used
+    from any thread.
+    """
+    result = {}
+
+    def create():
+        try:
+            fd = os.open(f'/proc/{pid}/ns/net', os.O_RDONLY)
+            try:
+                _setns(fd)
+            finally:
+                os.close(fd)
+            result['sock'] = socket.socket(socket.AF_NETLINK, socket.SOCK_RAW, protocol)
+        except OSError as e:
+            result['error'] = e
+
+    thread = threading.Thread(target=create)
+    thread.start()
+    thread.join()
+    if 'error' in result:
+        raise result['error']
+    return NetlinkSocket(result['sock'])
+
+def parse_attrs(data, offset=0, end=None):
+    """{type: payload} of the rtattrs in data[offset:end]."""
+    if end is None:
+        end = len(data)
+    attrs = {}
+    while offset + 4 <= end:
+        length, kind = _RTATTR.unpack_from(data, offset)
+        if length < 4:
+            break
+        attrs[kind & 0x3fff] = data[offset + 4:offset + length]
+        offset += (length + 3) & ~3
+    return attrs
+
+class NetlinkSocket:
+    """A netlink socket issuing dump requests."""
+
+    def __init__(self, sock, bufsize=1 << 20):
+        self.sock = sock
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, bufsize)
+        self.buf = bytearray(1 << 17)
+        self.seq = 0
+
+    def dump(self, msg_type, payload):
+        """Send a dump request and yield (type, message bytes) of every reply.
+
+        The message bytes start after the nlmsghdr.
+        """
+        self.seq += 1
+        seq = self.seq
+        self.sock.send(_NLMSGHDR.pack(_NLMSGHDR.size + len(payload), msg_type,
+                                      NLM_F_REQUEST | NLM_F_DUMP, seq, 0) + payload)
+        view = memoryview(self.buf)
+        while True:
+            n = self.sock.recv_into(self.buf)
+            offset = 0
+            while offset + _NLMSGHDR.size <= n:
+                length, kind, _, msg_seq, _ = _NLMSGHDR.unpack_from(self.buf, offset)
+                if length < _NLMSGHDR.size:
+                    return
+                if msg_seq == seq:
+                    if kind == NLMSG_DONE:
+                        return
+                    if kind == NLMSG_ERROR:
+                        errno = -struct.unpack_from('=i', self.buf, offset + _NLMSGHDR.size)[0]
+                        if errno:
+                            raise OSError(errno, os.strerror(errno))
+                        return
+                    yield kind, bytes(view[offset + _NLMSGHDR.size:offset + length])
+                offset += (length + 3) & ~3
+
+    def close(self):
+        self.sock.close()
+
+def interfaces(nl):
+    """{ifindex: name} of every interface in the socket's namespace (NETLINK_ROUTE)."""
+    names = {}
+    for _, msg in nl.dump(RTM_GETLINK, _IFINFOMSG.pack(socket.AF_UNSPEC, 0, 0, 0, 0)):
+        _, _, index, _, _ = _IFINFOMSG.unpack_from(msg)
+        name = parse_attrs(msg, _IFINFOMSG.size).get(IFLA_IFNAME)
+        if name is not None:
+            names[index] = name.rstrip(b'\0').decode()
+    return names
+
+def qdisc_stats(nl, ifindex=0):
+    """One RTM_GETQDISC dump (NETLINK_ROUTE socket).
+
+    Returns a list of (ifindex, handle, parent, kind, stats) where stats is
+    a tuple in QDISC_STATS order. A non-zero `ifindex` asks the kernel to
+    dump that interface only; callers should still filter on it.
+    """
+    qdiscs = []
+    for _, msg in nl.dump(RTM_GETQDISC, _TCMSG.pack(socket.AF_UNSPEC, ifindex, 0, 0, 0)):
+        _, index, handle, parent, _ = _TCMSG.unpack_from(msg)
+        attrs = parse_attrs(msg, _TCMSG.size)
+        kind = attrs.get(TCA_KIND, b'').rstrip(b'\0').decode()
+        stats = parse_attrs(attrs.get(TCA_STATS2, b''))
+        basic = stats.get(TCA_STATS_BASIC)
+        sent, packets = _GNET_BASIC.unpack_from(basic) if basic else (0, 0)
+        queue = stats.get(TCA_STATS_QUEUE)
+        qlen, backlog, drops, requeues, overlimits = \
+            _GNET_QUEUE.unpack_from(queue) if queue else (0, 0, 0, 0, 0)
+        qdiscs.append((index, handle, parent, kind,
+                       (sent, packets, qlen, backlog, drops, requeues, overlimits)))
+    return qdiscs
+
+def tcp_sockets(nl, family=socket.AF_INET, states=DATA_STATES):
+    """One sock_diag dump of the TCP sockets in `states` (NETLINK_SOCK_DIAG socket).
+
+    Returns a list of (cookie, src, sport, dst, dport, info) where src and
+    dst are the raw 16-byte address fields (an IPv4 address takes the first
+    four) and info is a tuple in TCP_INFO_FIELDS order.
+    """
+    request = (_INET_DIAG_REQ.pack(family, socket.IPPROTO_TCP, 1 << (INET_DIAG_INFO - 1), states)
+               + bytes(_INET_DIAG_SOCKID.size))
+    sockets = []
+    for _, msg in nl.dump(SOCK_DIAG_BY_FAMILY, request):
+        sport, dport = _INET_DIAG_PORTS.unpack_from(msg, 4)
+        src, dst, _, cookie = _INET_DIAG_SOCKID.unpack_from(msg, 4)
+        info = parse_attrs(msg, _INET_DIAG_MSG_LEN).get(INET_DIAG_INFO)
+        if info is None:
+            continue
+        if len(info) < _TCP_INFO.size:
+            # Older kernels report a shorter tcp_info; missing fields read as 0
+            info = info + bytes(_TCP_INFO.size - len(info))
+        sockets.append((cookie, src, sport, dst, dport, _TCP_INFO.unpack_from(info)))
+    return sockets
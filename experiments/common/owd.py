@@ -0,0 +1,280 @@
+#!/usr/bin/python
+
+import os
+import socket
+import struct
+
+import numpy as np
+
+from capture import Capture
+from metrics_sink import MetricsSink, load, load_meta, update_meta
+from pcap_analyzer import PcapReader
+
+# Packets still unmatched this long after the upstream capture saw them were lost on the way
+MAX_DELAY = 2.0
+
+PERCENTILES = (50, 99)
+
+# Per-packet records: time seen upstream (t), flow index, one-way delay and IP length
+PACKET_COLUMNS = ('flow', 'owd_ns', 'size')
+
+_M1 = np.uint64(0xbf58476d1ce4e5b9)
+_M2 = np.uint64(0x94d049bb133111eb)
+
+def _mix(h):
+    h = (h ^ (h >> np.uint64(30))) * _M1
+    h = (h ^ (h >> np.uint64(27))) * _M2
+    return h ^ (h >> np.uint64(31))
+
+def packet_keys(batch):
+    """64-bit hash of the header fields that stay the same on both sides of a link.
+
+    Addresses, ports, sequence and acknowledgment numbers, IP ID and
+    payload length; the IP ID tells retransmissions of a segment apart.
+    """
+    h = _mix((batch['src'].astype(np.uint64) << np.uint64(32)) | batch['dst'])
+    h = _mix(h ^ ((batch['sport'].astype(np.uint64) << np.uint64(48))
+                  | (batch['dport'].astype(np.uint64) << np.uint64(32)) | batch['seq']))
+    return _mix(h ^ ((batch['ipid'].astype(np.uint64) << np.uint64(48))
+                     | (batch['payload'].astype(np.uint64) << np.uint64(32)) | batch['ack']))
+
+def _flow_name(src, sport, dst, dport):
+    return '%s:%d->%s:%d' % (socket.inet_ntoa(struct.pack('!I', src)), sport,
+                             socket.inet_ntoa(struct.pack('!I', dst)), dport)
+
+def _batches(segments, batch_size):
+    for path in [segments] if isinstance(segments, str) else segments:
+        with PcapReader(path, batch_size) as reader:
+            for batch in reader.batches():
+                if len(batch):
+                    yield batch
+
+class _Upstream:
+    # One upstream capture, read only as far ahead as the downstream side needs
+    def __init__(self, segments, batch_size):
+        self.batches = _batches(segments, batch_size)
+        self.horizon = -np.inf
+
+    def read_until(self, t):
+        out = []
+        while self.horizon <= t:
+            batch = next(self.batches, None)
+            if batch is None:
+                self.horizon = np.inf
+                break
+            out.append(batch)
+            self.horizon = batch['ts'][-1]
+        return out
+
+class OneWayDelay:
+    """Streaming join of the same packets captured before and after a queue.
+
+    The upstream captures (e.g. the ingress ports of r2) and the downstream
+    capture (the far end of the bottleneck link) are read in time order,
+    one batch at a time. Upstream packets wait in a table sorted by
+    packet_keys() until a downstream packet with the same key arrives; the
+    difference of the two timestamps is its one-way delay, which is exact
+    up to capture timestamping because all Mininet nodes share the host
+    clock. Packets still unmatched after `max_delay` seconds are counted as
+    lost. Only the packets in flight are held in memory; per-packet results
+    go to `out_file` (a MetricsSink file of PACKET_COLUMNS with times
+    relative to `t0`, the capture's epoch time), flow names and losses to
+    its metadata.
+    """
+
+    def __init__(self, out_file, max_delay=MAX_DELAY, t0=None, batch_size=65536):
+        self.out_file = out_file
+        self.max_delay = max_delay
+        self.t0 = t0
+        self.batch_size = batch_size
+        self.flows = {}
+        self.names = []
+        self.lost = np.zeros(0, dtype=np.int64)
+        self.matched = 0
+        self._keys = np.empty(0, dtype=np.uint64)
+        self._ts = np.empty(0)
+        self._flow = np.empty(0, dtype=np.int64)
+        self._size = np.empty(0, dtype=np.int64)
+
+    def _flow_index(self, batch):
+        keys = np.stack([batch['src'], batch['dst'], batch['sport'], batch['dport']], axis=1).astype(np.int64)
+        uniq, inverse = np.unique(keys, axis=0, return_inverse=True)
+        index = np.empty(len(uniq), dtype=np.int64)
+        for i, (src, dst, sport, dport) in enumerate(uniq.tolist()):
+            key = (src, sport, dst, dport)
+            if key not in self.flows:
+                self.flows[key] = len(self.names)
+                self.names.append(_flow_name(*key))
+            index[i] = self.flows[key]
+        if len(self.lost) < len(self.names):
+            self.lost = np.concatenate([self.lost, np.zeros(len(self.names) - len(self.lost), dtype=np.int64)])
+        return index[inverse.ravel()]
+
+    def _keep(self, keep):
+        self._keys, self._ts = self._keys[keep], self._ts[keep]
+        self._flow, self._size = self._flow[keep], self._size[keep]
+
+    def _add(self, batches):
+        if not batches:
+            return
+        batch = np.concatenate(batches)
+        keys = np.concatenate([self._keys, packet_keys(batch)])
+        ts = np.concatenate([self._ts, batch['ts']])
+        flow = np.concatenate([self._flow, self._flow_index(batch)])
+        # IP length (options-free IP header); the capture itself may be header-only
+        size = np.concatenate([self._size, batch['payload'].astype(np.int64) + batch['tcp_hlen'] + 20])
+        order = np.lexsort((ts, keys))
+        self._keys, self._ts, self._flow, self._size = keys[order], ts[order], flow[order], size[order]
+
+    def _expire(self, before):
+        old = self._ts < before
+        if old.any():
+            self.lost += np.bincount(self._flow[old], minlength=len(self.lost))
+            self._keep(~old)
+
+    def _match(self, batch, sink):
+        if not len(self._keys):
+            return
+        keys = packet_keys(batch)
+        idx = np.minimum(np.searchsorted(self._keys, keys), len(self._keys) - 1)
+        found = (self._keys[idx] == keys) & (self._ts[idx] <= batch['ts'])
+        # An upstream packet matches its first downstream copy only
+        down = np.flatnonzero(found)
+        up, first = np.unique(idx[down], return_index=True)
+        down = down[first]
+        if not len(up):
+            return
+        if self.t0 is None:
+            self.t0 = float(self._ts[up].min())
+        owd = np.round((batch['ts'][down] - self._ts[up]) * 1e9).astype(np.int64)
+        sink.extend(self._ts[up] - self.t0, [self._flow[up], owd, self._size[up]])
+        self.matched += len(up)
+        keep = np.ones(len(self._keys), dtype=bool)
+        keep[up] = False
+        self._keep(keep)
+
+    def run(self, upstream, downstream):
+        """Join `upstream` (a list of captures) with `downstream`; a capture is a file or a list of segments."""
+        upstream = [_Upstream(segments, self.batch_size) for segments in upstream]
+        sink = MetricsSink(self.out_file, PACKET_COLUMNS)
+        last = None
+        try:
+            for batch in _batches(downstream, self.batch_size):
+                last = batch['ts'][-1]
+                self._add([b for source in upstream for b in source.read_until(last)])
+                self._match(batch, sink)
+                self._expire(batch['ts'][0] - self.max_delay)
+        finally:
+            sink.close()
+        if last is not None:
+            # Packets the downstream capture could still have seen are not counted
+            self._expire(last - self.max_delay)
+        update_meta(self.out_file, t0=self.t0, flows=self.names, lost=self.lost.tolist(),
+                    max_delay=self.max_delay)
+        return self
+
+def _stats(values):
+    if not len(values):
+        return [np.nan] * (len(PERCENTILES) + 1)
+    return list(np.percentile(values, PERCENTILES)) + [values.max()]
+
+def delay_stats(path, base=None):
+    """Per-flow one-way delay and queue sojourn of a OneWayDelay result file.
+
+    The sojourn of a packet is its delay above `base`, by default the
+    smallest delay of any packet (the propagation and forwarding delay
+    with an empty queue). Returns (base, rows) with one row per flow and
+    one for all flows ('all'), delays in ms.
+    """
+    records = load(path)
+    meta = load_meta(path)
+    owd = records['owd_ns'] / 1e6
+    if base is None:
+        base = float(owd.min()) if len(owd) else 0.0
+    rows = []
+    names = meta['flows'] + ['all']
+    lost = meta['lost'] + [sum(meta['lost'])]
+    for i, name in enumerate(names):
+        values = owd if name == 'all' else owd[records['flow'] == i]
+        row = {'flow': name, 'packets': len(values), 'lost': lost[i]}
+        for prefix, series in (('owd', values), ('sojourn', values - base)):
+            for label, value in zip([f'p{p}' for p in PERCENTILES] + ['max'], _stats(series)):
+                row[f'{prefix}_{label}_ms'] = value
+        rows.append(row)
+    return base, rows
+
+def delay_series(path, bin_width=1.0, base=None):
+    """Queue sojourn distribution over time: (bin start, packets, p50, p99, max in ms) per bin."""
+    records = load(path)
+    owd = records['owd_ns'] / 1e6
+    if base is None:
+        base = float(owd.min()) if len(owd) else 0.0
+    bins = (records['t'] // bin_width).astype(np.int64)
+    rows = []
+    order = np.argsort(bins, kind='stable')
+    bins, sojourn = bins[order], owd[order] - base
+    for b, start in zip(*np.unique(bins, return_index=True)):
+        end = np.searchsorted(bins, b, side='right')
+        rows.append((b * bin_width, end - start, *_stats(sojourn[start:end])))
+    return rows
+
+def write_csvs(path, prefix, bin_width=1.0):
+    """Per-flow (`<prefix>_flows.csv`) and over-time (`<prefix>_series.csv`) delay summaries."""
+    base, rows = delay_stats(path)
+    fields = list(rows[0])
+    with open(prefix + '_flows.csv', 'w') as f:
+        f.write(','.join(fields) + '\n')
+        for row in rows:
+            f.write(','.join(str(row[field]) if isinstance(row[field], (str, int)) else '%.3f' % row[field]
+                             for field in fields) + '\n')
+    with open(prefix + '_series.csv', 'w') as f:
+        f.write('Time,Packets,Sojourn_p50_ms,Sojourn_p99_ms,Sojourn_max_ms\n')
+        for row in delay_series(path, bin_width, base):
+            f.write('%.3f,%d,%.3f,%.3f,%.3f\n' % row)
+    return base, rows
+
+def print_stats(base, rows):
+    print(f"base one-way delay {base:.3f} ms")
+    print(f"{'Flow':<44} {'Packets':>8} {'Lost':>6} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8}  (queue sojourn)")
+    for row in rows:
+        print(f"{row['flow']:<44} {row['packets']:>8d} {row['lost']:>6d} {row['sojourn_p50_ms']:>8.2f} "
+              f"{row['sojourn_p99_ms']:>8.2f} {row['sojourn_max_ms']:>8.2f}")
+
+def start_captures(procs, upstream, downstream, out_dir, expression='tcp'):
+    """Header-only captures of the packets entering and leaving a queue.
+
+    `upstream` is a list of (node, interface) where packets enter, e.g.
+    the ingress ports of the switch in front of the bottleneck, and
+    `downstream` the (node, interface) at the far end of the link. Only
+    incoming packets are captured, so each packet is seen once on either
+    side. Returns (upstream Captures, downstream Capture).
+    """
+    def capture(node, intf, side):
+        return Capture(procs, node, intf, os.path.join(out_dir, f'owd-{side}-{intf}'), segment_mb=100,
+                       expression=expression, direction='in', name=f'owd-{side}-{intf}').start()
+    return [capture(node, intf, 'up') for node, intf in upstream], capture(*downstream, 'down')
+
+def measure(upstream, downstream, out_dir, t0=None, max_delay=MAX_DELAY, bin_width=1.0, name='owd'):
+    """Stop the captures of start_captures(), join them and write `<name>.bin` and the CSVs to `out_dir`."""
+    for capture in upstream + [downstream]:
+        capture.stop()
+        capture.record(out_dir)
+    owd = OneWayDelay(os.path.join(out_dir, f'{name}.bin'), max_delay, t0)
+    owd.run([up.segments() for up in upstream], downstream.segments())
+    base, rows = write_csvs(owd.out_file, os.path.join(out_dir, name), bin_width)
+    return owd, base, rows
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description='One-way delay and queue sojourn from captures on both sides of a queue')
+    parser.add_argument('--upstream', nargs='+', action='append', required=True,
+                        help='segments of one capture taken before the queue (repeat for several)')
+    parser.add_argument('--downstream', nargs='+', required=True, help='segments of the capture after the queue')
+    parser.add_argument('--out', default='owd', help='prefix of the output files')
+    parser.add_argument('--max-delay', type=float, default=MAX_DELAY,
+                        help='seconds after which an unmatched packet counts as lost')
+    parser.add_argument('--bin', type=float, default=1.0, help='time bin of the sojourn series (seconds)')
+    args = parser.parse_args()
+
+    owd = OneWayDelay(args.out + '.bin', args.max_delay).run(args.upstream, args.downstream)
+    print_stats(*write_csvs(owd.out_file, args.out, args.bin))
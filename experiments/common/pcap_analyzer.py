@@ -0,0 +1,441 @@
+#!/usr/bin/python
+
+import gzip
+import mmap
+import os
+import shutil
+import socket
+import struct
+
+import numpy as np
+
+# Decoded TCP/IPv4 header fields, one record per packet
+PACKET_DTYPE = np.dtype([
+    ('ts', '<f8'),
+    ('src', '<u4'), ('dst', '<u4'),
+    ('sport', '<u2'), ('dport', '<u2'),
+    ('seq', '<u4'), ('ack', '<u4'),
+    ('flags', 'u1'), ('win', '<u2'),
+    ('ipid', '<u2'), ('payload', '<u4'),
+    ('tcp_offset', '<i8'), ('tcp_hlen', 'u1'),
+])
+
+FIN, SYN, RST, PSH, ACK = 0x01, 0x02, 0x04, 0x08, 0x10
+
+# Supported link types and the offset of the network header
+LINKTYPE_ETHERNET = 1
+LINKTYPE_RAW = 101
+LINKTYPE_LINUX_SLL = 113
+
+def _gunzip(f):
+    # The gzip trailer holds the uncompressed size (mod 2^32; segments are smaller)
+    f.seek(-4, os.SEEK_END)
+    size = struct.unpack('<I', f.read(4))[0]
+    f.seek(0)
+    mm = mmap.mmap(-1, max(size, 1))
+    with gzip.GzipFile(fileobj=f) as z:
+        shutil.copyfileobj(z, mm)
+    return mm
+
+class PcapReader:
+    """Memory-mapped pcap reader yielding batches of decoded TCP headers.
+
+    Only the record headers are walked in Python; header fields are gathered
+    from the mapping with vectorized NumPy indexing, one batch at a time.
+    Payload length comes from the IP total length, so header-only captures
+    (small snaplen) decode the same as full ones. A gzip-compressed capture
+    (`.gz`, e.g. a rotated segment) is decompressed into anonymous memory.
+    """
+
+    def __init__(self, path, batch_size=65536):
+        self.path = path
+        self.batch_size = batch_size
+        self._file = open(path, 'rb')
+        if path.endswith('.gz'):
+            self._mm = _gunzip(self._file)
+        else:
+            self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._buf = np.frombuffer(self._mm, dtype=np.uint8)
+
+        magic = self._mm[:4]
+        if magic in (b'\xd4\xc3\xb2\xa1', b'\x4d\x3c\xb2\xa1'):
+            self._endian = '<'
+        elif magic in (b'\xa1\xb2\xc3\xd4', b'\xa1\xb2\x3c\x4d'):
+            self._endian = '>'
+        else:
+            raise ValueError(f"{path}: not a pcap file (pcapng is not supported)")
+        self._ts_scale = 1e-9 if magic in (b'\x4d\x3c\xb2\xa1', b'\xa1\xb2\x3c\x4d') else 1e-6
+        self.linktype = struct.unpack_from(self._endian + 'I', self._mm, 20)[0] & 0x0fffffff
+        if self.linktype not in (LINKTYPE_ETHERNET, LINKTYPE_RAW, LINKTYPE_LINUX_SLL):
+            raise ValueError(f"{path}: unsupported link type {self.linktype}")
+        self._record = struct.Struct(self._endian + 'IIII')
+        self.packets = 0
+
+    def close(self):
+        del self._buf
+        self._mm.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _scan(self, pos):
+        # Walk record headers; a truncated trailing record ends the capture
+        end = len(self._mm)
+        unpack = self._record.unpack_from
+        offsets = []
+        while len(offsets) < self.batch_size and pos + 16 <= end:
+            incl = unpack(self._mm, pos)[2]
+            if pos + 16 + incl > end:
+                pos = end
+                break
+            offsets.append(pos)
+            pos += 16 + incl
+        return np.array(offsets, dtype=np.int64), pos
+
+    def _u16(self, idx):
+        buf = self._buf
+        return (buf[idx].astype(np.uint16) << 8) | buf[idx + 1]
+
+    def _u32(self, idx):
+        buf = self._buf
+        return ((buf[idx].astype(np.uint32) << 24) | (buf[idx + 1].astype(np.uint32) << 16) |
+                (buf[idx + 2].astype(np.uint32) << 8) | buf[idx + 3])
+
+    def _decode(self, rec):
+        words = np.stack([self._buf[rec + i] for i in range(16)], axis=1).copy()
+        header = words.view(self._endian + 'u4')
+        ts = header[:, 0] + header[:, 1] * self._ts_scale
+        incl = header[:, 2].astype(np.int64)
+        pkt = rec + 16
+
+        if self.linktype == LINKTYPE_ETHERNET:
+            keep = incl >= 14
+            ethertype = np.zeros(len(rec), dtype=np.uint16)
+            ethertype[keep] = self._u16(pkt[keep] + 12)
+            ip = pkt + 14
+            vlan = keep & (ethertype == 0x8100) & (incl >= 18)
+            ethertype[vlan] = self._u16(pkt[vlan] + 16)
+            ip[vlan] += 4
+            keep &= ethertype == 0x0800
+        elif self.linktype == LINKTYPE_LINUX_SLL:
+            keep = incl >= 16
+            ethertype = np.zeros(len(rec), dtype=np.uint16)
+            ethertype[keep] = self._u16(pkt[keep] + 14)
+            ip = pkt + 16
+            keep &= ethertype == 0x0800
+        else:
+            keep = incl >= 1
+            ip = pkt.copy()
+
+        # IPv4, TCP, first fragment, full IP + TCP header captured
+        keep &= (ip - pkt + 20) <= incl
+        ip, pkt, incl, ts = ip[keep], pkt[keep], incl[keep], ts[keep]
+        first = self._buf[ip]
+        ihl = (first & 0x0f).astype(np.int64) * 4
+        keep = ((first >> 4) == 4) & (self._buf[ip + 9] == 6) & \
+            ((self._u16(ip + 6) & 0x1fff) == 0) & ((ip - pkt + ihl + 20) <= incl)
+        ip, ihl, ts = ip[keep], ihl[keep], ts[keep]
+        tcp = ip + ihl
+
+        out = np.empty(len(ip), dtype=PACKET_DTYPE)
+        out['ts'] = ts
+        out['src'] = self._u32(ip + 12)
+        out['dst'] = self._u32(ip + 16)
+        out['ipid'] = self._u16(ip + 4)
+        out['sport'] = self._u16(tcp)
+        out['dport'] = self._u16(tcp + 2)
+        out['seq'] = self._u32(tcp + 4)
+        out['ack'] = self._u32(tcp + 8)
+        tcp_hlen = (self._buf[tcp + 12] >> 4).astype(np.int64) * 4
+        out['flags'] = self._buf[tcp + 13]
+        out['win'] = self._u16(tcp + 14)
+        payload = self._u16(ip + 2).astype(np.int64) - ihl - tcp_hlen
+        out['payload'] = np.maximum(payload, 0)
+        out['tcp_offset'] = tcp
+        out['tcp_hlen'] = tcp_hlen
+        return out
+
+    def batches(self):
+        """Yield PACKET_DTYPE arrays of at most `batch_size` TCP packets."""
+        pos = 24
+        while True:
+            rec, pos = self._scan(pos)
+            if not len(rec):
+                break
+            self.packets += len(rec)
+            yield self._decode(rec)
+
+    def window_scale(self, packet):
+        """Return the window scale option of a SYN packet, or None."""
+        start = int(packet['tcp_offset']) + 20
+        end = min(int(packet['tcp_offset']) + int(packet['tcp_hlen']), len(self._mm))
+        options = self._mm[start:end]
+        i = 0
+        while i < len(options):
+            kind = options[i]
+            if kind == 0:
+                break
+            if kind == 1:
+                i += 1
+                continue
+            if i + 1 >= len(options) or options[i + 1] < 2:
+                break
+            if kind == 3 and i + 2 < len(options):
+                return min(options[i + 2], 14)
+            i += options[i + 1]
+        return None
+
+class Series:
+    """Per-bin time series that grows with the capture."""
+
+    def __init__(self, how):
+        self.how = how
+        self.values = np.full(64, 0.0 if how == 'sum' else np.nan)
+
+    def _grow(self, n):
+        if n > len(self.values):
+            size = max(n, 2 * len(self.values))
+            fill = 0.0 if self.how == 'sum' else np.nan
+            self.values = np.concatenate([self.values, np.full(size - len(self.values), fill)])
+
+    def add(self, bins, values):
+        if not len(bins):
+            return
+        self._grow(int(bins[-1]) + 1)
+        if self.how == 'sum':
+            np.add.at(self.values, bins, values)
+        else:
+            # Bins are in time order, so the last entry of each run wins
+            last = np.r_[bins[1:] != bins[:-1], True]
+            self.values[bins[last]] = values[last]
+
+    def get(self, n, ffill=False):
+        self._grow(n)
+        values = self.values[:n].copy()
+        if ffill:
+            valid = ~np.isnan(values)
+            idx = np.where(valid, np.arange(n), 0)
+            np.maximum.accumulate(idx, out=idx)
+            values = values[idx]
+        return values
+
+def _unwrap(raw, base, last):
+    """Unwrap 32-bit sequence numbers relative to `base`, continuing from `last`."""
+    m = (raw.astype(np.int64) - base) & 0xffffffff
+    if last is None:
+        first = int(m[0])
+    else:
+        first = last + (int(m[0]) - (last & 0xffffffff) + 2**31) % 2**32 - 2**31
+    steps = (np.diff(m) + 2**31) % 2**32 - 2**31
+    return first + np.concatenate(([0], np.cumsum(steps)))
+
+class FlowDirection:
+    """Accumulated counters and per-bin series for one direction of a TCP connection."""
+
+    def __init__(self, key):
+        self.key = key
+        self.packets = 0
+        self.bytes = 0
+        self.retransmits = 0
+        self.retrans_bytes = 0
+        self.dupacks = 0
+        self.base = None
+        self.wscale = None
+        self.syn_seen = False
+        self._seq_last = None
+        self._snd_max = None
+        self._ack_last = None
+        self._ack_max = None
+        self._win_last = None
+        self.goodput = Series('sum')
+        self.snd_max = Series('last')
+        self.ack_max = Series('last')
+        self.window = Series('last')
+
+    @property
+    def name(self):
+        src, sport, dst, dport = self.key
+        return '%s:%d->%s:%d' % (socket.inet_ntoa(struct.pack('!I', src)), sport,
+                                 socket.inet_ntoa(struct.pack('!I', dst)), dport)
+
+class FlowAnalyzer:
+    """Stream a pcap through per-flow accounting with bounded memory.
+
+    Series times are relative to `t0` (capture timestamp, i.e. epoch seconds),
+    or to the first packet when t0 is None.
+    """
+
+    def __init__(self, bin_width=0.1, t0=None):
+        self.bin_width = bin_width
+        self.flows = {}
+        self.t0 = t0
+        self.t_end = None
+
+    def _flow(self, key):
+        flow = self.flows.get(key)
+        if flow is None:
+            flow = self.flows[key] = FlowDirection(key)
+        return flow
+
+    def feed(self, packets, reader=None):
+        if not len(packets):
+            return
+        if self.t0 is None:
+            self.t0 = float(packets['ts'][0])
+        self.t_end = float(packets['ts'][-1])
+        bins = np.maximum(((packets['ts'] - self.t0) / self.bin_width).astype(np.int64), 0)
+
+        keys = np.stack([packets['src'], packets['dst'],
+                         packets['sport'], packets['dport']], axis=1).astype(np.int64)
+        uniq, inverse = np.unique(keys, axis=0, return_inverse=True)
+        inverse = inverse.ravel()
+        order = np.argsort(inverse, kind='stable')
+        bounds = np.r_[0, np.cumsum(np.bincount(inverse, minlength=len(uniq)))]
+
+        groups = []
+        for g, (src, dst, sport, dport) in enumerate(uniq):
+            idx = order[bounds[g]:bounds[g + 1]]
+            flow = self._flow((int(src), int(sport), int(dst), int(dport)))
+            if flow.base is None:
+                flow.base = int(packets['seq'][idx[0]])
+            groups.append((flow, idx))
+
+        for flow, idx in groups:
+            self._process(flow, packets[idx], bins[idx], reader)
+
+    def _process(self, flow, p, bins, reader):
+        flags = p['flags']
+        syn = (flags & SYN) != 0
+        fin = (flags & FIN) != 0
+        rst = (flags & RST) != 0
+        has_ack = (flags & ACK) != 0
+        length = p['payload'].astype(np.int64)
+
+        if syn.any() and not flow.syn_seen:
+            flow.syn_seen = True
+            first_syn = p[np.argmax(syn)]
+            if reader is not None:
+                flow.wscale = reader.window_scale(first_syn)
+
+        flow.packets += len(p)
+        flow.bytes += int(length.sum())
+
+        # Sender side: highest sequence sent and retransmitted data
+        seq = _unwrap(p['seq'], flow.base, flow._seq_last)
+        flow._seq_last = int(seq[-1])
+        seq_end = seq + length + syn + fin
+        start = flow._snd_max if flow._snd_max is not None else np.iinfo(np.int64).min
+        running = np.maximum.accumulate(np.concatenate(([start], seq_end)))
+        retrans = (length > 0) & (seq_end <= running[:-1])
+        flow.retransmits += int(retrans.sum())
+        flow.retrans_bytes += int(length[retrans].sum())
+        flow._snd_max = int(running[-1])
+        flow.goodput.add(bins, np.where(retrans, 0, length))
+        flow.snd_max.add(bins, running[1:])
+
+        # Receiver side: cumulative ACKs, duplicate ACKs and advertised window
+        if has_ack.any():
+            peer = self._flow((flow.key[2], flow.key[3], flow.key[0], flow.key[1]))
+            a = p[has_ack]
+            if peer.base is None:
+                peer.base = int(a['ack'][0])
+            ack = _unwrap(a['ack'], peer.base, flow._ack_last)
+            win = a['win'].astype(np.int64)
+            prev_ack = np.concatenate(([flow._ack_last if flow._ack_last is not None else -1], ack[:-1]))
+            prev_win = np.concatenate(([flow._win_last if flow._win_last is not None else -1], win[:-1]))
+            pure = (length[has_ack] == 0) & ~(syn | fin | rst)[has_ack]
+            flow.dupacks += int((pure & (ack == prev_ack) & (win == prev_win)).sum())
+            flow._ack_last = int(ack[-1])
+            flow._win_last = int(win[-1])
+
+            start = flow._ack_max if flow._ack_max is not None else np.iinfo(np.int64).min
+            running = np.maximum.accumulate(np.concatenate(([start], ack)))[1:]
+            flow._ack_max = int(running[-1])
+            flow.ack_max.add(bins[has_ack], running)
+            unscaled = ~syn[has_ack]
+            flow.window.add(bins[has_ack][unscaled], win[unscaled])
+
+    def results(self, min_bytes=1):
+        """Return per data direction stats and series, largest flows first."""
+        if self.t_end is None:
+            return []
+        n = int((self.t_end - self.t0) / self.bin_width) + 1
+        times = np.arange(n) * self.bin_width
+        results = []
+        for flow in self.flows.values():
+            if flow.bytes < min_bytes:
+                continue
+            peer = self.flows.get((flow.key[2], flow.key[3], flow.key[0], flow.key[1]))
+            goodput = flow.goodput.get(n) * 8 / self.bin_width / 1e6
+            snd_max = flow.snd_max.get(n, ffill=True)
+            if peer is not None:
+                acked = peer.ack_max.get(n, ffill=True)
+                scale = peer.wscale if (peer.wscale is not None and flow.wscale is not None) else 0
+                window = peer.window.get(n, ffill=True) * (1 << scale)
+                dupacks = peer.dupacks
+            else:
+                acked = np.full(n, np.nan)
+                window = np.full(n, np.nan)
+                dupacks = 0
+            in_flight = np.clip(snd_max - acked, 0, None)
+            results.append({
+                'flow': flow.name,
+                'packets': flow.packets,
+                'bytes': flow.bytes,
+                'retransmits': flow.retransmits,
+                'retrans_bytes': flow.retrans_bytes,
+                'dupacks': dupacks,
+                'mean_mbps': float(np.mean(goodput[goodput > 0])) if (goodput > 0).any() else 0.0,
+                'time': times,
+                'throughput_mbps': goodput,
+                'in_flight': in_flight,
+                'adv_window': window,
+            })
+        results.sort(key=lambda r: r['bytes'], reverse=True)
+        return results
+
+def analyze(path, bin_width=0.1, batch_size=65536, min_bytes=1, t0=None):
+    """Stream `path` through a FlowAnalyzer and return results for flows of at least `min_bytes`.
+
+    `path` may also be a list of consecutive capture segments (see capture.py).
+    """
+    analyzer = FlowAnalyzer(bin_width, t0)
+    for segment in [path] if isinstance(path, str) else path:
+        with PcapReader(segment, batch_size) as reader:
+            for batch in reader.batches():
+                analyzer.feed(batch, reader)
+    return analyzer.results(min_bytes)
+
+def print_summary(results):
+    print(f"{'Flow':<44} {'MB':>9} {'Mbps':>7} {'Retrans':>8} {'DupACK':>7} {'MaxInFlight':>12} {'MaxWindow':>10}")
+    for r in results:
+        in_flight = np.nanmax(r['in_flight']) if np.isfinite(r['in_flight']).any() else 0
+        window = np.nanmax(r['adv_window']) if np.isfinite(r['adv_window']).any() else 0
+        print(f"{r['flow']:<44} {r['bytes'] / 1e6:>9.2f} {r['mean_mbps']:>7.2f} "
+              f"{r['retransmits']:>8d} {r['dupacks']:>7d} {in_flight:>12.0f} {window:>10.0f}")
+
+def write_series_csv(results, path):
+    """Write the per-flow series in long format (one row per flow and bin)."""
+    with open(path, 'w') as f:
+        f.write("Flow,Time,Throughput_Mbps,In_Flight_Bytes,Adv_Window_Bytes\n")
+        for r in results:
+            for row in zip(r['time'], r['throughput_mbps'], r['in_flight'], r['adv_window']):
+                f.write("%s,%.3f,%.3f,%.0f,%.0f\n" % ((r['flow'],) + row))
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description='Per-flow TCP analysis of a pcap capture')
+    parser.add_argument('pcap', nargs='+', help='capture file, or the segments of a rotated capture in order')
+    parser.add_argument('--bin', type=float, default=0.1, help='time bin width in seconds')
+    parser.add_argument('--csv', help='write per-flow time series to this CSV file')
+    args = parser.parse_args()
+
+    results = analyze(args.pcap, args.bin)
+    print_summary(results)
+    if args.csv:
+        write_series_csv(results, args.csv)
+        print(f"Per-flow series saved to {args.csv}")
@@ -0,0 +1,275 @@
+#!/usr/bin/python
+
+import csv
+import os
+
+import numpy as np
+
+from run_metadata import read_metadata
+
+# Throughput files looked up in a run directory, in order
+THROUGHPUT_FILES = ('throughput_log.csv', 'combined_traffic_flows.csv', 'bottleneck_flows.csv')
+
+PERCENTILES = (50, 95, 99)
+
+class Run:
+    """Throughput series and metadata of one run directory."""
+
+    def __init__(self, path, meta, time, flows):
+        self.path = path
+        self.meta = meta
+        self.time = time
+        self.flows = flows
+
+def _load_wide(path):
+    # Time,<Name>_Throughput_Mbps,...[,Total_Throughput_Mbps]
+    with open(path) as f:
+        header = f.readline().strip().split(',')
+    data = np.loadtxt(path, delimiter=',', skiprows=1, ndmin=2)
+    flows = {}
+    for i, column in enumerate(header[1:], 1):
+        name = column.replace('_Throughput_Mbps', '')
+        if name != 'Total':
+            flows[name] = data[:, i]
+    return data[:, 0], flows
+
+def _load_long(path):
+    # Flow,Time,Throughput_Mbps,... as written by pcap_analyzer
+    series = {}
+    with open(path) as f:
+        for row in csv.DictReader(f):
+            series.setdefault(row['Flow'], []).append((float(row['Time']), float(row['Throughput_Mbps'])))
+    time = np.unique(np.concatenate([np.array(s)[:, 0] for s in series.values()])) \
+        if series else np.empty(0)
+    flows = {}
+    for name, values in series.items():
+        values = np.array(values)
+        column = np.zeros(len(time))
+        column[np.searchsorted(time, values[:, 0])] = values[:, 1]
+        flows[name] = column
+    return time, flows
+
+def load_run(run_dir):
+    meta = read_metadata(run_dir)
+    names = [meta['throughput_file']] if 'throughput_file' in meta else THROUGHPUT_FILES
+    for name in names:
+        path = os.path.join(run_dir, name)
+        if not os.path.exists(path):
+            continue
+        with open(path) as f:
+            long_format = f.readline().startswith('Flow,')
+        time, flows = _load_long(path) if long_format else _load_wide(path)
+        return Run(run_dir, meta, time, flows)
+    raise FileNotFoundError(f"{run_dir}: no throughput file found")
+
+def capacity_series(run):
+    """Bottleneck capacity (Mbps) at each sample time of `run`, or None if unknown.
+
+    A 'capacity_trace' in the metadata (a CSV file with a time column 't'
+    and the capacity in `column`, e.g. the applied link trace) takes
+    precedence over the static 'bottleneck_mbps'; before its first change
+    the static value applies.
+    """
+    static = run.meta.get('bottleneck_mbps')
+    trace = run.meta.get('capacity_trace')
+    if not trace:
+        return None if not static else np.full(len(run.time), float(static))
+    path = os.path.join(run.path, trace['file'])
+    with open(path) as f:
+        header = f.readline().strip().split(',')
+    data = np.loadtxt(path, delimiter=',', skiprows=1, ndmin=2)
+    t, mbps = data[:, header.index('t')], data[:, header.index(trace['column'])]
+    index = np.searchsorted(t, run.time, side='right') - 1
+    before = float(static) if static else np.nan
+    return np.where(index >= 0, mbps[np.maximum(index, 0)], before) if len(t) else np.full(len(run.time), before)
+
+def _phases(run):
+    phases = run.meta.get('phases')
+    if not phases:
+        return [('all', -np.inf, np.inf)]
+    return [(p['name'], p['start'], np.inf if p.get('end') is None else p['end'])
+            for p in phases]
+
+def jain_index(rates, axis=-1):
+    """Jain's fairness index (sum x)^2 / (n * sum x^2) along `axis`."""
+    rates = np.asarray(rates, dtype=np.float64)
+    n = rates.shape[axis]
+    square_sum = np.sum(rates ** 2, axis=axis)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(square_sum > 0, np.sum(rates, axis=axis) ** 2 / (n * square_sum), np.nan)
+
+def windowed_rates(time, matrix, window=1.0):
+    """Trailing `window`-second mean of every row of a (flows x bins) throughput matrix."""
+    matrix = np.asarray(matrix, dtype=np.float64)
+    if matrix.shape[1] < 2:
+        return matrix.copy()
+    k = max(1, int(round(window / np.median(np.diff(time)))))
+    cumsum = np.concatenate([np.zeros((matrix.shape[0], 1)), np.cumsum(matrix, axis=1)], axis=1)
+    end = np.arange(1, matrix.shape[1] + 1)
+    begin = np.maximum(end - k, 0)
+    return (cumsum[:, end] - cumsum[:, begin]) / (end - begin)
+
+def sliding_jain(time, matrix, window=1.0):
+    """Jain's index over the `window`-second mean rates of the flows, at every bin."""
+    return jain_index(windowed_rates(time, matrix, window), axis=0)
+
+def convergence_time(time, matrix, start, tolerance=0.1, window=1.0):
+    """Seconds from `start` until every flow's share stays within ±tolerance of the fair share.
+
+    Shares are taken over `window`-second mean rates; the fair share is
+    1/n of their total. NaN if the shares are still outside the band at
+    the end of the series.
+    """
+    rates = windowed_rates(time, matrix, window)
+    total = rates.sum(axis=0)
+    fair = 1 / rates.shape[0]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        inside = np.all(np.abs(rates / total - fair) <= tolerance * fair, axis=0) & (total > 0)
+    after = time >= start
+    if not after.any() or not inside[after][-1]:
+        return np.nan
+    outside = np.flatnonzero(after & ~inside)
+    converged = time[outside[-1] + 1] if len(outside) else time[after][0]
+    return float(converged - start)
+
+def competition_stats(time, flows, start, tolerance=0.1, window=1.0):
+    """Throughput shares, sliding-window Jain's index and convergence time of `flows` competing from `start`.
+
+    `flows` is {name: throughput series on `time`}. Shares are of the mean
+    throughput from `start` on; the sliding Jain's index is summarized from
+    one window after `start`, once every flow has a full window of data.
+    """
+    names = sorted(flows)
+    matrix = np.vstack([flows[name] for name in names])
+    after = time >= start
+    means = matrix[:, after].mean(axis=1) if after.any() else np.zeros(len(names))
+    jain = sliding_jain(time, matrix, window)[time >= start + window]
+    jain = jain[np.isfinite(jain)]
+    return {'share': {name: float(mean / means.sum()) if means.sum() > 0 else np.nan
+                      for name, mean in zip(names, means)},
+            'mbps': {name: float(mean) for name, mean in zip(names, means)},
+            'jain_mean': float(jain.mean()) if len(jain) else np.nan,
+            'jain_min': float(jain.min()) if len(jain) else np.nan,
+            'convergence_s': convergence_time(time, matrix, start, tolerance, window)}
+
+def group_flows(flows, key):
+    """Sum the series of the flows whose names map to the same key(name), e.g. the streams of one sender."""
+    groups = {}
+    for name, series in flows.items():
+        group = key(name)
+        groups[group] = groups[group] + series if group in groups else np.array(series, dtype=np.float64)
+    return groups
+
+def phase_stats(run):
+    """Per-phase metrics of one run as {(phase, metric): value}."""
+    names = sorted(run.flows)
+    matrix = np.vstack([run.flows[name] for name in names]) if names else np.empty((0, len(run.time)))
+    total = matrix.sum(axis=0)
+    capacity = capacity_series(run)
+
+    stats = {}
+    for phase, start, end in _phases(run):
+        mask = (run.time >= start) & (run.time < end)
+        if not mask.any():
+            continue
+        rows = matrix[:, mask]
+        for name, row in zip(names + ['Total'], list(rows) + [total[mask]]):
+            stats[(phase, f'{name}.mean')] = float(row.mean())
+            for p, value in zip(PERCENTILES, np.percentile(row, PERCENTILES)):
+                stats[(phase, f'{name}.p{p}')] = float(value)
+        stats[(phase, 'jain')] = float(jain_index(rows.mean(axis=1)))
+        if capacity is not None:
+            stats[(phase, 'utilization')] = float(total[mask].mean() / np.nanmean(capacity[mask]))
+    return stats
+
+def bootstrap_ci(values, n_boot=2000, confidence=0.95, seed=0):
+    """Percentile bootstrap confidence interval of the mean across trials."""
+    values = np.asarray(values, dtype=np.float64)
+    values = values[~np.isnan(values)]
+    if len(values) == 0:
+        return np.nan, np.nan
+    if len(values) == 1:
+        return values[0], values[0]
+    rng = np.random.default_rng(seed)
+    means = values[rng.integers(0, len(values), size=(n_boot, len(values)))].mean(axis=1)
+    tail = (1 - confidence) / 2 * 100
+    low, high = np.percentile(means, [tail, 100 - tail])
+    return float(low), float(high)
+
+def summarize(run_dirs, n_boot=2000, confidence=0.95):
+    """Aggregate per-phase metrics over runs.
+
+    Returns a list of rows (phase, metric, n, mean, std, ci_low, ci_high).
+    """
+    per_run = [phase_stats(load_run(run_dir)) for run_dir in run_dirs]
+    keys = []
+    for stats in per_run:
+        keys.extend(key for key in stats if key not in keys)
+
+    rows = []
+    for phase, metric in keys:
+        values = np.array([stats.get((phase, metric), np.nan) for stats in per_run])
+        valid = values[~np.isnan(values)]
+        low, high = bootstrap_ci(valid, n_boot, confidence)
+        rows.append((phase, metric, len(valid), float(valid.mean()),
+                     float(valid.std(ddof=1)) if len(valid) > 1 else 0.0, low, high))
+    return rows
+
+def write_summary(rows, path):
+    with open(path, 'w') as f:
+        f.write("Phase,Metric,Runs,Mean,Std,CI_Low,CI_High\n")
+        for phase, metric, n, mean, std, low, high in rows:
+            f.write(f"{phase},{metric},{n},{mean:.4f},{std:.4f},{low:.4f},{high:.4f}\n")
+
+def print_summary(rows):
+    print(f"{'Phase':<16} {'Metric':<28} {'Runs':>5} {'Mean':>9} {'Std':>8} {'95% CI':>20}")
+    for phase, metric, n, mean, std, low, high in rows:
+        print(f"{phase:<16} {metric:<28} {n:>5d} {mean:>9.3f} {std:>8.3f} [{low:>8.3f}, {high:>8.3f}]")
+
+def plot_runs(run_dirs, path):
+    """Overlay the throughput series of all runs, with phases from metadata."""
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+
+    plt.figure(figsize=(10, 6))
+    capacity = None
+    phases = []
+    for run_dir in run_dirs:
+        run = load_run(run_dir)
+        for name, series in sorted(run.flows.items()):
+            plt.plot(run.time, series, alpha=0.4, label=f'{os.path.basename(os.path.normpath(run_dir))}: {name}')
+        if run.meta.get('capacity_trace'):
+            plt.step(run.time, capacity_series(run), where='post', color='k', linestyle=':', alpha=0.6)
+        else:
+            capacity = capacity or run.meta.get('bottleneck_mbps')
+        phases = phases or run.meta.get('phases', [])
+    for p in phases[1:]:
+        plt.axvline(x=p['start'], color='r', linestyle='--')
+    if capacity:
+        plt.axhline(y=capacity, color='k', linestyle=':', label=f'Bottleneck Capacity ({capacity} Mbps)')
+    plt.xlabel('Time (seconds)')
+    plt.ylabel('Throughput (Mbps)')
+    plt.grid(True)
+    if len(run_dirs) <= 5:
+        plt.legend()
+    plt.savefig(path)
+    plt.close()
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description='Per-phase statistics across experiment runs')
+    parser.add_argument('runs', nargs='+', help='run directories (with run.json and a throughput file)')
+    parser.add_argument('--out', help='write the summary table to this CSV file')
+    parser.add_argument('--plot', help='save an overlay plot of all runs to this file')
+    parser.add_argument('--boot', type=int, default=2000, help='bootstrap resamples')
+    args = parser.parse_args()
+
+    rows = summarize(args.runs, n_boot=args.boot)
+    print_summary(rows)
+    if args.out:
+        write_summary(rows, args.out)
+        print(f"Summary saved to {args.out}")
+    if args.plot:
+        plot_runs(args.runs, args.plot)
+        print(f"Plot saved to {args.plot}")
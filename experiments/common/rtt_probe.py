@@ -0,0 +1,148 @@
+#!/usr/bin/python
+
+import json
+from subprocess import PIPE, DEVNULL
+
+import numpy as np
+
+from metrics_sink import export_csv, load
+from supervisor import ProcessSupervisor
+from udp_probe import UDP_PROBE, RTT_PORT, INTERVAL, PERCENTILES
+
+# The prober and echo responder run in the nodes from udp_probe.py, which
+# imports no NumPy; this module launches them and analyzes their records
+
+def rtt_stats(rtt):
+    """Percentiles, mean and max of RTTs (an empty array gives an empty dict)."""
+    rtt = rtt[np.isfinite(rtt)]
+    if not len(rtt):
+        return {}
+    stats = {f'p{p}': float(v) for p, v in zip(PERCENTILES, np.percentile(rtt, PERCENTILES))}
+    stats.update(min=float(rtt.min()), mean=float(rtt.mean()), max=float(rtt.max()))
+    return stats
+
+def load_probes(path):
+    """(send times (s after t0), RTT ms, forward delay ms) of one prober, in send order; NaN for lost probes."""
+    records = np.sort(np.asarray(load(path)), order='t')
+    lost = records['rtt_us'] < 0
+    rtt = np.where(lost, np.nan, records['rtt_us'] / 1000)
+    fwd = np.where(lost, np.nan, records['fwd_us'] / 1000)
+    return records['t'], rtt, fwd
+
+def probe_summary(path, start=None, end=None):
+    """Sent, lost, loss and RTT statistics (ms) of the probes sent in [start, end)."""
+    t, rtt, _ = load_probes(path)
+    window = np.ones(len(t), dtype=bool)
+    if start is not None:
+        window &= t >= start
+    if end is not None:
+        window &= t < end
+    sent = int(window.sum())
+    lost = int(np.isnan(rtt[window]).sum())
+    return {'sent': sent, 'lost': lost, 'loss': lost / sent if sent else np.nan, 'rtt_ms': rtt_stats(rtt[window])}
+
+def rtt_series(path, bin_size=0.1):
+    """Per-bin probes sent, loss and RTT p50/p99/max (ms), as a structured array on the prober's t0."""
+    t, rtt, _ = load_probes(path)
+    dtype = [('t', '<f8'), ('sent', '<i8'), ('loss', '<f8'), ('rtt_p50_ms', '<f8'), ('rtt_p99_ms', '<f8'),
+             ('rtt_max_ms', '<f8')]
+    if not len(t):
+        return np.empty(0, dtype=dtype)
+    bins = np.floor(t / bin_size).astype(np.int64)
+    keys, first = np.unique(bins, return_index=True)
+    series = np.empty(len(keys), dtype=dtype)
+    series['t'] = keys * bin_size
+    for i, rows in enumerate(np.split(np.arange(len(t)), first[1:])):
+        answered = rtt[rows][np.isfinite(rtt[rows])]
+        series['sent'][i] = len(rows)
+        series['loss'][i] = 1 - len(answered) / len(rows)
+        if len(answered):
+            series['rtt_p50_ms'][i], series['rtt_p99_ms'][i] = np.percentile(answered, (50, 99))
+            series['rtt_max_ms'][i] = answered.max()
+        else:
+            series['rtt_p50_ms'][i] = series['rtt_p99_ms'][i] = series['rtt_max_ms'][i] = np.nan
+    return series
+
+def write_series_csv(paths, csv_path, bin_size=0.1):
+    """Binned series of several probers ({name: file}) in one CSV with a `probe` column."""
+    rows = []
+    for name, path in paths.items():
+        for row in rtt_series(path, bin_size):
+            rows.append((name,) + tuple(row))
+    with open(csv_path, 'w') as f:
+        f.write('probe,t,sent,loss,rtt_p50_ms,rtt_p99_ms,rtt_max_ms\n')
+        for row in rows:
+            f.write('%s,%.3f,%d,%.4f,%.3f,%.3f,%.3f\n' % row)
+    return csv_path
+
+def write_probes_csv(path, csv_path):
+    """Every probe of one prober: send time (s after t0), sequence number, forward delay and RTT (ms)."""
+    records = np.sort(np.asarray(load(path)), order='t')
+    export_csv(csv_path, records, ['t', 'seq', 'fwd_us', 'rtt_us'], fmt=['%.6f', '%d', '%d', '%d'])
+    return csv_path
+
+def print_summary(name, summary):
+    rtt = summary['rtt_ms']
+    if not rtt:
+        print(f"  {name}: {summary['sent']} probes, none answered")
+        return
+    print(f"  {name}: RTT p50 {rtt['p50']:.2f} ms, p95 {rtt['p95']:.2f}, p99 {rtt['p99']:.2f}, "
+          f"max {rtt['max']:.2f}; {summary['lost']}/{summary['sent']} probes lost")
+
+def start_echo(procs, node, port=RTT_PORT, log_file='/dev/null'):
+    """Start an echo responder on `node` and return once its port is bound."""
+    from launcher import start_server
+    return start_server(node, f'python3 {UDP_PROBE} echo --port {port}', port, log_file, proto='udp',
+                        supervisor=procs, name='rtt_echo')
+
+def start_probe(procs, node, dst, out_file, interval=INTERVAL, t0=None, duration=None, port=RTT_PORT,
+                size=64, log_file=None):
+    """Probe `dst` from `node` in the background, recording every probe to `out_file`.
+
+    Without `duration` it runs until stopped; SIGTERM (procs.stop()) ends
+    it cleanly.
+    """
+    cmd = f'python3 {UDP_PROBE} probe {dst} --port {port} --interval {interval} --size {size} --out {out_file}'
+    if t0 is not None:
+        cmd += f' --t0 {t0!r}'
+    if duration is not None:
+        cmd += f' --duration {duration}'
+    return procs.start(node, cmd, log_file=log_file, name='rtt_probe')
+
+def _owner(net, address):
+    for node in net.hosts:
+        if any(intf.IP() == address for intf in node.intfList()):
+            return node
+    return None
+
+def probe_rtts(net, pairs, count=3, timeout=2.0, interval=0.01, port=RTT_PORT):
+    """Median RTT (seconds) of every (source, destination address) pair, or None if it is unreachable.
+
+    Echo responders run on the nodes owning the destination addresses
+    while every source probes its destination until `count` echoes have
+    come back or `timeout` seconds have passed, all pairs concurrently.
+    The responders and probers are udp_probe.py processes, which start
+    without loading NumPy.
+    """
+    from launcher import wait_all_listening
+    procs = ProcessSupervisor()
+    owners = {dst: _owner(net, dst) for _, dst in pairs}
+    try:
+        echoes = [(node, procs.start(node, f'python3 {UDP_PROBE} echo --port {port}', name='rtt_echo').pid)
+                  for node in {node for node in owners.values() if node is not None}]
+        for error in wait_all_listening(echoes, port, 'udp').values():
+            print(f"WARNING: {error}")
+        probes = {}
+        for src, dst in pairs:
+            probes[(src, dst)] = net.get(src).popen(
+                ['python3', UDP_PROBE, 'probe', dst, '--port', str(port), '--interval', str(interval),
+                 '--count', str(count), '--duration', str(timeout)], stdout=PIPE, stderr=DEVNULL)
+        rtts = {}
+        for pair, proc in probes.items():
+            output = proc.communicate()[0].decode().strip().splitlines()
+            summary = json.loads(output[-1]) if proc.returncode == 0 and output else {}
+            rtt = summary.get('rtt_ms', {})
+            rtts[pair] = rtt['p50'] / 1000 if rtt else None
+        return rtts
+    finally:
+        procs.stop()
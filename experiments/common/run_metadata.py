@@ -0,0 +1,26 @@
+#!/usr/bin/python
+
+import json
+import os
+
+METADATA_FILE = 'run.json'
+
+def read_metadata(run_dir):
+    """Return the metadata of a run directory ({} if none was recorded)."""
+    path = os.path.join(run_dir, METADATA_FILE)
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+def write_metadata(run_dir, **fields):
+    """Merge `fields` into the metadata of a run directory."""
+    meta = read_metadata(run_dir)
+    meta.update(fields)
+    with open(os.path.join(run_dir, METADATA_FILE), 'w') as f:
+        json.dump(meta, f, indent=2, sort_keys=True)
+    return meta
+
+def phase(name, start, end=None):
+    """Phase entry for the 'phases' metadata field; end=None runs to the end."""
+    return {'name': name, 'start': start, 'end': end}
@@ -0,0 +1,127 @@
+#!/usr/bin/python
+
+from contextlib import contextmanager, nullcontext
+from subprocess import PIPE, STDOUT
+
+from mininet.net import Mininet
+from mininet.link import TCLink, TCIntf
+
+from host_tuning import apply_profile
+from supervisor import ProcessSupervisor
+
+# Run in every node between trials; tools that are missing are skipped
+RESET_COMMANDS = [
+    'conntrack -F',
+    'ip route flush cache',
+    'ip tcp_metrics flush all',
+]
+
+class ExperimentSession:
+    """Keep one Mininet network up across many trials.
+
+    The topology is built and configured once. Between trials reset() brings
+    it back to a known state: processes started through `procs` (a
+    ProcessSupervisor) and leftover shell jobs are stopped, shaped links are
+    reconfigured (which also zeroes their qdisc statistics), the sysctl
+    profile is reapplied and conntrack, route and TCP metrics caches are
+    flushed. `mininet` is the network class, e.g. BatchMininet for large
+    topologies.
+    """
+
+    def __init__(self, topo, setup=None, profile=None, link=TCLink, pid_file=None, mininet=Mininet, **params):
+        self.topo = topo
+        self.setup = setup
+        self.profile = profile
+        self.mininet = mininet
+        self.params = dict(params, link=link)
+        self.net = None
+        self.trials = 0
+        self.procs = ProcessSupervisor(pid_file)
+
+    def start(self):
+        self.net = self.mininet(topo=self.topo, **self.params)
+        self.net.start()
+        if self.setup:
+            self.setup(self.net)
+        if self.profile:
+            self._apply_profile()
+        return self.net
+
+    def stop(self):
+        self.procs.stop()
+        if self.net is not None:
+            self.net.stop()
+            self.net = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def nodes(self):
+        return self.net.hosts + self.net.switches
+
+    def set_profile(self, profile):
+        """Switch to another sysctl profile and apply it right away."""
+        self.profile = profile
+        self._apply_profile()
+
+    def configure_link(self, node1, node2, **params):
+        """Change the shaping of the node1-node2 link in place (e.g. bw, delay, max_queue_size)."""
+        n1, n2 = self.net.get(node1, node2)
+        for intf1, intf2 in n1.connectionsTo(n2):
+            for intf in (intf1, intf2):
+                intf.params.update(params)
+                intf.config(**intf.params)
+        # Keep the topology's view in sync for code that reads linkInfo()
+        self.topo.linkInfo(node1, node2).update(params)
+
+    def _apply_profile(self):
+        failed = apply_profile(self.net.hosts, self.profile)
+        for host, mismatches in failed.items():
+            for key, (wanted, actual) in mismatches.items():
+                print(f"WARNING: {host}: {key} is '{actual}', expected '{wanted}'")
+
+    def kill_jobs(self):
+        """Kill and reap background jobs started with `node.cmd('... &')`."""
+        for node in self.nodes():
+            node.cmd('kill -9 $(jobs -p) 2>/dev/null; wait 2>/dev/null')
+
+    def reset_qdiscs(self):
+        """Reapply the shaping of every TCLink, which recreates its qdiscs."""
+        # A BatchMininet runs the tc commands of all nodes in parallel
+        with getattr(self.net, 'batched', nullcontext)():
+            for link in self.net.links:
+                for intf in (link.intf1, link.intf2):
+                    if isinstance(intf, TCIntf) and intf.params:
+                        intf.config(**intf.params)
+
+    def flush_caches(self):
+        procs = []
+        script = '; '.join(f'{cmd} >/dev/null 2>&1' for cmd in RESET_COMMANDS)
+        for node in self.net.hosts:
+            procs.append(node.popen(['sh', '-c', script], stdout=PIPE, stderr=STDOUT))
+        for proc in procs:
+            proc.wait()
+
+    def reset(self):
+        self.procs.stop()
+        self.kill_jobs()
+        self.reset_qdiscs()
+        if self.profile:
+            self._apply_profile()
+        self.flush_caches()
+
+    @contextmanager
+    def trial(self):
+        """Run one trial on the warm network and reset it afterwards."""
+        if self.net is None:
+            self.start()
+        self.trials += 1
+        self.procs.begin_trial(self.trials)
+        try:
+            yield self.net
+        finally:
+            self.reset()
@@ -0,0 +1,150 @@
+#!/usr/bin/python
+
+import os
+import shlex
+import signal
+import time
+from subprocess import DEVNULL, STDOUT, TimeoutExpired
+
+class Process:
+    """One background process started by a ProcessSupervisor."""
+
+    def __init__(self, node, name, trial, popen, log_file):
+        self.node = node
+        self.name = name
+        self.trial = trial
+        self.popen = popen
+        self.log_file = log_file
+
+    @property
+    def pid(self):
+        return self.popen.pid
+
+    def running(self):
+        return self.popen.poll() is None
+
+    def __repr__(self):
+        return f"<{self.name} on {self.node.name} (PID {self.pid}, trial {self.trial})>"
+
+class ProcessSupervisor:
+    """Launch background processes in nodes and stop exactly those again.
+
+    Processes are started with node.popen, which runs them through
+    `mnexec -d` in a session of their own, so a signal to the process group
+    also reaches children such as the program behind `mptcpize run`. Every
+    process is tagged with its node, a name and the current trial, and
+    stop() selects on those instead of matching process names machine-wide,
+    so several experiments can run side by side on one host.
+
+    With `pid_file` the PIDs of running processes are also written to a
+    file, so cleanup.sh can kill what an aborted run left behind.
+    """
+
+    def __init__(self, pid_file=None):
+        self.pid_file = pid_file
+        self.procs = []
+        self.trial = 0
+
+    def begin_trial(self, trial=None):
+        """Tag processes started from now on with `trial` (default: the next number)."""
+        self.trial = self.trial + 1 if trial is None else trial
+
+    def start(self, node, cmd, log_file=None, name=None, **params):
+        """Start `cmd` (string or argument list) on `node` in the background.
+
+        Output goes to `log_file` (discarded if None) unless `stdout` is
+        given in `params`. Returns the Process.
+        """
+        args = shlex.split(cmd) if isinstance(cmd, str) else list(cmd)
+        if name is None:
+            name = os.path.basename(args[0])
+        log = None
+        if 'stdout' not in params:
+            log = open(log_file, 'w') if log_file is not None else None
+            params['stdout'] = log or DEVNULL
+        params.setdefault('stderr', STDOUT)
+        params.setdefault('stdin', DEVNULL)
+        try:
+            popen = node.popen(args, **params)
+        finally:
+            # The child has its own copy of the log descriptor
+            if log is not None:
+                log.close()
+
+        proc = Process(node, name, self.trial, popen, log_file)
+        self.procs.append(proc)
+        self._write_pid_file()
+        return proc
+
+    def processes(self, node=None, name=None, trial=None, pid=None, running=None):
+        """Tracked processes matching every given filter."""
+        return [proc for proc in self.procs
+                if (pid is None or proc.pid == pid)
+                and (node is None or proc.node is node or proc.node.name == node)
+                and (name is None or proc.name == name)
+                and (trial is None or proc.trial == trial)
+                and (running is None or proc.running() == running)]
+
+    def wait(self, timeout=None, **filters):
+        """Wait for the selected processes to exit on their own; return those still running."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for proc in self.processes(**filters):
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            try:
+                proc.popen.wait(remaining)
+            except TimeoutExpired:
+                pass
+        self.reap()
+        return self.processes(running=True, **filters)
+
+    def stop(self, sig=signal.SIGTERM, timeout=5.0, **filters):
+        """Signal the selected processes, SIGKILL what is left after `timeout`, and reap them.
+
+        Filters are those of processes(); with none given, everything is stopped.
+        Returns {process: exit code}.
+        """
+        procs = self.processes(**filters)
+        for proc in procs:
+            self._signal(proc, sig)
+
+        deadline = time.monotonic() + timeout
+        delay = 0.001
+        while any(proc.running() for proc in procs) and time.monotonic() < deadline:
+            time.sleep(delay)
+            delay = min(delay * 2, 0.05)
+
+        for proc in procs:
+            if proc.running():
+                print(f"WARNING: {proc} did not exit within {timeout:.1f}s, killing it")
+                self._signal(proc, signal.SIGKILL)
+        codes = {proc: proc.popen.wait() for proc in procs}
+        # Children left behind in a group (e.g. by a wrapper) go as well
+        for proc in procs:
+            self._signal(proc, signal.SIGKILL)
+
+        self.procs = [proc for proc in self.procs if proc not in codes]
+        self._write_pid_file()
+        return codes
+
+    def reap(self):
+        """Forget processes that exited on their own; return {process: exit code}."""
+        done = {proc: proc.popen.returncode for proc in self.procs if not proc.running()}
+        if done:
+            self.procs = [proc for proc in self.procs if proc not in done]
+            self._write_pid_file()
+        return done
+
+    def _signal(self, proc, sig):
+        try:
+            os.killpg(proc.pid, sig)
+        except (ProcessLookupError, PermissionError):
+            pass
+
+    def _write_pid_file(self):
+        if self.pid_file is None:
+            return
+        tmp = self.pid_file + '.tmp'
+        with open(tmp, 'w') as f:
+            f.writelines(f"{proc.pid} {proc.node.name} {proc.name} {proc.trial}\n"
+                         for proc in self.procs)
+        os.replace(tmp, self.pid_file)
@@ -0,0 +1,142 @@
+#!/usr/bin/python
+
+import os
+import socket
+import struct
+
+from counter_sampler import PeriodicSampler
+from metrics_sink import MetricsSink, load, load_meta, export_csv
+from netlink import (NETLINK_ROUTE, NETLINK_SOCK_DIAG, QDISC_STATS, TCP_INFO_FIELDS,
+                     netns_socket, interfaces, qdisc_stats, tcp_sockets)
+
+# tcp_info fields kept per socket, and the columns of the per-socket records
+# (node is an index into meta['nodes'])
+INFO_COLUMNS = tuple(name for name, _, _ in TCP_INFO_FIELDS)
+SOCKET_COLUMNS = ('node', 'cookie', 'src', 'sport', 'dst', 'dport') + INFO_COLUMNS
+
+def _netns(node):
+    # Nodes outside a namespace (e.g. OVS switches) share the root namespace
+    return os.stat(f'/proc/{node.pid}/ns/net').st_ino
+
+class TelemetrySampler(PeriodicSampler):
+    """Sample qdisc statistics and TCP socket state through netlink.
+
+    Every tick issues one RTM_GETQDISC dump per network namespace holding a
+    tracked interface and one sock_diag dump per node in `socket_nodes`;
+    no `tc` or `ss` process is spawned. The netlink sockets are opened in
+    each node's namespace once, up front.
+
+    Qdisc statistics (QDISC_STATS of every qdisc on `qdisc_intfs`) go to
+    `qdisc_file` as one wide record per tick, with columns named
+    '<intf>.<kind>.<stat>'. Sockets go to `socket_file` as one record per
+    socket per tick (SOCKET_COLUMNS). Both are MetricsSink files; the latest
+    values are also kept in `qdiscs` and `sockets` for live output.
+    """
+
+    def __init__(self, net, interval=0.05, qdisc_intfs=(), socket_nodes=(),
+                 qdisc_file=None, socket_file=None, meta=None):
+        super().__init__(interval)
+        nodes = net.hosts + net.switches
+
+        # One rtnetlink socket per namespace; the tracked qdiscs are those present now
+        self._qdisc_ns = {}
+        self.qdisc_columns = []
+        qdisc_meta = []
+        for intf in qdisc_intfs:
+            node = next(n for n in nodes if intf in n.intfNames())
+            ns = _netns(node)
+            if ns not in self._qdisc_ns:
+                nl = netns_socket(node.pid, NETLINK_ROUTE)
+                self._qdisc_ns[ns] = (nl, {name: index for index, name in interfaces(nl).items()}, {})
+            nl, ifindex, slots = self._qdisc_ns[ns]
+            index = ifindex[intf]
+            kinds = [q for q in qdisc_stats(nl, index) if q[0] == index]
+            for _, handle, parent, kind, _ in kinds:
+                name = kind if sum(q[3] == kind for q in kinds) == 1 else '%s%x' % (kind, handle >> 16)
+                slots[(index, handle)] = len(self.qdisc_columns)
+                self.qdisc_columns.extend(f'{intf}.{name}.{stat}' for stat in QDISC_STATS)
+                qdisc_meta.append({'intf': intf, 'node': node.name, 'kind': kind,
+                                   'handle': '%x:' % (handle >> 16), 'parent': parent})
+        for ns, (nl, ifindex, slots) in self._qdisc_ns.items():
+            indexes = {index for index, _ in slots}
+            # Let the kernel filter when a namespace has a single tracked interface
+            self._qdisc_ns[ns] = (nl, indexes.pop() if len(indexes) == 1 else 0, slots)
+
+        self.socket_nodes = [net.get(name) for name in socket_nodes]
+        self._socket_nl = [netns_socket(node.pid, NETLINK_SOCK_DIAG) for node in self.socket_nodes]
+
+        self.qdiscs = [0] * len(self.qdisc_columns)
+        self.sockets = {}
+        meta = dict(meta or {}, interval=interval)
+        self.qdisc_sink = self.socket_sink = None
+        if qdisc_file and self.qdisc_columns:
+            self.qdisc_sink = MetricsSink(qdisc_file, self.qdisc_columns,
+                                          meta=dict(meta, qdiscs=qdisc_meta))
+        if socket_file and self.socket_nodes:
+            # Unsigned: cookies and the 64-bit tcp_info rates use the full range
+            # (pacing_rate is ~0 until the socket sets one)
+            self.socket_sink = MetricsSink(socket_file, SOCKET_COLUMNS, dtype='<u8',
+                                           meta=dict(meta, nodes=[n.name for n in self.socket_nodes]))
+
+    def read_qdiscs(self):
+        """Statistics of every tracked qdisc, in `qdisc_columns` order."""
+        values = [0] * len(self.qdisc_columns)
+        width = len(QDISC_STATS)
+        for nl, ifindex, slots in self._qdisc_ns.values():
+            for index, handle, _, _, stats in qdisc_stats(nl, ifindex):
+                slot = slots.get((index, handle))
+                if slot is not None:
+                    values[slot:slot + width] = stats
+        return values
+
+    def read_sockets(self):
+        """{node name: [(cookie, src, sport, dst, dport, info), ...]} with IPv4 addresses as ints."""
+        sockets = {}
+        for node, nl in zip(self.socket_nodes, self._socket_nl):
+            sockets[node.name] = [(cookie, struct.unpack_from('!I', src)[0], sport,
+                                   struct.unpack_from('!I', dst)[0], dport, info)
+                                  for cookie, src, sport, dst, dport, info in tcp_sockets(nl)]
+        return sockets
+
+    def sample(self, t):
+        if self._qdisc_ns:
+            self.qdiscs = self.read_qdiscs()
+            if self.qdisc_sink:
+                self.qdisc_sink.append(t, self.qdiscs)
+        if self._socket_nl:
+            self.sockets = self.read_sockets()
+            if self.socket_sink:
+                for i, node in enumerate(self.socket_nodes):
+                    for cookie, src, sport, dst, dport, info in self.sockets[node.name]:
+                        self.socket_sink.append(t, (i, cookie, src, sport, dst, dport, *info))
+
+    def close(self):
+        try:
+            self.stop()
+        finally:
+            for sink in (self.qdisc_sink, self.socket_sink):
+                if sink:
+                    sink.close()
+            for nl, _, _ in self._qdisc_ns.values():
+                nl.close()
+            for nl in self._socket_nl:
+                nl.close()
+
+def _ip(value):
+    return socket.inet_ntoa(struct.pack('!I', int(value)))
+
+def write_qdisc_csv(qdisc_file, csv_file):
+    records = load(qdisc_file)
+    export_csv(csv_file, records, fmt=['%.3f'] + ['%d'] * (len(records.dtype.names) - 1))
+
+def write_socket_csv(socket_file, csv_file):
+    """Per-socket series as CSV, one row per socket and tick, flows named like pcap_analyzer."""
+    records = load(socket_file)
+    nodes = load_meta(socket_file)['nodes']
+    fields = INFO_COLUMNS
+    with open(csv_file, 'w') as f:
+        f.write('Time,Node,Flow,' + ','.join(fields) + '\n')
+        for r in records:
+            flow = '%s:%d->%s:%d' % (_ip(r['src']), r['sport'], _ip(r['dst']), r['dport'])
+            f.write('%.3f,%s,%s,%s\n' % (r['t'], nodes[r['node']], flow,
+                                         ','.join(str(r[name]) for name in fields)))
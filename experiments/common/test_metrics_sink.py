@@ -0,0 +1,50 @@
+#!/usr/bin/python
+
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from metrics_sink import MetricsSink, load
+
+class PausingColumn:
+    """Column values whose first read stalls, like a producer descheduled in the middle of extend()."""
+
+    def __init__(self, values, pause):
+        self.values = values
+        self.pause = pause
+
+    def __getitem__(self, index):
+        if self.pause:
+            time.sleep(self.pause)
+            self.pause = 0
+        return self.values[index]
+
+def test_extend_larger_than_the_ring_across_flush_timeouts(tmp_path):
+    path = str(tmp_path / 'sink.bin')
+    flush_interval = 0.001
+    sink = MetricsSink(path, ['v'], block_size=4, blocks=2, flush_interval=flush_interval)
+    rows = 64
+
+    def produce():
+        # The writer's flush timer fires while extend() holds the sink, which then
+        # needs more blocks than the ring has and waits for the writer to free them
+        for i in range(3):
+            v = np.arange(i * rows, (i + 1) * rows)
+            sink.extend(v.astype(np.float64), [PausingColumn(v, 20 * flush_interval)])
+            time.sleep(5 * flush_interval)
+
+    producer = threading.Thread(target=produce, daemon=True)
+    producer.start()
+    producer.join(timeout=10)
+    assert not producer.is_alive(), "extend() stuck waiting for a free block"
+    sink.close()
+
+    records = load(path)
+    assert len(records) == sink.rows == 3 * rows
+    assert np.array_equal(records['v'], np.arange(3 * rows))
+    assert np.array_equal(records['t'], records['v'].astype(np.float64))
@@ -0,0 +1,75 @@
+#!/usr/bin/python
+
+import threading
+import time
+
+class Timeline:
+    """Dispatch experiment events at fixed offsets from a shared monotonic t0.
+
+    Events run in offset order in the calling thread (or in their own thread
+    with background=True). The actual dispatch time of every event is kept,
+    so analysis can use when things happened rather than when they were
+    planned. t0 is set `lead` seconds after run() is called, so events at
+    offset 0 are not already late.
+    """
+
+    def __init__(self, lead=0.1):
+        self.lead = lead
+        self.events = []
+        self.t0 = None
+        self.t0_wall = None
+        self.records = []
+
+    def at(self, offset, name, fn, *args, background=False, **kwargs):
+        self.events.append((offset, len(self.events), name, fn, args, kwargs, background))
+        return self
+
+    def every(self, start, stop, interval, name, fn, *args, **kwargs):
+        """Schedule `fn` at start, start + interval, ... while before `stop`."""
+        offset = start
+        while offset < stop - 1e-9:
+            self.at(offset, name, fn, *args, **kwargs)
+            offset += interval
+        return self
+
+    def now(self):
+        """Seconds since t0 on the monotonic clock."""
+        return time.monotonic() - self.t0
+
+    def wait_until(self, offset):
+        remaining = self.t0 + offset - time.monotonic()
+        if remaining > 0:
+            time.sleep(remaining)
+
+    def run(self, t0=None):
+        if t0 is None:
+            t0 = time.monotonic() + self.lead
+        self.t0 = t0
+        # Wall-clock time of t0, for data stamped with the realtime clock (pcap)
+        self.t0_wall = time.time() - (time.monotonic() - t0)
+
+        threads = []
+        for offset, _, name, fn, args, kwargs, background in sorted(self.events, key=lambda e: e[:2]):
+            self.wait_until(offset)
+            record = {'name': name, 'offset': offset, 'dispatched': self.now()}
+            self.records.append(record)
+            if background:
+                thread = threading.Thread(target=fn, args=args, kwargs=kwargs)
+                thread.daemon = True
+                thread.start()
+                threads.append(thread)
+            else:
+                fn(*args, **kwargs)
+                record['finished'] = self.now()
+        return threads
+
+    def dispatched(self, name):
+        """Actual dispatch offset of the first event called `name`."""
+        for record in self.records:
+            if record['name'] == name:
+                return record['dispatched']
+        return None
+
+    def metadata(self):
+        """Planned and actual event times for run metadata."""
+        return {'t0_wall': self.t0_wall, 'events': self.records}
@@ -0,0 +1,208 @@
+#!/usr/bin/python
+
+import json
+import math
+import os
+import select
+import signal
+import socket
+import struct
+import sys
+import time
+
+# Run inside nodes, one interpreter per prober and echo responder: only the
+# standard library is imported up front, metrics_sink (and with it NumPy)
+# only when probes are recorded
+
+UDP_PROBE = os.path.abspath(__file__)
+RTT_PORT = 5302
+
+# Default probe interval (seconds)
+INTERVAL = 0.005
+
+# A probe without an echo after this many seconds is lost
+LOSS_TIMEOUT = 1.0
+
+# Sequence number, send time and echo time (CLOCK_MONOTONIC ns), padded to the probe size
+_PROBE = struct.Struct('!Iqq')
+MIN_SIZE = _PROBE.size
+
+# One record per probe, at its send time: forward (prober -> echo) delay and
+# RTT in microseconds, -1 for probes that were lost
+PROBE_COLUMNS = ('seq', 'fwd_us', 'rtt_us')
+
+PERCENTILES = (50, 95, 99)
+
+def run_echo(port=RTT_PORT):
+    """Return every probe sent to UDP `port`, with the echo time filled in, until SIGTERM/SIGINT."""
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind(('0.0.0.0', port))
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(sig, lambda *_: sys.exit(0))
+    buf = bytearray(65536)
+    while True:
+        n, addr = sock.recvfrom_into(buf)
+        if n >= MIN_SIZE:
+            struct.pack_into('!q', buf, 12, time.monotonic_ns())
+            sock.sendto(memoryview(buf)[:n], addr)
+
+def _percentile(ordered, p):
+    # Linear interpolation between the closest ranks, as numpy.percentile
+    k = (len(ordered) - 1) * p / 100
+    i = int(k)
+    j = min(i + 1, len(ordered) - 1)
+    return ordered[i] + (ordered[j] - ordered[i]) * (k - i)
+
+def rtt_stats(rtt):
+    """Percentiles, mean and max of a list of RTTs (an empty list gives an empty dict)."""
+    if not rtt:
+        return {}
+    ordered = sorted(rtt)
+    stats = {f'p{p}': float(_percentile(ordered, p)) for p in PERCENTILES}
+    stats.update(min=float(ordered[0]), mean=float(sum(ordered) / len(ordered)), max=float(ordered[-1]))
+    return stats
+
+def run_probe(dst, port=RTT_PORT, interval=INTERVAL, out_file=None, t0=None, duration=None, count=None,
+              size=64, loss_timeout=LOSS_TIMEOUT):
+    """Send a probe to `dst` every `interval` seconds and time its echo.
+
+    Probes go out at t0 + k * interval, on CLOCK_MONOTONIC like the other
+    samplers, so their series line up with throughput and telemetry. The
+    prober runs for `duration` seconds from t0, until `count` echoes have
+    come back, or until SIGTERM/SIGINT, whichever comes first. With
+    `out_file` every probe is recorded (PROBE_COLUMNS) in a metrics_sink
+    file; the forward delay is valid because all nodes share the host's
+    clock. Returns the summary (sent, lost and RTT in ms of the echoed
+    probes).
+    """
+    now = time.monotonic()
+    if t0 is None:
+        t0 = now
+    t0_ns = int(t0 * 1e9)
+    end = t0 + duration if duration is not None else float('inf')
+    stopping = []
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(sig, lambda *_: stopping.append(True))
+
+    sink = None
+    if out_file:
+        from metrics_sink import MetricsSink
+        sink = MetricsSink(out_file, PROBE_COLUMNS, meta={'t0': t0, 'dst': dst, 'interval': interval, 'size': size})
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.connect((dst, port))
+    sock.setblocking(False)
+    payload = bytearray(max(size, MIN_SIZE))
+    pending = {}
+    rtts = []
+    sent = lost = 0
+
+    def record(seq, sent_ns, fwd_ns, rtt_ns):
+        if sink:
+            sink.append((sent_ns - t0_ns) / 1e9, (seq, fwd_ns // 1000, rtt_ns // 1000))
+
+    # The first probe goes out at the first tick not already past
+    tick = max(0, math.ceil((now - t0) / interval))
+    try:
+        while not stopping and (count is None or len(rtts) < count):
+            now = time.monotonic()
+            if now >= end:
+                break
+            due = t0 + tick * interval
+            if now >= due:
+                sent_ns = time.monotonic_ns()
+                _PROBE.pack_into(payload, 0, tick, sent_ns, 0)
+                try:
+                    sock.send(payload)
+                except OSError:
+                    pass
+                pending[tick] = sent_ns
+                sent += 1
+                # Ticks missed while the process was not scheduled are skipped, not sent late
+                tick = max(tick + 1, int((now - t0) / interval) + 1)
+                due = t0 + tick * interval
+
+            expired = time.monotonic_ns() - int(loss_timeout * 1e9)
+            while pending:
+                seq, sent_ns = next(iter(pending.items()))
+                if sent_ns > expired:
+                    break
+                del pending[seq]
+                record(seq, sent_ns, -1000, -1000)
+                lost += 1
+
+            readable, _, _ = select.select([sock], [], [], max(0.0, min(due, end) - time.monotonic()))
+            if readable:
+                _receive(sock, pending, rtts, record)
+
+        # Echoes still on their way get loss_timeout to come back
+        deadline = time.monotonic() + loss_timeout
+        while pending and not stopping and (count is None or len(rtts) < count):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            if select.select([sock], [], [], remaining)[0]:
+                _receive(sock, pending, rtts, record)
+        for seq, sent_ns in pending.items():
+            record(seq, sent_ns, -1000, -1000)
+        lost += len(pending)
+    finally:
+        sock.close()
+        if sink:
+            sink.close()
+    summary = {'dst': dst, 'sent': sent, 'lost': lost, 'rtt_ms': rtt_stats([rtt / 1e6 for rtt in rtts])}
+    if out_file:
+        from metrics_sink import update_meta
+        update_meta(out_file, summary=summary)
+    return summary
+
+def _receive(sock, pending, rtts, record):
+    """Match every queued echo to its pending probe; echoes of probes already lost are dropped."""
+    while True:
+        try:
+            data = sock.recv(65536)
+        except BlockingIOError:
+            return
+        except ConnectionRefusedError:
+            # ICMP port unreachable of an earlier probe: nothing listens (yet)
+            continue
+        received_ns = time.monotonic_ns()
+        if len(data) < MIN_SIZE:
+            continue
+        seq, sent_ns, echoed_ns = _PROBE.unpack_from(data)
+        if pending.pop(seq, None) is None:
+            continue
+        rtts.append(received_ns - sent_ns)
+        record(seq, sent_ns, echoed_ns - sent_ns, received_ns - sent_ns)
+
+def parse_args(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(description='UDP RTT prober and echo responder')
+    sub = parser.add_subparsers(dest='mode', required=True)
+    echo = sub.add_parser('echo', help='return every probe to its sender')
+    echo.add_argument('--port', type=int, default=RTT_PORT)
+    probe = sub.add_parser('probe', help='send timestamped probes and record their RTT')
+    probe.add_argument('dst')
+    probe.add_argument('--port', type=int, default=RTT_PORT)
+    probe.add_argument('--interval', type=float, default=INTERVAL, help='seconds between probes')
+    probe.add_argument('--size', type=int, default=64, help=f'UDP payload bytes (at least {MIN_SIZE})')
+    probe.add_argument('--out', help='per-probe records file (metrics_sink)')
+    probe.add_argument('--t0', type=float, help='CLOCK_MONOTONIC time the probe schedule is relative to')
+    probe.add_argument('--duration', type=float, help='seconds from t0 to probe (default: until SIGTERM)')
+    probe.add_argument('--count', type=int, help='stop once this many probes have been echoed')
+    probe.add_argument('--loss-timeout', type=float, default=LOSS_TIMEOUT,
+                       help='seconds after which a probe without an echo is lost')
+    return parser.parse_args(argv)
+
+def main():
+    args = parse_args()
+    if args.mode == 'echo':
+        run_echo(args.port)
+        return 0
+    summary = run_probe(args.dst, args.port, args.interval, args.out, args.t0, args.duration, args.count,
+                        args.size, args.loss_timeout)
+    print(json.dumps(summary), flush=True)
+    return 0 if summary['rtt_ms'] else 1
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,303 @@
+#!/usr/bin/python
+
+import csv
+import os
+import sys
+import time
+
+import numpy as np
+
+from mininet.log import setLogLevel, info
+
+# Shared experiment helpers live in experiments/common
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'common'))
+
+from session import ExperimentSession
+from launcher import start_server
+from timeline import Timeline
+from metrics_sink import load
+from pcap_analyzer import PcapReader
+from run_metadata import write_metadata, phase
+from iperf_stream import Iperf3Client, IperfError
+from path_stats import PathMonitor
+from mptcp_topo import (MPTCPTopo, configure_endpoints, parse_path, path_addr, path_count,
+                        restore_path, setup_mptcp)
+
+PORT = 5201
+
+# Two equal paths, so the surviving one can carry what the failed one did
+DEFAULT_PATHS = [{'bw': 10, 'delay': '10ms'}, {'bw': 10, 'delay': '10ms'}]
+
+# Faults injected on one path in the middle of a transfer:
+#   down       h1's interface goes down, so h1 sees the failure at once
+#   blackhole  the switch port towards h2 goes down; h1 only notices by timeouts
+#   delay      the path's one-way delay jumps (netem on h1's side)
+#   loss       the path starts dropping packets (netem on h1's side)
+FAULTS = ('down', 'blackhole', 'delay', 'loss')
+
+# Client endpoint configurations: every path a regular subflow, or every
+# path but the first a backup that only carries data once the others fail
+MODES = ('subflow', 'backup')
+
+# Receiver counters are sampled this often (seconds)
+COUNTER_INTERVAL = 0.01
+
+# Throughput counts as recovered once it holds RECOVERY_THRESHOLD of the
+# target over a RECOVERY_WINDOW starting at that moment; traffic has shifted
+# once the surviving paths carry RECOVERY_THRESHOLD of it over such a window
+RECOVERY_WINDOW = 0.1
+RECOVERY_THRESHOLD = 0.9
+
+# Pre-fault throughput is averaged over this many seconds before the fault
+PRE_FAULT_WINDOW = 2.0
+
+RESULT_FIELDS = ('fault', 'mode', 'trial', 'path', 'apply_ms', 'pre_mbps', 'target_mbps',
+                 'outage_ms', 'shift_ms', 'recovery_ms', 'counter_shift_ms', 'counter_recovery_ms',
+                 'mbps', 'retransmits')
+
+def client_flags(mode, n):
+    return ['subflow'] + ['subflow' if mode == 'subflow' else 'subflow backup'] * (n - 1)
+
+def fault_commands(net, fault, path, delay='300ms', loss=30):
+    """[(node, argv), ...] that inject `fault` on `path`, prepared ahead of the fault time."""
+    h1, h2, switch = net.get('h1', 'h2', f's{path + 1}')
+    intf = h1.intf(f'h1-eth{path}')
+    if fault == 'down':
+        return [(h1, ['ip', 'link', 'set', intf.name, 'down'])]
+    if fault == 'blackhole':
+        port = next(i for i in switch.intfList() if i.link and h2 in (i.link.intf1.node, i.link.intf2.node))
+        return [(switch, ['ip', 'link', 'set', port.name, 'down'])]
+
+    # TCLink puts netem under the htb class 5:1 when the link is shaped
+    params = intf.params
+    parent = ['parent', '5:1'] if params.get('bw') else ['root']
+    netem = ['delay', delay if fault == 'delay' else params.get('delay', '0ms'),
+             'loss', f'{loss if fault == "loss" else params.get("loss", 0)}%']
+    return [(h1, ['tc', 'qdisc', 'replace', 'dev', intf.name] + parent + ['handle', '10:', 'netem'] + netem)]
+
+def inject(commands):
+    procs = [node.popen(argv) for node, argv in commands]
+    for proc in procs:
+        proc.wait()
+
+def start_captures(net, procs, out_dir, timeout=5.0):
+    """Header-only capture on each of h2's path interfaces; waits until all of them listen."""
+    h2 = net.get('h2')
+    captures = []
+    for i in range(path_count(net, 'h2')):
+        intf = f'h2-eth{i}'
+        log = os.path.join(out_dir, f'{intf}.log')
+        captures.append((os.path.join(out_dir, f'{intf}.pcap'), log))
+        procs.start(h2, f'tcpdump -i {intf} -s 128 -B 8192 --time-stamp-precision=nano '
+                        f'-w {captures[-1][0]} tcp port {PORT}', log_file=log, name='tcpdump')
+    deadline = time.monotonic() + timeout
+    for _, log in captures:
+        while 'listening on' not in open(log).read():
+            if time.monotonic() > deadline:
+                raise RuntimeError(f"capture did not start, see {log}")
+            time.sleep(0.01)
+    return [pcap for pcap, _ in captures]
+
+def data_arrivals(pcap, t0_wall):
+    """(time relative to t0, payload bytes) of the data segments h2 received."""
+    times, sizes = [], []
+    with PcapReader(pcap) as reader:
+        for batch in reader.batches():
+            data = batch[(batch['dport'] == PORT) & (batch['payload'] > 0)]
+            times.append(data['ts'] - t0_wall)
+            sizes.append(data['payload'].astype(np.float64))
+    if not times:
+        return np.empty(0), np.empty(0)
+    return np.concatenate(times), np.concatenate(sizes)
+
+def _cumulative(times, sizes):
+    """Bytes arrived up to time x, for arrays of x."""
+    order = np.argsort(times)
+    t = times[order]
+    total = np.concatenate(([0.0], np.cumsum(sizes[order])))
+    return lambda x: total[np.searchsorted(t, x, side='right')]
+
+def recovery_times(total, surviving, fault, target_mbps, step, horizon,
+                   window=RECOVERY_WINDOW, threshold=RECOVERY_THRESHOLD):
+    """(shift, recovery) in seconds after `fault`, or None if never reached.
+
+    `total` and `surviving` map times to cumulative bytes delivered over all
+    paths and over the surviving paths. Both are evaluated on a `step` grid
+    over a window looking forward from each instant.
+    """
+    grid = fault + np.arange(0, max(horizon - window, step), step)
+    delivered = total(grid + window) - total(grid)
+    moved = surviving(grid + window) - surviving(grid)
+    shifted = (delivered > 0) & (moved >= threshold * delivered)
+    recovered = delivered * 8 / window / 1e6 >= threshold * target_mbps
+
+    def first(ok):
+        return float(grid[ok.argmax()] - fault) if ok.any() else None
+    return first(shifted), first(recovered)
+
+def outage(times, fault, end):
+    """Longest gap between data arrivals (any path) from the last one before `fault` up to `end`."""
+    times = np.sort(times)
+    points = np.concatenate((times[times < fault][-1:], times[(times >= fault) & (times <= end)], [end]))
+    return float(np.diff(points).max()) if len(points) > 1 else end - fault
+
+def _snap(times, fault, offset):
+    """Move an offset found on the grid forward to the next packet arrival."""
+    if offset is None:
+        return None
+    times = np.sort(times)
+    index = np.searchsorted(times, fault + offset)
+    return float(times[index] - fault) if index < len(times) else offset
+
+def _ms(seconds):
+    return None if seconds is None else round(seconds * 1000, 1)
+
+def analyze_failover(pcaps, counter_file, fault_path, fault, end, capacities, t0_wall):
+    """Failover metrics from h2's captures (1 ms grid) and receive counters (COUNTER_INTERVAL grid)."""
+    arrivals = [data_arrivals(pcap, t0_wall) for pcap in pcaps]
+    times = np.concatenate([t for t, _ in arrivals])
+    sizes = np.concatenate([s for _, s in arrivals])
+    survivors = [i for i in range(len(pcaps)) if i != fault_path]
+
+    pre = (times >= fault - PRE_FAULT_WINDOW) & (times < fault)
+    pre_mbps = sizes[pre].sum() * 8 / PRE_FAULT_WINDOW / 1e6
+    target = min(pre_mbps, sum(capacities[i] for i in survivors))
+
+    surviving_times = np.concatenate([arrivals[i][0] for i in survivors])
+    total = _cumulative(times, sizes)
+    surviving = _cumulative(surviving_times, np.concatenate([arrivals[i][1] for i in survivors]))
+    # A forward window can qualify before its first packet arrives; report the packet
+    shift, recovery = recovery_times(total, surviving, fault, target, 0.001, end - fault)
+    shift = _snap(surviving_times, fault, shift)
+    recovery = _snap(times, fault, recovery)
+
+    records = load(counter_file)
+    t = records['t']
+    rx = [records[f'h2-eth{i}.rx_bytes'].astype(np.float64) for i in range(len(pcaps))]
+    rx = [series - series[0] for series in rx]
+    counter_total = lambda x: np.interp(x, t, np.sum(rx, axis=0))
+    counter_surviving = lambda x: np.interp(x, t, np.sum([rx[i] for i in survivors], axis=0))
+    counter_shift, counter_recovery = recovery_times(counter_total, counter_surviving, fault, target,
+                                                     COUNTER_INTERVAL, end - fault)
+
+    return {'pre_mbps': round(pre_mbps, 3), 'target_mbps': round(target, 3),
+            'outage_ms': _ms(outage(times, fault, end)),
+            'shift_ms': _ms(shift), 'recovery_ms': _ms(recovery),
+            'counter_shift_ms': _ms(counter_shift), 'counter_recovery_ms': _ms(counter_recovery)}
+
+def run_failover(net, procs, fault, mode, out_dir, duration=15, fault_at=5, path=0, **degrade):
+    """One transfer from h1 to h2 with `fault` injected on `path` at `fault_at` seconds."""
+    os.makedirs(out_dir, exist_ok=True)
+    h1, h2 = net.get('h1', 'h2')
+    n = path_count(net)
+    configure_endpoints(net, client_flags(mode, n), None)
+    commands = fault_commands(net, fault, path, **degrade)
+
+    start_server(h2, f'mptcpize run iperf3 -s -p {PORT}', PORT, supervisor=procs, name='iperf3')
+    pcaps = start_captures(net, procs, out_dir)
+    monitor = PathMonitor(net, 'h2', interval=COUNTER_INTERVAL, out_dir=out_dir, name='failover',
+                          field='rx_bytes')
+    client = Iperf3Client(procs, h1, f'mptcpize run iperf3 -c {path_addr(0, 2)} -p {PORT} -t {duration}',
+                          log_file=os.path.join(out_dir, 'iperf3.json'), name=f'{fault}/{mode}')
+
+    timeline = Timeline()
+    timeline.at(0, 'start_monitor', lambda: monitor.start(t0=timeline.t0))
+    timeline.at(0, 'start_client', client.start)
+    timeline.at(fault_at, 'fault', inject, commands)
+    timeline.at(duration + 1, 'stop', lambda: None)
+    summary = {'mbps': None, 'retransmits': None}
+    try:
+        timeline.run()
+        try:
+            summary = client.wait(timeout=5).summary()
+        except IperfError as e:
+            info(f'   {e}\n')
+    finally:
+        monitor.stop()
+        procs.stop(name='iperf3')
+        procs.stop(name='tcpdump')
+        restore_path(net, path)
+    monitor.write_csv()
+
+    record = next(r for r in timeline.records if r['name'] == 'fault')
+    fault_time = record['dispatched']
+    end = timeline.dispatched('start_client') + duration
+    capacities = [intf.params.get('bw') for intf in h2.intfList() if intf.link]
+    row = {'fault': fault, 'mode': mode, 'path': path,
+           'apply_ms': _ms(record['finished'] - record['dispatched']),
+           'mbps': summary['mbps'], 'retransmits': summary['retransmits']}
+    row.update(analyze_failover(pcaps, monitor.counter_file, path, fault_time,
+                                end, capacities, timeline.t0_wall))
+    write_metadata(out_dir,
+                   phases=[phase('before_fault', 0, fault_time), phase('after_fault', fault_time)],
+                   fault={'kind': fault, 'mode': mode, 'path': path, **degrade},
+                   failover=row, timeline=timeline.metadata())
+    return row
+
+def write_results(rows, path):
+    with open(path, 'w', newline='') as f:
+        writer = csv.DictWriter(f, RESULT_FIELDS)
+        writer.writeheader()
+        writer.writerows(rows)
+
+def print_results(rows, info=sys.stdout.write):
+    def show(value):
+        return '%9.1f' % value if value is not None else '      n/a'
+    info('%-10s %-8s %9s %9s %9s %9s %9s\n'
+         % ('fault', 'mode', 'pre Mbps', 'outage', 'shift', 'recovery', 'ctr rec.'))
+    for row in rows:
+        info('%-10s %-8s %9.2f %s %s %s %s   (ms)\n'
+             % (row['fault'], row['mode'], row['pre_mbps'], show(row['outage_ms']), show(row['shift_ms']),
+                show(row['recovery_ms']), show(row['counter_recovery_ms'])))
+
+def parse_args(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(description='MPTCP failover latency after a path failure or degradation')
+    parser.add_argument('--fault', nargs='+', default=list(FAULTS), choices=FAULTS)
+    parser.add_argument('--mode', nargs='+', default=list(MODES), choices=MODES,
+                        help='client endpoint configuration')
+    parser.add_argument('--path', action='append', metavar='BW[,DELAY[,LOSS]]',
+                        help='one option per path (default: two 10 Mbps, 10 ms paths)')
+    parser.add_argument('--fail-path', type=int, default=0, help='path the fault is injected on')
+    parser.add_argument('--duration', type=int, default=15, help='transfer length (seconds)')
+    parser.add_argument('--fault-at', type=float, default=5, help='fault time (seconds into the transfer)')
+    parser.add_argument('--delay', default='300ms', help='one-way delay of the delay fault')
+    parser.add_argument('--loss', type=float, default=30, help='loss rate (%%) of the loss fault')
+    parser.add_argument('--trials', type=int, default=1, help='repetitions of every fault and mode')
+    parser.add_argument('--out', default='./data/failover', help='results directory')
+    return parser.parse_args(argv)
+
+def main():
+    args = parse_args()
+    paths = [parse_path(p) for p in args.path] if args.path else DEFAULT_PATHS
+    session = ExperimentSession(MPTCPTopo(paths), setup=setup_mptcp)
+    net = session.start()
+    rows = []
+    try:
+        for fault in args.fault:
+            for mode in args.mode:
+                for trial in range(args.trials):
+                    info(f'*** {fault} on path {args.fail_path}, {mode} endpoints, trial {trial}\n')
+                    with session.trial():
+                        row = run_failover(net, session.procs, fault, mode,
+                                           os.path.join(args.out, f'{fault}_{mode}_{trial}'),
+                                           args.duration, args.fault_at, args.fail_path,
+                                           delay=args.delay, loss=args.loss)
+                    rows.append(dict(row, trial=trial))
+    finally:
+        session.stop()
+
+    os.makedirs(args.out, exist_ok=True)
+    results = os.path.join(args.out, 'failover.csv')
+    write_results(rows, results)
+    info(f'\n*** Failover results ({results}):\n')
+    print_results(rows, info)
+
+if __name__ == '__main__':
+    if os.geteuid() != 0:
+        print("This script must be run as root.")
+        print("Please run with: sudo python %s" % sys.argv[0])
+        sys.exit(1)
+
+    setLogLevel('info')
+    main()
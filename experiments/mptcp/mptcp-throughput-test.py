@@ -1,146 +1,129 @@
 #!/usr/bin/python
 
-from mininet.topo import Topo
 from mininet.net import Mininet
-from mininet.node import Node, Controller
 from mininet.log import setLogLevel, info
 from mininet.cli import CLI
-from mininet.link import TCLink
-import time
-import re
 import os
 import sys
 
-class MPTCPTopo(Topo):
-    def build(self):
-        h1 = self.addHost('h1')
-        h2 = self.addHost('h2')
+# Shared experiment helpers live in experiments/common
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'common'))
 
-        s1 = self.addSwitch('s1')
-        s2 = self.addSwitch('s2')
+from session import ExperimentSession
+from launcher import start_server
+from iperf_stream import run_client
+from path_stats import PathMonitor, print_summary
+from link_trace import LinkTrace, load_trace, print_summary as print_trace_summary
+from mptcp_topo import MPTCPTopo, setup_mptcp, configure_endpoints, add_path_trace
 
-        self.addLink(h1, s1, cls=TCLink, bw=5)
-        self.addLink(s1, h2, cls=TCLink, bw=5)
-
-        self.addLink(h1, s2, cls=TCLink, bw=5)
-        self.addLink(s2, h2, cls=TCLink, bw=5)
+# Per-path counter and subflow series are written here
+DATA_DIR = './data'
 
 def setupMPTCP(net):
     h1, h2 = net.get('h1', 'h2')
 
-    info('*** MPTCP activate\n')
-    for host in [h1, h2]:
-        host.cmd('sysctl -w net.mptcp.enabled=1')
-
-    info('*** set IP address\n')
-    h1.cmd('ip addr add 10.0.1.1/24 dev h1-eth1')
-    h2.cmd('ip addr add 10.0.1.2/24 dev h2-eth1')
-
-    h1.cmd('ip link set h1-eth1 up')
-    h2.cmd('ip link set h2-eth1 up')
+    info('*** MPTCP activate, addresses, routing and endpoints\n')
+    setup_mptcp(net)
 
     info('*** h1 interface:\n')
-    info(h1.cmd('ifconfig'))
+    info(h1.cmd('ip -brief addr'))
     info('*** h2 interface:\n')
-    info(h2.cmd('ifconfig'))
-
-    info('*** MPTCP endpoint\n')
-    h1.cmd('ip mptcp endpoint flush')
-    h2.cmd('ip mptcp endpoint flush')
-
-    h1.cmd('ip mptcp endpoint add 10.0.0.1 dev h1-eth0 subflow')
-    h1.cmd('ip mptcp endpoint add 10.0.1.1 dev h1-eth1 subflow')
-
-    h2.cmd('ip mptcp endpoint add 10.0.0.2 dev h2-eth0 signal')
-    h2.cmd('ip mptcp endpoint add 10.0.1.2 dev h2-eth1 signal')
+    info(h2.cmd('ip -brief addr'))
 
     info('*** h1 mptcp:\n')
     info(h1.cmd('ip mptcp endpoint show'))
     info('*** h2 mptcp:\n')
     info(h2.cmd('ip mptcp endpoint show'))
 
-    info('*** connection test\n')
-    info(h1.cmd('ping -c 2 10.0.0.2'))
-    info(h1.cmd('ping -c 2 10.0.1.2'))
-
-def testSinglePath(net):
+def show_interval(client, rows):
+    start, end, transferred, bps = client.sum[-1]
+    info('   [%s] %4.1f-%4.1f sec  %6.2f MBytes  %6.2f Mbits/sec\n'
+         % (client.name, start, end, transferred / 1e6, bps / 1e6))
+
+def show_summary(client):
+    summary = client.summary()
+    info('   %.2f Mbits/sec received (%.2f sent), %d retransmits\n'
+         % (summary['mbps'], summary['sent_mbps'], summary['retransmits']))
+
+def run_monitored(net, procs, name, cmd, traces=None):
+    """Run one iperf3 client on h1 with per-path accounting of both paths.
+
+    `traces` ({path index: load_trace() trace}) are replayed on their paths
+    from the monitor's t0, and the applied values are written next to the
+    per-path series as <name>_trace.csv.
+    """
+    trace = None
+    if traces:
+        trace = LinkTrace(net, procs, os.path.join(DATA_DIR, '%s_trace.bin' % name))
+        for i, path_trace in sorted(traces.items()):
+            add_path_trace(trace, i, path_trace)
+        trace.prepare()
+    monitor = PathMonitor(net, 'h1', interval=0.1, out_dir=DATA_DIR, name=name)
+    monitor.start()
+    if trace:
+        trace.start(t0=monitor.t0)
+    try:
+        client = run_client(net.get('h1'), cmd, procs, callback=show_interval, name=name)
+    finally:
+        monitor.stop()
+        if trace:
+            trace.stop()
+    paths_csv, subflows_csv = monitor.write_csv()
+    info('*** Per-path accounting (%s, %s):\n' % (paths_csv, subflows_csv))
+    print_summary(monitor.summary(), info)
+    if trace:
+        info('*** Path traces (%s):\n' % trace.write_csv(os.path.join(DATA_DIR, '%s_trace.csv' % name)))
+        print_trace_summary(trace.summary(), info)
+    return client
+
+def testSinglePath(net, procs, traces=None):
     h1, h2 = net.get('h1', 'h2')
 
     info('*** Test: SinglePath（5Mbps）\n')
 
-    h1.cmd('ip mptcp endpoint flush')
-    h1.cmd('ip mptcp endpoint add 10.0.0.1 dev h1-eth0 subflow')
-    h1.cmd('ip mptcp endpoint add 10.0.1.1 dev h1-eth1 subflow backup')
+    configure_endpoints(net, client_flags=['subflow', 'subflow backup'])
 
-    h2.cmd('iperf -s -p 5001 > /dev/null &')
-    time.sleep(1)
+    start_server(h2, 'iperf3 -s -p 5201', 5201, supervisor=procs)
 
-    result = h1.cmd('iperf -c 10.0.0.2 -p 5001 -t 10')
+    client = run_monitored(net, procs, 'SinglePath', 'iperf3 -c 10.0.0.2 -p 5201 -t 10', traces)
     info('*** Result: SinglePath:\n')
-    info(result)
-
+    show_summary(client)
 
-    bw_match = re.search(r'(\d+\.\d+) Mbits/sec', result)
-    if bw_match:
-        single_bw = float(bw_match.group(1))
-    else:
-        single_bw = 0
-        info('*** Failed\n')
+    return client.summary()['mbps']
 
-    h2.cmd('pkill -9 iperf')
-    time.sleep(1)
-
-    return single_bw
-
-def testMultiPath(net):
+def testMultiPath(net, procs, traces=None):
     h1, h2 = net.get('h1', 'h2')
 
     info('*** Test: Multipath（MPTCP、2 x 5Mbps）\n')
 
     # Multipath activation
-    h1.cmd('ip mptcp endpoint flush')
-    h1.cmd('ip mptcp endpoint add 10.0.0.1 dev h1-eth0 subflow')
-    h1.cmd('ip mptcp endpoint add 10.0.1.1 dev h1-eth1 subflow')
+    configure_endpoints(net, client_flags='subflow')
 
-    h2.cmd('mptcpize run iperf -s -p 5002 > /dev/null &')
-    time.sleep(1)
+    start_server(h2, 'mptcpize run iperf3 -s -p 5202', 5202, supervisor=procs, name='iperf3')
 
-    result = h1.cmd('mptcpize run iperf -c 10.0.0.2 -p 5002 -t 10')
+    client = run_monitored(net, procs, 'Multipath', 'mptcpize run iperf3 -c 10.0.0.2 -p 5202 -t 10', traces)
     info('*** Result: Multipath:\n')
-    info(result)
-
-    bw_match = re.search(r'(\d+\.\d+) Mbits/sec', result)
-    if bw_match:
-        multi_bw = float(bw_match.group(1))
-    else:
-        multi_bw = 0
-        info('*** Failed\n')
-
-    info('*** MPTCP subflow status::\n')
-    info(h1.cmd('ss -iaM'))
-
-    h2.cmd('pkill -9 iperf')
+    show_summary(client)
+    multi_bw = client.summary()['mbps']
 
     return multi_bw
 
-def run():
-    topo = MPTCPTopo()
-    net = Mininet(topo=topo, link=TCLink)
+def parse_trace(spec):
+    """'PATH:FILE' -> (path index, trace)."""
+    path, _, file = spec.partition(':')
+    return int(path), load_trace(file)
 
-    net.start()
-
-def run():
-    topo = MPTCPTopo()
-    net = Mininet(topo=topo, link=TCLink)
-
-    net.start()
+def run(traces=None):
+    # Build the network once; each test runs as a trial and is followed by a reset,
+    # which also stops the trial's iperf server
+    session = ExperimentSession(MPTCPTopo(), setup=setupMPTCP)
+    net = session.start()
 
     try:
-        setupMPTCP(net)
-
-        single_bw = testSinglePath(net)
-        time.sleep(2)
-        multi_bw = testMultiPath(net)
+        with session.trial():
+            single_bw = testSinglePath(net, session.procs, traces)
+        with session.trial():
+            multi_bw = testMultiPath(net, session.procs, traces)
 
         info('\n*** Test Results Summary:\n')
         info('   Single Path (5Mbps): %.2f Mbits/sec\n' % single_bw)
@@ -152,7 +135,7 @@ def run():
         info('   Check endpoints: h1 ip mptcp endpoint show\n')
         CLI(net)
     finally:
-        net.stop()
+        session.stop()
 
 if __name__ == '__main__':
     if os.geteuid() != 0:
@@ -160,7 +143,13 @@ if __name__ == '__main__':
         print("Please run with: sudo python %s" % sys.argv[0])
         sys.exit(1)
 
+    import argparse
+    parser = argparse.ArgumentParser(description='MPTCP against single-path throughput')
+    parser.add_argument('--trace', action='append', default=[], metavar='PATH:FILE',
+                        help="replay a bw/delay/loss trace on path PATH (0, 1), e.g. 0:cellular.csv")
+    args = parser.parse_args()
+
     setLogLevel('info')
 
     # Run
-    run()
+    run(dict(parse_trace(spec) for spec in args.trace))
@@ -0,0 +1,135 @@
+#!/usr/bin/python
+
+from mininet.topo import Topo
+from mininet.link import TCLink
+
+from netconf import apply_table, check_connectivity
+
+# The in-kernel path manager allows at most 8 subflows and accepted addresses
+MAX_PATHS = 8
+
+# Two identical 5 Mbps paths, the original MPTCPTopo
+DEFAULT_PATHS = [{'bw': 5}, {'bw': 5}]
+
+# Per-source routing tables of h1 start here (table 100 + path index)
+ROUTE_TABLE_BASE = 100
+
+def parse_path(spec):
+    """'bw[,delay[,loss]]', e.g. '10', '10,20ms' or '10,20ms,1' -> link parameters."""
+    fields = spec.split(',')
+    path = {'bw': float(fields[0])}
+    if len(fields) > 1 and fields[1]:
+        path['delay'] = fields[1]
+    if len(fields) > 2 and fields[2]:
+        path['loss'] = float(fields[2])
+    return path
+
+def path_addr(i, host):
+    """Address of h1 (host=1) or h2 (host=2) on path i."""
+    return f'10.0.{i}.{host}'
+
+class MPTCPTopo(Topo):
+    """h1 and h2 connected by N parallel paths, h1 - s<i> - h2.
+
+    `paths` is a list of TCLink parameters (bw, delay, loss, ...), one per
+    path. Delay and loss are applied once, on the h1 side; bw on both hops.
+    """
+
+    def build(self, paths=None):
+        paths = paths or DEFAULT_PATHS
+        if len(paths) > MAX_PATHS:
+            raise ValueError(f"at most {MAX_PATHS} paths are supported, got {len(paths)}")
+        h1 = self.addHost('h1')
+        h2 = self.addHost('h2')
+
+        for i, params in enumerate(paths):
+            switch = self.addSwitch(f's{i + 1}')
+            self.addLink(h1, switch, cls=TCLink, **params)
+            self.addLink(switch, h2, cls=TCLink, bw=params['bw'])
+
+def add_path_trace(trace, i, times_values):
+    """Replay a load_trace() trace on path i of a LinkTrace: all of it on h1's hop, bw on both hops."""
+    trace.add('h1', f's{i + 1}', times_values, name=f'path{i}')
+    if 'bw' in times_values[1]:
+        trace.add(f's{i + 1}', 'h2', times_values, params=['bw'], name=f'path{i}_h2')
+    return trace
+
+def path_route(i):
+    """h1's policy route of path i; the kernel removes it when h1-eth<i> goes down."""
+    return f'route replace 10.0.0.0/16 dev h1-eth{i} table {ROUTE_TABLE_BASE + i}'
+
+def path_count(net, host='h1'):
+    """Number of paths, i.e. linked interfaces of `host`."""
+    return sum(1 for intf in net.get(host).intfList() if intf.link)
+
+def endpoint_commands(n, flags, host):
+    """`ip` lines replacing the MPTCP endpoints and limits of h1 (host=1) or h2 (host=2).
+
+    `flags` are the endpoint flags, e.g. 'subflow', 'signal' or
+    'subflow fullmesh', either one string for every path or a list with
+    one entry per path ('subflow backup' for a backup path). Paths whose
+    flags are empty or None get no endpoint.
+
+    A fullmesh endpoint opens a subflow to every address of the peer, up to
+    n * n subflows, so the subflow limit is raised to that, capped at the
+    kernel's MAX_PATHS.
+    """
+    if isinstance(flags, str) or flags is None:
+        flags = [flags] * n
+    fullmesh = any(path_flags and 'fullmesh' in path_flags.split() for path_flags in flags)
+    subflows = min(MAX_PATHS, n * n if fullmesh else n)
+    lines = ['mptcp endpoint flush',
+             f'mptcp limits set subflows {subflows} add_addr_accepted {min(MAX_PATHS, n)}']
+    for i, path_flags in enumerate(flags):
+        if path_flags:
+            lines.append(f'mptcp endpoint add {path_addr(i, host)} dev h{host}-eth{i} {path_flags}')
+    return lines
+
+def path_table(n, client_flags='subflow', server_flags='signal'):
+    """netconf table for N paths: addresses, per-source routing on h1 and MPTCP endpoints.
+
+    Path i uses 10.0.i.0/24. Each h1 address gets its own routing table,
+    so a subflow bound to it leaves through its own path even when it
+    connects to h2's address on another path.
+    """
+    h1 = {'addrs': [], 'commands': []}
+    h2 = {'addrs': [], 'commands': []}
+    for i in range(n):
+        table = ROUTE_TABLE_BASE + i
+        h1['addrs'].append((f'h1-eth{i}', f'{path_addr(i, 1)}/24'))
+        h2['addrs'].append((f'h2-eth{i}', f'{path_addr(i, 2)}/24'))
+        h1['commands'] += [f'rule add from {path_addr(i, 1)} table {table}', path_route(i)]
+    h1['commands'] += endpoint_commands(n, client_flags, 1)
+    h2['commands'] += endpoint_commands(n, server_flags, 2)
+    return {'h1': h1, 'h2': h2}
+
+def _warn_failed(failed, what):
+    for name, output in failed.items():
+        print(f"WARNING: {what} failed on {name}:\n{output}")
+
+def configure_endpoints(net, client_flags='subflow', server_flags='signal'):
+    """Replace only the MPTCP endpoints of both hosts, e.g. between tests."""
+    n = path_count(net)
+    _warn_failed(apply_table(net, {'h1': {'commands': endpoint_commands(n, client_flags, 1)},
+                                   'h2': {'commands': endpoint_commands(n, server_flags, 2)}}),
+                 'MPTCP endpoint setup')
+
+def setup_mptcp(net, client_flags='subflow', server_flags='signal'):
+    """Enable MPTCP and configure addresses, routing and endpoints of every path."""
+    n = path_count(net)
+    for host in net.get('h1', 'h2'):
+        host.cmd('sysctl -w net.mptcp.enabled=1')
+    _warn_failed(apply_table(net, path_table(n, client_flags, server_flags)), 'MPTCP path setup')
+    for (_, dst), rtt in check_connectivity(net, [('h1', path_addr(i, 2)) for i in range(n)], count=3).items():
+        if rtt is None:
+            print(f"WARNING: h1 cannot reach {dst}")
+        else:
+            print(f"h1 -> {dst}: RTT {rtt * 1000:.1f} ms")
+
+def restore_path(net, i):
+    """Bring every interface of path i back up and reinstall its policy route on h1."""
+    for node in net.get('h1', f's{i + 1}', 'h2'):
+        for intf in node.intfList():
+            if intf.link and f's{i + 1}' in (intf.link.intf1.node.name, intf.link.intf2.node.name):
+                node.cmd(f'ip link set {intf.name} up')
+    net.get('h1').cmd(f'ip {path_route(i)}')
@@ -0,0 +1,146 @@
+#!/usr/bin/python
+
+import csv
+import os
+import sys
+
+from mininet.log import setLogLevel, info
+
+# Shared experiment helpers live in experiments/common
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'common'))
+
+from session import ExperimentSession
+from launcher import start_server
+from iperf_stream import Iperf3Client, IperfError
+from mptcp_topo import MAX_PATHS, MPTCPTopo, configure_endpoints, parse_path, path_addr, setup_mptcp
+
+# Path mixes; the first n paths of a mix are used for an n-path run
+MIXES = {
+    'homogeneous': [{'bw': 10, 'delay': '10ms'}] * 4,
+    'skewed': [{'bw': 20, 'delay': '5ms'},
+               {'bw': 10, 'delay': '20ms'},
+               {'bw': 5, 'delay': '40ms', 'loss': 0.5},
+               {'bw': 2, 'delay': '80ms', 'loss': 1}],
+}
+
+# Path manager settings: (client endpoint flags, server endpoint flags).
+# 'subflow' opens one subflow per client address to the server's initial
+# address; 'signal' also lets the server announce its other addresses;
+# 'fullmesh' opens a subflow from every client address to every known
+# server address.
+PM_MODES = {
+    'subflow': ('subflow', None),
+    'signal': ('subflow', 'signal'),
+    'fullmesh': ('subflow fullmesh', 'signal'),
+}
+
+PORT = 5201
+RESULT_FIELDS = ('mix', 'paths', 'scheduler', 'pm', 'trial', 'capacity_mbps', 'bytes',
+                 'completion_s', 'mbps', 'efficiency', 'retransmits')
+
+def available_schedulers(node):
+    """Packet schedulers the kernel offers (net.mptcp.available_schedulers), or [None] if it has no choice."""
+    schedulers = node.cmd('sysctl -n net.mptcp.available_schedulers 2>/dev/null').split()
+    return schedulers or [None]
+
+def transfer(net, procs, size, timeout):
+    """One fixed-size MPTCP transfer from h1 to h2; returns (bytes, seconds, retransmits)."""
+    h1, h2 = net.get('h1', 'h2')
+    start_server(h2, f'mptcpize run iperf3 -s -p {PORT}', PORT, supervisor=procs, name='iperf3')
+    client = Iperf3Client(procs, h1, f'mptcpize run iperf3 -c {path_addr(0, 2)} -p {PORT} -n {size}',
+                          name='transfer').start()
+    client.wait(timeout)
+    received = client.end['sum_received']
+    return received['bytes'], received['seconds'], client.summary()['retransmits']
+
+def run_mix(mix, paths, counts, schedulers, pm_modes, size, trials, timeout, rows):
+    for n in counts:
+        used = paths[:n]
+        capacity = sum(p['bw'] for p in used)
+        info(f'*** {mix}: {n} path(s), {capacity} Mbps total\n')
+        session = ExperimentSession(MPTCPTopo(used), setup=setup_mptcp)
+        net = session.start()
+        try:
+            for scheduler in schedulers or available_schedulers(net.get('h1')):
+                if scheduler:
+                    session.set_profile({'net.mptcp.scheduler': scheduler})
+                for pm in pm_modes:
+                    configure_endpoints(net, *PM_MODES[pm])
+                    for trial in range(trials):
+                        with session.trial():
+                            try:
+                                sent, seconds, retransmits = transfer(net, session.procs, size, timeout)
+                            except IperfError as e:
+                                info(f'   {scheduler or "default"}/{pm} #{trial}: {e}\n')
+                                continue
+                        mbps = sent * 8 / seconds / 1e6
+                        row = {'mix': mix, 'paths': n, 'scheduler': scheduler or 'default', 'pm': pm,
+                               'trial': trial, 'capacity_mbps': capacity, 'bytes': sent,
+                               'completion_s': seconds, 'mbps': mbps, 'efficiency': mbps / capacity,
+                               'retransmits': retransmits}
+                        rows.append(row)
+                        info('   %-8s %-8s #%d: %.2f s, %.2f Mbps, %.0f%% of capacity\n'
+                             % (row['scheduler'], pm, trial, seconds, mbps, row['efficiency'] * 100))
+        finally:
+            session.stop()
+    return rows
+
+def print_table(rows, info=sys.stdout.write):
+    """Mean completion time, throughput and efficiency per (mix, paths, scheduler, pm)."""
+    groups = {}
+    for row in rows:
+        groups.setdefault((row['mix'], row['paths'], row['scheduler'], row['pm']), []).append(row)
+    info('%-12s %5s %-10s %-8s %9s %10s %10s %6s\n'
+         % ('mix', 'paths', 'scheduler', 'pm', 'capacity', 'time (s)', 'Mbps', 'eff'))
+    for (mix, n, scheduler, pm), group in sorted(groups.items()):
+        mean = {key: sum(r[key] for r in group) / len(group) for key in ('completion_s', 'mbps', 'efficiency')}
+        info('%-12s %5d %-10s %-8s %9g %10.2f %10.2f %5.0f%%\n'
+             % (mix, n, scheduler, pm, group[0]['capacity_mbps'], mean['completion_s'],
+                mean['mbps'], mean['efficiency'] * 100))
+
+def write_results(rows, path):
+    with open(path, 'w', newline='') as f:
+        writer = csv.DictWriter(f, RESULT_FIELDS)
+        writer.writeheader()
+        writer.writerows(rows)
+
+def parse_args(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(description='MPTCP throughput and completion time as paths are added')
+    parser.add_argument('--mix', nargs='+', default=sorted(MIXES), choices=sorted(MIXES),
+                        help='path mixes to run')
+    parser.add_argument('--path', action='append', metavar='BW[,DELAY[,LOSS]]',
+                        help='custom mix, one option per path (e.g. --path 10,5ms --path 2,50ms,1)')
+    parser.add_argument('--paths', type=int, nargs='+', help='path counts (default: 1 up to the mix size)')
+    parser.add_argument('--scheduler', nargs='+', help='MPTCP schedulers (default: all available)')
+    parser.add_argument('--pm', nargs='+', default=sorted(PM_MODES), choices=sorted(PM_MODES),
+                        help='path manager endpoint settings')
+    parser.add_argument('--size', default='20M', help='transfer size (iperf3 -n)')
+    parser.add_argument('--trials', type=int, default=1, help='transfers per setting')
+    parser.add_argument('--timeout', type=float, default=120, help='seconds before a transfer is abandoned')
+    parser.add_argument('--out', default='./data/path_benchmark.csv', help='results CSV')
+    return parser.parse_args(argv)
+
+def main():
+    args = parse_args()
+    mixes = {'custom': [parse_path(p) for p in args.path]} if args.path else {m: MIXES[m] for m in args.mix}
+
+    rows = []
+    for mix, paths in mixes.items():
+        paths = paths[:MAX_PATHS]
+        counts = [n for n in args.paths or range(1, len(paths) + 1) if 1 <= n <= len(paths)]
+        run_mix(mix, paths, counts, args.scheduler, args.pm, args.size, args.trials, args.timeout, rows)
+
+    os.makedirs(os.path.dirname(args.out) or '.', exist_ok=True)
+    write_results(rows, args.out)
+    info(f'\n*** Results ({args.out}):\n')
+    print_table(rows, info)
+
+if __name__ == '__main__':
+    if os.geteuid() != 0:
+        print("This script must be run as root.")
+        print("Please run with: sudo python %s" % sys.argv[0])
+        sys.exit(1)
+
+    setLogLevel('info')
+    main()
@@ -0,0 +1,154 @@
+#!/usr/bin/python
+
+import os
+import sys
+import time
+
+import numpy as np
+
+from counter_sampler import CounterSampler
+from metrics_sink import MetricsSink, load
+from telemetry import TelemetrySampler, INFO_COLUMNS, write_socket_csv
+
+# Sockets that moved less than this are control connections, not data subflows
+MIN_SUBFLOW_BYTES = 100000
+
+class PathMonitor:
+    """Per-path accounting of an MPTCP transfer from `host`.
+
+    Every interface of `host` is one path. During the transfer the
+    interface counters and the host's TCP sockets (MPTCP subflows are TCP
+    sockets) are sampled on one t0, so the split of traffic between paths
+    can be followed over time. Capacities come from the links' `bw`.
+    Throughput is taken from `field`: tx_bytes on the sender, rx_bytes on
+    the receiver.
+    """
+
+    def __init__(self, net, host='h1', interval=0.1, out_dir='./data', name='mptcp', field='tx_bytes'):
+        node = net.get(host)
+        self.name = name
+        self.field = field
+        self.interval = interval
+        self.paths = []
+        for intf in node.intfList():
+            if intf.name == 'lo' or not intf.link:
+                continue
+            peer = intf.link.intf2 if intf.link.intf1 is intf else intf.link.intf1
+            self.paths.append({'intf': intf.name, 'ip': intf.IP(), 'prefix_len': int(intf.prefixLen or 8),
+                               'via': peer.node.name, 'capacity_mbps': intf.params.get('bw')})
+
+        os.makedirs(out_dir, exist_ok=True)
+        self.counter_file = os.path.join(out_dir, f'{name}_paths.bin')
+        self.socket_file = os.path.join(out_dir, f'{name}_subflows.bin')
+        self.counters = CounterSampler(net, interval, nodes=[host],
+                                       intfs=[p['intf'] for p in self.paths],
+                                       fields=('rx_bytes', 'tx_bytes'))
+        self.sink = MetricsSink(self.counter_file, self.counters.columns,
+                                meta={'interval': interval, 'paths': self.paths})
+        self.counters.callback = self.sink.append
+        self.telemetry = TelemetrySampler(net, interval, socket_nodes=[host], socket_file=self.socket_file)
+
+    def start(self, t0=None):
+        self.t0 = time.monotonic() if t0 is None else t0
+        self.counters.start(t0=self.t0)
+        self.telemetry.start(t0=self.t0)
+
+    def stop(self):
+        # A sampler that failed raises here, after everything is closed
+        try:
+            self.counters.close()
+        finally:
+            try:
+                self.telemetry.close()
+            finally:
+                self.sink.close()
+
+    def throughput(self):
+        """(time, {intf: Mbps per interval}) from the counter series."""
+        records = load(self.counter_file)
+        if len(records) < 2:
+            return np.empty(0), {p['intf']: np.empty(0) for p in self.paths}
+        t = records['t']
+        elapsed = np.diff(t)
+        return t[1:], {p['intf']: np.diff(records[f"{p['intf']}.{self.field}"].astype(np.float64)) * 8 / elapsed / 1e6
+                       for p in self.paths}
+
+    def subflows(self):
+        """{(src, sport, dst, dport): last tcp_info dict} of the data subflows."""
+        records = load(self.socket_file)
+        flows = {}
+        for r in records:
+            key = (int(r['src']), int(r['sport']), int(r['dst']), int(r['dport']))
+            flows[key] = {name: int(r[name]) for name in INFO_COLUMNS}
+            flows[key]['t'] = float(r['t'])
+        return {key: info for key, info in flows.items() if info['bytes_acked'] >= MIN_SUBFLOW_BYTES}
+
+    def path_of(self, src, dst):
+        """Interface a subflow leaves through: the path whose subnet holds dst, else the one owning src."""
+        for p in self.paths:
+            if not p['ip']:
+                continue
+            ip, prefix = _ip_int(p['ip']), p['prefix_len']
+            mask = (0xffffffff << (32 - prefix)) & 0xffffffff
+            if (dst & mask) == (ip & mask):
+                return p['intf']
+        for p in self.paths:
+            if p['ip'] and _ip_int(p['ip']) == src:
+                return p['intf']
+        return None
+
+    def summary(self):
+        """Per path: mean/peak Mbps, utilization of its capacity and its subflows."""
+        _, mbps = self.throughput()
+        # Averages are taken over the samples with traffic on any path, i.e. the transfer itself
+        total = np.sum([mbps[p['intf']] for p in self.paths], axis=0)
+        active = total > 0.01
+        records = load(self.socket_file)
+        subflows = self.subflows()
+        rows = []
+        for p in self.paths:
+            series = mbps[p['intf']]
+            mean = float(series[active].mean()) if active.any() else 0.0
+            mine = []
+            for (src, sport, dst, dport), info in sorted(subflows.items()):
+                if self.path_of(src, dst) != p['intf']:
+                    continue
+                samples = records[(records['src'] == src) & (records['sport'] == sport)]
+                mine.append({'sport': sport, 'dport': dport, 'bytes_acked': info['bytes_acked'],
+                             'mean_cwnd': float(samples['cwnd'].mean()),
+                             'mean_rtt_ms': float(samples['rtt_us'].mean()) / 1000,
+                             'total_retrans': info['total_retrans']})
+            rows.append(dict(p, mean_mbps=mean, peak_mbps=float(series.max()) if len(series) else 0.0,
+                             utilization=mean / p['capacity_mbps'] if p['capacity_mbps'] else None,
+                             subflows=mine))
+        return rows
+
+    def write_csv(self):
+        """Write <name>_paths.csv (Time,<intf>_Mbps,...) and <name>_subflows.csv; return both paths."""
+        paths_csv = self.counter_file[:-len('.bin')] + '.csv'
+        t, mbps = self.throughput()
+        names = [p['intf'] for p in self.paths]
+        data = np.column_stack([t] + [mbps[n] for n in names]) if len(t) else np.empty((0, len(names) + 1))
+        np.savetxt(paths_csv, data, delimiter=',', fmt='%.3f', comments='',
+                   header='Time,' + ','.join(f'{n}_Mbps' for n in names))
+        subflows_csv = self.socket_file[:-len('.bin')] + '.csv'
+        write_socket_csv(self.socket_file, subflows_csv)
+        return paths_csv, subflows_csv
+
+def _ip_int(ip):
+    a, b, c, d = (int(x) for x in ip.split('.'))
+    return (a << 24) | (b << 16) | (c << 8) | d
+
+def print_summary(rows, info=sys.stdout.write):
+    for row in rows:
+        capacity = f"{row['capacity_mbps']} Mbps" if row['capacity_mbps'] else 'unshaped'
+        utilization = f"{row['utilization'] * 100:5.1f}%" if row['utilization'] is not None else '   n/a'
+        info(f"   {row['intf']} via {row['via']} ({capacity}): mean {row['mean_mbps']:.2f} Mbps, "
+             f"peak {row['peak_mbps']:.2f} Mbps, utilization {utilization}\n")
+        for sub in row['subflows']:
+            info(f"      subflow :{sub['sport']}->:{sub['dport']} acked {sub['bytes_acked'] / 1e6:.2f} MB, "
+                 f"cwnd {sub['mean_cwnd']:.1f}, rtt {sub['mean_rtt_ms']:.1f} ms, retrans {sub['total_retrans']}\n")
+    capacities = [row['capacity_mbps'] for row in rows]
+    if rows and all(capacities):
+        total = sum(row['mean_mbps'] for row in rows)
+        info(f"   all paths: {total:.2f} of {sum(capacities)} Mbps ({total / sum(capacities) * 100:.1f}%)\n")
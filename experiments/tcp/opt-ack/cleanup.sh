@@ -10,20 +10,28 @@ fi
 
 echo "Cleaning up simulation..."
 
-# Kill any remaining processes
-echo "Stopping any running processes..."
-killall -q python3 iperf tcpdump mn
+# Kill the processes an aborted run left behind (recorded by its ProcessSupervisor),
+# leaving other experiments on this machine alone
+if [ -f ./data/pids ]; then
+  echo "Stopping processes of the last run..."
+  while read -r pid node name trial; do
+    kill -KILL -- "-$pid" 2>/dev/null
+  done < ./data/pids
+  rm -f ./data/pids
+fi
 
-# Clean up Mininet
-echo "Cleaning up Mininet..."
-mn -c
+# Mininet is left alone: 'mn -c' would also tear down the networks of other
+# experiments running on this machine
+echo "If the run was aborted and no other Mininet experiment is running, 'mn -c' removes its network."
 
 # Remove existing files
 echo "Removing existing files..."
-rm -f ./data/throughput_graph.png ./data/attack_report.txt
-rm -f ./data/bottleneck.pcap ./data/throughput_log.csv
-rm -f ./data/router_throughput.csv ./data/monitor.sh
-rm -f ./data/*traffic.log ./data/*server.log ./data/attack.log
-rm -f ./data/optack.py ./data/router_monitor.log
+rm -f ./data/throughput_graph.png ./data/attack_report.txt ./data/run.json
+rm -f ./data/bottleneck.pcap* ./data/bottleneck_flows.csv ./data/throughput_log.csv
+rm -f ./data/router_throughput.csv ./data/counters.bin ./data/counters.bin.json
+rm -f ./data/*traffic.log ./data/*server.log ./data/attack.log ./data/tcpdump.log
+rm -f ./data/ats_optack_sink.log ./data/iperf_intervals.csv
+rm -f ./data/optack.py ./data/router_monitor.log ./data/bottleneck.log
+rm -f ./data/optack_detector.log ./data/optack_detector.json ./data/optack_alerts.jsonl
 
 echo "Cleanup complete!"
@@ -0,0 +1,82 @@
+#!/usr/bin/python
+
+import json
+import os
+import sys
+
+from mininet.log import setLogLevel
+
+# Shared experiment helpers live in experiments/common
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'common'))
+
+from topology import DumbbellTopo
+from network_setup import setup_routing
+from traffic_monitor import start_detector, stop_detector
+from session import ExperimentSession
+from launcher import start_server
+from iperf_stream import Iperf3Client, IperfError, IPERF3_PORT
+
+# The experiment's bottleneck (Mbps)
+BOTTLENECK = 10
+
+def detector_load(rate, duration=10, streams=4, data_dir='./data/detector_bench'):
+    """Detector counters while tc and ac send `streams` bulk flows each across a `rate` Mbps bottleneck."""
+    os.makedirs(data_dir, exist_ok=True)
+    session = ExperimentSession(DumbbellTopo(bottleneck=rate), setup=setup_routing)
+    procs = session.procs
+    net = session.start()
+    try:
+        ts, ats = net.get('ts', 'ats')
+        start_server(ts, f'iperf3 -s -p {IPERF3_PORT}', IPERF3_PORT, supervisor=procs)
+        start_server(ats, f'iperf3 -s -p {IPERF3_PORT}', IPERF3_PORT, supervisor=procs)
+        start_detector(net, procs, data_dir=data_dir)
+        # Server addresses from network_setup's routing table
+        clients = [(net.get('tc'), '10.0.2.2'), (net.get('ac'), '10.0.4.2')]
+        runs = [Iperf3Client(procs, client, f'iperf3 -c {server} -p {IPERF3_PORT} -t {duration} -P {streams}')
+                for client, server in clients]
+        for client in runs:
+            client.start()
+        mbps = 0.0
+        for client in runs:
+            try:
+                mbps += client.wait(timeout=duration + 10).summary()['mbps']
+            except IperfError as e:
+                print(f"ERROR: {e}")
+        stats, alerts = stop_detector(procs, data_dir)
+    finally:
+        session.stop()
+    return dict(stats, rate=rate, mbps=mbps, pps=stats['packets'] / max(stats['seconds'], 1e-9),
+                cpu_share=stats['cpu_seconds'] / max(stats['seconds'], 1e-9), false_alerts=len(alerts))
+
+def parse_args(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(description='Optimistic ACK detector throughput at multiples of the bottleneck rate')
+    parser.add_argument('--scales', type=float, nargs='+', default=[1, 10],
+                        help="bottleneck rates as multiples of the experiment's 10 Mbps")
+    parser.add_argument('--duration', type=int, default=10, help='seconds of traffic per rate')
+    parser.add_argument('--streams', type=int, default=4, help='parallel streams per client')
+    parser.add_argument('--out', help='write the results to this JSON file')
+    return parser.parse_args(argv)
+
+def main():
+    args = parse_args()
+    rows = []
+    print('%9s %9s %9s %8s %8s %8s %7s' % ('rate', 'Mbps', 'packets', 'pps', 'drops', 'CPU %', 'alerts'))
+    for scale in args.scales:
+        row = detector_load(BOTTLENECK * scale, args.duration, args.streams)
+        rows.append(row)
+        print('%9.0f %9.1f %9d %8.0f %8d %8.1f %7d' % (row['rate'], row['mbps'], row['packets'], row['pps'],
+                                                       row['drops'], row['cpu_share'] * 100, row['false_alerts']))
+        if row['drops']:
+            print(f"WARNING: the detector dropped {row['drops']} packets at {row['rate']:.0f} Mbps")
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump(rows, f, indent=2)
+
+if __name__ == '__main__':
+    if os.geteuid() != 0:
+        print("This script must be run as root.")
+        print("Please run with: sudo python %s" % sys.argv[0])
+        sys.exit(1)
+    setLogLevel('warning')
+    main()
@@ -11,14 +11,41 @@ import sys
 import threading
 import os
 
+# Shared experiment helpers live in experiments/common
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'common'))
+
 # Import custom modules
 from topology import DumbbellTopo
 from network_setup import setup_routing
-from traffic_monitor import monitor_traffic, periodic_throughput_measurement
-from traffic_generator import start_normal_traffic, start_optimistic_acking_attack
+from traffic_monitor import (monitor_traffic, stop_monitoring, analyze_capture, periodic_throughput_measurement,
+                             start_detector, stop_detector, start_rtt_echo, start_rtt_probe, stop_rtt_probe)
+from traffic_generator import (start_servers, target_client, attacker_client,
+                               start_normal_traffic, start_optimistic_acking_attack)
 from report_generator import generate_throughput_report
+from run_metadata import write_metadata, phase
+from session import ExperimentSession
+from timeline import Timeline
+from iperf_stream import IperfError, write_intervals_csv
+import rtt_probe
+
+# Attack launch time relative to t0 (seconds)
+ATTACK_START = 5.0
+MONITOR_DURATION = 15
+
+# Interval of the UDP RTT probes along the target path (seconds)
+PROBE_INTERVAL = 0.01
+
+def parse_args(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(description='Optimistic ACK attack against a competing flow')
+    parser.add_argument('--aqm', metavar='SPEC',
+                        help="bottleneck queue discipline, e.g. fq_codel:target=5ms (default: TCLink's htb + netem)")
+    parser.add_argument('--probe-interval', type=float, default=PROBE_INTERVAL,
+                        help='seconds between UDP RTT probes from tc to ts (0: no probes)')
+    return parser.parse_args(argv)
 
 def main():
+    args = parse_args()
     setLogLevel('info')
 
     # Create data directory
@@ -28,42 +55,73 @@ def main():
         print(f"Created data directory: {data_dir}")
 
     # Setup and start network
-    topo = DumbbellTopo()
-    net = Mininet(topo=topo, link=TCLink)
-    net.start()
-    setup_routing(net)
+    session = ExperimentSession(DumbbellTopo(aqm=args.aqm), setup=setup_routing, pid_file=os.path.join(data_dir, 'pids'))
+    procs = session.procs
+    net = session.start()
 
     # Verify connections
     print("Verifying network connections:")
     dumpNodeConnections(net.hosts)
 
-    # Start monitoring
-    monitor_traffic(net)
-    start_normal_traffic(net)
-
-    # Start throughput measurements in separate thread
-    print("Starting throughput monitoring...")
-    monitor_thread = threading.Thread(target=periodic_throughput_measurement, args=(net, 1.0, 15))
+    # Start capture and servers before t0
+    capture = monitor_traffic(net, procs)
+    start_detector(net, procs, data_dir=data_dir)
+    start_servers(net, procs)
+    if args.probe_interval:
+        start_rtt_echo(net, procs)
+    target, attacker = target_client(net, procs), attacker_client(net, procs)
+
+    # Every phase is an offset from one monotonic t0 shared with the sampler
+    timeline = Timeline()
+    monitor_thread = threading.Thread(
+        target=lambda: periodic_throughput_measurement(net, 0.1, MONITOR_DURATION, ATTACK_START, timeline.t0))
     monitor_thread.daemon = True
+    timeline.at(0.0, 'start_sampler', monitor_thread.start)
+    if args.probe_interval:
+        timeline.at(0.0, 'start_rtt_probe', lambda: start_rtt_probe(net, procs, args.probe_interval,
+                                                                    MONITOR_DURATION, timeline.t0))
+    timeline.at(0.0, 'start_normal_traffic', start_normal_traffic, target)
+    timeline.at(ATTACK_START, 'start_attack', start_optimistic_acking_attack, net, procs, attacker)
+    timeline.at(MONITOR_DURATION, 'stop', monitor_thread.join, 5)
 
     try:
-        monitor_thread.start()
-
-        # Launch attack after delay
-        print("Waiting 5 seconds before starting attack...")
-        time.sleep(5)
-        start_optimistic_acking_attack(net)
-
-        # Wait for monitoring to complete
-        print("Monitoring throughput for 15 seconds...")
-        monitor_thread.join(timeout=20)  # Extended timeout
+        print(f"Attack starts at t={ATTACK_START:.0f}s, monitoring throughput for {MONITOR_DURATION} seconds...")
+        timeline.run()
     except KeyboardInterrupt:
         print("\nMonitoring interrupted by user.")
     except Exception as e:
         print(f"\nError during monitoring: {e}")
 
-    # Allow thread completion
-    time.sleep(2)
+    # Per-interval iperf3 records of both flows on the timeline's t0; the attacker
+    # client outlives the monitoring window, so only its intervals so far are kept
+    try:
+        target.wait(timeout=5)
+        print(f"Target flow (iperf3): {target.summary()['mbps']:.2f} Mbps")
+    except IperfError as e:
+        print(f"Error in target traffic: {e}")
+    write_intervals_csv([target, attacker], os.path.join(data_dir, 'iperf_intervals.csv'), timeline.t0)
+
+    # Phase boundaries (actual dispatch times) and link capacity used by the reports
+    attack_start = timeline.dispatched('start_attack') or ATTACK_START
+    write_metadata(data_dir,
+                   phases=[phase('before_attack', 0.0, attack_start),
+                           phase('during_attack', attack_start)],
+                   bottleneck_mbps=net.topo.linkInfo('r1', 'r2')['bw'],
+                   aqm=args.aqm,
+                   throughput_file='throughput_log.csv',
+                   timeline=timeline.metadata())
+
+    # Latency of the target path before and during the takeover
+    if args.probe_interval:
+        try:
+            summaries = stop_rtt_probe(procs, attack_start, data_dir)
+            print(f"RTT probes tc -> ts (every {args.probe_interval * 1000:.0f} ms, series saved to {data_dir}/rtt_series.csv):")
+            for name, summary in summaries.items():
+                rtt_probe.print_summary(name, summary)
+            write_metadata(data_dir, rtt_probe={'interval': args.probe_interval, 'file': 'rtt_series.csv',
+                                                'summary': summaries})
+        except (OSError, ValueError) as e:
+            print(f"Error reading RTT probe results: {e}")
 
     # Generate final report
     try:
@@ -71,11 +129,31 @@ def main():
     except Exception as e:
         print(f"Error generating throughput report: {e}")
 
+    # Optimistic ACK alerts raised on r1, timed from the attack start
+    try:
+        stats, alerts = stop_detector(procs, data_dir)
+        attack_wall = timeline.t0_wall + attack_start
+        for alert in alerts:
+            alert['since_attack'] = alert['emitted'] - attack_wall
+            print(f"Detector alert: {alert['flow']} {alert['since_attack']:.3f}s after the attack start "
+                  f"({alert['latency'] * 1000:.1f} ms after its first optimistic ACK)")
+        print(f"Detector: {stats['packets']} packets, {stats['drops']} dropped, {len(alerts)} alerts")
+        write_metadata(data_dir, optack_detector=dict(stats, alerts=alerts))
+    except (OSError, ValueError) as e:
+        print(f"Error reading detector results: {e}")
+
+    # Analyze the bottleneck capture
+    stop_monitoring(capture, data_dir)
+    try:
+        analyze_capture(capture, t0=timeline.t0_wall)
+    except Exception as e:
+        print(f"Error analyzing capture: {e}")
+
     # Start command line interface
     CLI(net)
 
-    # Cleanup
-    net.stop()
+    # Cleanup: stops the servers, clients and the attack as well
+    session.stop()
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+"""Detect optimistic ACKs on a router interface.
+
+Reads the TCP/IPv4 headers of every packet crossing one interface (both
+directions) from an AF_PACKET socket whose classic BPF filter drops all
+other traffic in the kernel and truncates packets to their headers.
+For each flow direction it keeps the highest sequence number of data
+seen on the interface; an ACK in the opposite direction beyond it
+acknowledges data that has not crossed the link yet, which a receiver
+only does when it acknowledges optimistically. Flows with `--threshold`
+such ACKs raise one alert each (a JSON line, also printed). The flow
+table is an LRU of at most `--max-flows` directions.
+
+Run it in the router's namespace, e.g. on r1:
+    python3 optack_detector.py -i r1-eth2 --alerts alerts.jsonl --stats stats.json
+It stops on SIGTERM/SIGINT and writes its counters to the stats file.
+"""
+
+import argparse
+import ctypes
+import json
+import os
+import signal
+import socket
+import struct
+import sys
+import time
+from collections import OrderedDict
+
+ETH_P_ALL = 0x0003
+SOL_PACKET = 263
+PACKET_STATISTICS = 6
+SO_ATTACH_FILTER = 26
+SO_RCVBUFFORCE = 33
+SO_TIMESTAMPNS = 35
+
+# Ethernet + IPv4 + TCP with options
+SNAPLEN = 128
+
+MAX_FLOWS = 65536
+
+# Optimistic ACKs of a flow before it is reported
+THRESHOLD = 3
+
+FIN, SYN, ACK = 0x01, 0x02, 0x10
+
+_IP = struct.Struct('!BxHxxxxxxxx4s4s')
+_TCP = struct.Struct('!HHIIBB')
+_TIMESPEC = struct.Struct('qq')
+
+def tcp_filter(snaplen=SNAPLEN):
+    """Classic BPF program: IPv4 TCP over Ethernet, truncated to `snaplen` bytes."""
+    return [
+        (0x28, 0, 0, 12),          # ldh [12]           ethertype
+        (0x15, 0, 3, 0x0800),      # jeq #IPv4          else drop
+        (0x30, 0, 0, 23),          # ldb [23]           IP protocol
+        (0x15, 0, 1, 6),           # jeq #TCP           else drop
+        (0x06, 0, 0, snaplen),     # ret #snaplen
+        (0x06, 0, 0, 0),           # ret #0
+    ]
+
+def open_socket(intf, snaplen=SNAPLEN, rcvbuf=32 << 20):
+    sock = socket.socket(socket.AF_PACKET, socket.SOCK_RAW, socket.htons(ETH_P_ALL))
+    program = ctypes.create_string_buffer(b''.join(struct.pack('HBBI', *insn) for insn in tcp_filter(snaplen)))
+    fprog = struct.pack('HL', len(tcp_filter(snaplen)), ctypes.addressof(program))
+    sock.setsockopt(socket.SOL_SOCKET, SO_ATTACH_FILTER, fprog)
+    try:
+        sock.setsockopt(socket.SOL_SOCKET, SO_RCVBUFFORCE, rcvbuf)
+    except PermissionError:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, rcvbuf)
+    sock.setsockopt(socket.SOL_SOCKET, SO_TIMESTAMPNS, 1)
+    sock.bind((intf, ETH_P_ALL))
+    # Packets queued before the filter was attached are not filtered; drain them
+    sock.setblocking(False)
+    try:
+        while True:
+            sock.recv(snaplen)
+    except BlockingIOError:
+        pass
+    sock.setblocking(True)
+    return sock
+
+def socket_stats(sock):
+    """(packets, drops) since the last call, from PACKET_STATISTICS."""
+    return struct.unpack('II', sock.getsockopt(SOL_PACKET, PACKET_STATISTICS, 8))
+
+def flow_name(key):
+    src, dst = socket.inet_ntoa(key[:4]), socket.inet_ntoa(key[4:8])
+    sport, dport = struct.unpack('!HH', key[8:])
+    return f'{src}:{sport}->{dst}:{dport}'
+
+class _Stop(Exception):
+    pass
+
+class Detector:
+    """Per-direction sequence state and the optimistic-ACK check.
+
+    A direction's entry is [highest end sequence seen, optimistic ACKs
+    against it, time of the first one, largest excess, alerted]. Keys are
+    the raw address and port bytes of the direction.
+    """
+
+    def __init__(self, max_flows=MAX_FLOWS, threshold=THRESHOLD, alert=None):
+        self.max_flows = max_flows
+        self.threshold = threshold
+        self.alert = alert
+        self.flows = OrderedDict()
+        self.packets = 0
+        self.evicted = 0
+        self.alerts = []
+
+    def packet(self, data, ts):
+        ihl = (data[14] & 0x0f) * 4
+        _, total, src, dst = _IP.unpack_from(data, 14)
+        tcp = 14 + ihl
+        sport, dport, seq, ack, offset, flags = _TCP.unpack_from(data, tcp)
+        payload = total - ihl - (offset >> 4) * 4
+        self.packets += 1
+        flows = self.flows
+
+        if payload > 0 or flags & (SYN | FIN):
+            key = data[26:34] + data[tcp:tcp + 4]
+            end = (seq + payload + (flags & SYN) // SYN + (flags & FIN)) & 0xffffffff
+            state = flows.get(key)
+            if state is None:
+                state = flows[key] = [end, 0, None, 0, False]
+                if len(flows) > self.max_flows:
+                    flows.popitem(last=False)
+                    self.evicted += 1
+            else:
+                flows.move_to_end(key)
+                if (end - state[0]) & 0xffffffff < 0x80000000:
+                    state[0] = end
+
+        if flags & ACK:
+            # The direction this ACK acknowledges
+            key = data[30:34] + data[26:30] + data[tcp + 2:tcp + 4] + data[tcp:tcp + 2]
+            state = flows.get(key)
+            if state is None:
+                return
+            excess = (ack - state[0]) & 0xffffffff
+            if 0 < excess < 0x80000000:
+                state[1] += 1
+                if state[2] is None:
+                    state[2] = ts
+                state[3] = max(state[3], excess)
+                if state[1] >= self.threshold and not state[4]:
+                    state[4] = True
+                    self._alert(key, state, ts)
+
+    def _alert(self, key, state, ts):
+        now = time.time()
+        alert = {'flow': flow_name(key), 'acked_by': flow_name(key[4:8] + key[:4] + key[10:] + key[8:10]),
+                 'first_ts': state[2], 'ts': ts, 'emitted': now, 'optimistic_acks': state[1],
+                 'max_excess_bytes': state[3], 'latency': now - state[2], 'lag': now - ts}
+        self.alerts.append(alert)
+        if self.alert:
+            self.alert(alert)
+
+def run(intf, alerts_file=None, stats_file=None, max_flows=MAX_FLOWS, threshold=THRESHOLD, snaplen=SNAPLEN):
+    out = open(alerts_file, 'w', buffering=1) if alerts_file else None
+
+    def alert(a):
+        print(f"ALERT {a['flow']}: {a['optimistic_acks']} ACKs up to {a['max_excess_bytes']} bytes beyond "
+              f"the data seen on {intf}, detected {a['latency'] * 1000:.1f} ms after the first", flush=True)
+        if out:
+            out.write(json.dumps(a) + '\n')
+
+    def stop(*_):
+        raise _Stop()
+
+    detector = Detector(max_flows, threshold, alert)
+    sock = open_socket(intf, snaplen)
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    received = drops = 0
+    cpu = time.process_time()
+    started = time.monotonic()
+    print(f"listening on {intf}", flush=True)
+    ancsize = socket.CMSG_SPACE(_TIMESPEC.size)
+    recvmsg = sock.recvmsg
+    packet = detector.packet
+    try:
+        while True:
+            data, anc, _, _ = recvmsg(snaplen, ancsize)
+            ts = None
+            for level, kind, value in anc:
+                if level == socket.SOL_SOCKET and kind == SO_TIMESTAMPNS:
+                    sec, nsec = _TIMESPEC.unpack_from(value)
+                    ts = sec + nsec * 1e-9
+            if len(data) >= 54:
+                packet(data, ts if ts is not None else time.time())
+    except _Stop:
+        pass
+    finally:
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        received, drops = socket_stats(sock)
+        sock.close()
+        if out:
+            out.close()
+    stats = {'interface': intf, 'packets': detector.packets, 'received': received, 'drops': drops,
+             'flows': len(detector.flows), 'evicted': detector.evicted, 'alerts': len(detector.alerts),
+             'seconds': time.monotonic() - started, 'cpu_seconds': time.process_time() - cpu}
+    if stats_file:
+        with open(stats_file, 'w') as f:
+            json.dump(stats, f, indent=2)
+    print(f"{stats['packets']} packets, {drops} dropped, {stats['flows']} flows "
+          f"({stats['evicted']} evicted), {stats['alerts']} alerts", flush=True)
+    return stats
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Optimistic ACK detector on one interface')
+    parser.add_argument('-i', '--interface', required=True)
+    parser.add_argument('--alerts', help='append alerts to this file (JSON lines)')
+    parser.add_argument('--stats', help='write packet, drop and flow counters to this file on exit')
+    parser.add_argument('--max-flows', type=int, default=MAX_FLOWS, help='flow directions kept (LRU)')
+    parser.add_argument('--threshold', type=int, default=THRESHOLD,
+                        help='optimistic ACKs of a flow before it is reported')
+    parser.add_argument('--snaplen', type=int, default=SNAPLEN)
+    return parser.parse_args(argv)
+
+if __name__ == '__main__':
+    if os.geteuid() != 0:
+        print("This script must be run as root.")
+        sys.exit(1)
+    args = parse_args()
+    run(args.interface, args.alerts, args.stats, args.max_flows, args.threshold, args.snaplen)
@@ -2,36 +2,66 @@
 
 import os
 
-def generate_throughput_report():
+from report_engine import load_run, phase_stats
+from iperf_stream import load_intervals_csv
+
+def iperf_phase_means(intervals, phases):
+    """{(flow, phase): (mean Mbps, retransmits)} over the iperf3 intervals ending in each phase."""
+    results = {}
+    for flow in sorted(set(intervals['Flow'].tolist())):
+        rows = intervals[intervals['Flow'] == flow]
+        for p in phases:
+            end = p['end'] if p.get('end') is not None else float('inf')
+            in_phase = rows[(rows['end'] > p['start']) & (rows['end'] <= end)]
+            if len(in_phase):
+                # Sum the streams of each interval before averaging over intervals
+                per_interval = {}
+                for row in in_phase:
+                    per_interval[row['end']] = per_interval.get(row['end'], 0.0) + row['bits_per_second']
+                retransmits = int(in_phase['retransmits'][in_phase['retransmits'] >= 0].sum())
+                results[(flow, p['name'])] = (float(sum(per_interval.values())) / len(per_interval) / 1e6, retransmits)
+    return results
+
+def generate_throughput_report(data_dir='./data'):
     """Generate a report on throughput during the optimistic ACKing attack."""
 
-    import matplotlib
-    matplotlib.use('Agg')
-    import matplotlib.pyplot as plt
-    import pandas as pd
-    import numpy as np
-
     try:
-        # Check if data directory exists
-        if not os.path.exists('./data'):
-            os.makedirs('./data')
-            print("Created data directory: ./data")
-
         # Check if throughput_log.csv exists
-        if not os.path.exists('./data/throughput_log.csv'):
+        if not os.path.exists(os.path.join(data_dir, 'throughput_log.csv')):
             print("Error: throughput_log.csv not found. Please run the experiment first.")
             return
 
-        df = pd.read_csv('./data/throughput_log.csv')
+        run = load_run(data_dir)
+        phases = run.meta.get('phases')
+        capacity = run.meta.get('bottleneck_mbps')
+        if not phases or len(phases) < 2 or not capacity:
+            print(f"Error: phases/bottleneck_mbps missing from {data_dir}/run.json. Please run the experiment first.")
+            return
+        before, during = phases[0]['name'], phases[1]['name']
+        attack_start = phases[1]['start']
+
+        stats = phase_stats(run)
+
+        # Check if there is enough data
+        if (before, 'jain') not in stats or (during, 'jain') not in stats:
+            print("Error: Not enough data for analysis. Ensure experiment captures pre and post attack phases.")
+            return
+
+        import matplotlib
+        matplotlib.use('Agg')
+        import matplotlib.pyplot as plt
 
         # Plot the throughput data
         plt.figure(figsize=(10, 6))
-        plt.plot(df['Time'], df['Target_Throughput_Mbps'], label='Target Traffic')
-        plt.plot(df['Time'], df['Attacker_Throughput_Mbps'], label='Attacker Traffic')
-        plt.plot(df['Time'], df['Total_Throughput_Mbps'], label='Total Traffic', linestyle='--')
+        plt.plot(run.time, run.flows['Target'], label='Target Traffic')
+        plt.plot(run.time, run.flows['Attacker'], label='Attacker Traffic')
+        plt.plot(run.time, run.flows['Target'] + run.flows['Attacker'], label='Total Traffic', linestyle='--')
 
         # Highlight the attack period
-        plt.axvline(x=5, color='r', linestyle='--', label='Attack Starts')
+        plt.axvline(x=attack_start, color='r', linestyle='--', label='Attack Starts')
+
+        # Add a horizontal line for the bottleneck capacity
+        plt.axhline(y=capacity, color='k', linestyle=':', label=f'Bottleneck Capacity ({capacity} Mbps)')
 
         plt.title('Optimistic ACKing Attack: Throughput Impact')
         plt.xlabel('Time (seconds)')
@@ -39,44 +69,53 @@ def generate_throughput_report():
         plt.legend()
         plt.grid(True)
 
-        # Add a horizontal line for the bottleneck capacity
-        plt.axhline(y=10, color='k', linestyle=':', label='Bottleneck Capacity (10 Mbps)')
-
         # Save the plot
-        plt.savefig('./data/throughput_graph.png')
-        print("Throughput graph saved to ./data/throughput_graph.png")
+        plt.savefig(os.path.join(data_dir, 'throughput_graph.png'))
+        plt.close()
+        print(f"Throughput graph saved to {data_dir}/throughput_graph.png")
 
-        # Calculate statistics
-        pre_attack = df[df['Time'] < 5]
-        post_attack = df[df['Time'] >= 5]
+        def line(phase, name):
+            return (f"{stats[(phase, name + '.mean')]:.2f} Mbps "
+                    f"(p50 {stats[(phase, name + '.p50')]:.2f}, p95 {stats[(phase, name + '.p95')]:.2f}, "
+                    f"p99 {stats[(phase, name + '.p99')]:.2f})")
 
-        # Check if there is enough data
-        if len(pre_attack) == 0 or len(post_attack) == 0:
-            print("Error: Not enough data for analysis. Ensure experiment captures pre and post attack phases.")
-            return
-
-        pre_target_avg = pre_attack['Target_Throughput_Mbps'].mean()
-        post_target_avg = post_attack['Target_Throughput_Mbps'].mean()
-        pre_attacker_avg = pre_attack['Attacker_Throughput_Mbps'].mean()
-        post_attacker_avg = post_attack['Attacker_Throughput_Mbps'].mean()
+        pre_target_avg = stats[(before, 'Target.mean')]
+        post_target_avg = stats[(during, 'Target.mean')]
 
         # Generate report
-        with open('./data/attack_report.txt', 'w') as f:
+        with open(os.path.join(data_dir, 'attack_report.txt'), 'w') as f:
             f.write("Optimistic ACKing Attack Report\n")
             f.write("==============================\n\n")
-            f.write(f"Target Traffic (Before Attack): {pre_target_avg:.2f} Mbps\n")
-            f.write(f"Target Traffic (During Attack): {post_target_avg:.2f} Mbps\n")
+            f.write(f"Target Traffic (Before Attack): {line(before, 'Target')}\n")
+            f.write(f"Target Traffic (During Attack): {line(during, 'Target')}\n")
 
-            reduction = (1 - post_target_avg/pre_target_avg)*100
+            reduction = (1 - post_target_avg/pre_target_avg)*100 if pre_target_avg else 0.0
             f.write(f"Throughput Reduction: {reduction:.2f}%\n\n")
 
-            f.write(f"Attacker Traffic (Before Attack): {pre_attacker_avg:.2f} Mbps\n")
-            f.write(f"Attacker Traffic (During Attack): {post_attacker_avg:.2f} Mbps\n\n")
+            f.write(f"Attacker Traffic (Before Attack): {line(before, 'Attacker')}\n")
+            f.write(f"Attacker Traffic (During Attack): {line(during, 'Attacker')}\n\n")
             f.write("Total Traffic:\n")
-            f.write(f"  Before Attack: {pre_attack['Total_Throughput_Mbps'].mean():.2f} Mbps\n")
-            f.write(f"  During Attack: {post_attack['Total_Throughput_Mbps'].mean():.2f} Mbps\n")
-
-        print("Attack report saved to ./data/attack_report.txt")
+            f.write(f"  Before Attack: {line(before, 'Total')}\n")
+            f.write(f"  During Attack: {line(during, 'Total')}\n\n")
+            f.write(f"Bottleneck Utilization ({capacity} Mbps):\n")
+            f.write(f"  Before Attack: {stats[(before, 'utilization')] * 100:.1f}%\n")
+            f.write(f"  During Attack: {stats[(during, 'utilization')] * 100:.1f}%\n\n")
+            f.write("Jain's Fairness Index (Target vs Attacker):\n")
+            f.write(f"  Before Attack: {stats[(before, 'jain')]:.3f}\n")
+            f.write(f"  During Attack: {stats[(during, 'jain')]:.3f}\n")
+
+            # Per-flow results reported by the iperf3 clients themselves
+            intervals_file = os.path.join(data_dir, 'iperf_intervals.csv')
+            if os.path.exists(intervals_file):
+                means = iperf_phase_means(load_intervals_csv(intervals_file), phases)
+                f.write("\niperf3 Per-Flow Results (mean of 1 s intervals, retransmits):\n")
+                for flow in ('Target', 'Attacker'):
+                    cells = [f"{label}: {means[(flow, name)][0]:.2f} Mbps, {means[(flow, name)][1]} retr"
+                             for label, name in (('Before Attack', before), ('During Attack', during))
+                             if (flow, name) in means]
+                    f.write(f"  {flow}: {'; '.join(cells) or 'no intervals'}\n")
+
+        print(f"Attack report saved to {data_dir}/attack_report.txt")
     except Exception as e:
         import traceback
         print(f"Error generating report: {e}")
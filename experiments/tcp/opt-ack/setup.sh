@@ -25,11 +25,11 @@ if [ $? -ne 0 ]; then
   pip3 install matplotlib pandas numpy
 fi
 
-# Check for iperf
-if ! command -v iperf &> /dev/null; then
-  echo "Installing iperf..."
+# Check for iperf (sink for optack.py) and iperf3 (measured flows)
+if ! command -v iperf &> /dev/null || ! command -v iperf3 &> /dev/null; then
+  echo "Installing iperf and iperf3..."
   apt-get update
-  apt-get install -y iperf
+  apt-get install -y iperf iperf3
 fi
 
 echo "All dependencies are installed."
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+
+import os
+import socket
+import struct
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from optack_detector import Detector, ACK, SYN
+
+CLIENT, SERVER = ('10.0.1.1', 40000), ('10.0.4.2', 5001)
+MSS = 1448
+
+def frame(src, dst, seq, ack, flags=ACK, payload=0):
+    """Ethernet/IPv4/TCP headers of one segment, truncated before the payload as the socket filter does."""
+    ip = struct.pack('!BBHHHBBH4s4s', 0x45, 0, 20 + 20 + payload, 0, 0, 64, socket.IPPROTO_TCP, 0,
+                     socket.inet_aton(src[0]), socket.inet_aton(dst[0]))
+    tcp = struct.pack('!HHIIBBHHH', src[1], dst[1], seq, ack, 5 << 4, flags, 65535, 0, 0)
+    return bytes(12) + b'\x08\x00' + ip + tcp
+
+def handshake(detector, ts, iss=1000, irs=5000):
+    detector.packet(frame(CLIENT, SERVER, iss, 0, SYN), ts)
+    detector.packet(frame(SERVER, CLIENT, irs, iss + 1, SYN | ACK), ts)
+    detector.packet(frame(CLIENT, SERVER, iss + 1, irs + 1), ts)
+    return irs + 1
+
+def test_honest_receiver_raises_no_alert():
+    detector = Detector()
+    seq = handshake(detector, 0.0)
+    for i in range(100):
+        detector.packet(frame(SERVER, CLIENT, seq, 1001, payload=MSS), i * 0.001)
+        seq += MSS
+        # The client acknowledges every segment once it has crossed the link
+        detector.packet(frame(CLIENT, SERVER, 1001, seq), i * 0.001 + 0.0005)
+    assert detector.alerts == []
+
+def test_acks_beyond_the_data_raise_one_alert():
+    alerts = []
+    detector = Detector(threshold=3, alert=alerts.append)
+    seq = handshake(detector, 0.0)
+    for i in range(10):
+        detector.packet(frame(SERVER, CLIENT, seq, 1001, payload=MSS), 0.001 * i)
+        seq += MSS
+        detector.packet(frame(CLIENT, SERVER, 1001, seq), 0.001 * i + 0.0005)
+
+    # The attacker runs ahead of the server: every ACK covers segments still to be sent
+    attack = 1.0
+    for i in range(6):
+        detector.packet(frame(CLIENT, SERVER, 1001, seq + (i + 1) * 10 * MSS), attack + 0.002 * i)
+
+    assert len(alerts) == 1
+    alert = alerts[0]
+    assert alert['flow'] == f'{SERVER[0]}:{SERVER[1]}->{CLIENT[0]}:{CLIENT[1]}'
+    assert alert['acked_by'] == f'{CLIENT[0]}:{CLIENT[1]}->{SERVER[0]}:{SERVER[1]}'
+    assert alert['optimistic_acks'] == 3
+    assert alert['max_excess_bytes'] == 30 * MSS
+    # Detection latency on the packet clock: from the first optimistic ACK to the threshold-th one
+    assert alert['first_ts'] == attack
+    assert abs((alert['ts'] - alert['first_ts']) - 0.004) < 1e-9
+    # Further optimistic ACKs of the flow are counted but not reported again
+    key = socket.inet_aton(SERVER[0]) + socket.inet_aton(CLIENT[0]) + struct.pack('!HH', SERVER[1], CLIENT[1])
+    assert detector.flows[key][1] == 6
+    assert len(detector.alerts) == 1
+
+def test_sequence_wraparound_is_not_optimistic():
+    detector = Detector(threshold=1)
+    seq = handshake(detector, 0.0, irs=0xffffffff - 2 * MSS)
+    for i in range(4):
+        detector.packet(frame(SERVER, CLIENT, seq, 1001, payload=MSS), 0.001 * i)
+        seq = (seq + MSS) & 0xffffffff
+        detector.packet(frame(CLIENT, SERVER, 1001, seq), 0.001 * i + 0.0005)
+    assert detector.alerts == []
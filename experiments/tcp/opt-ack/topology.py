@@ -3,6 +3,8 @@
 from mininet.topo import Topo
 from mininet.node import Node
 
+from aqm import AQMLink, aqm_params
+
 # Define a custom Linux router class
 class LinuxRouter(Node):
     def config(self, **params):
@@ -14,7 +16,8 @@ class LinuxRouter(Node):
         super(LinuxRouter, self).terminate()
 
 class DumbbellTopo(Topo):
-    def build(self):
+    def build(self, bottleneck=10, aqm=None):
+        # aqm: bottleneck queue discipline (aqm.aqm_params()), None for TCLink's
         # Create routers
         r1 = self.addNode('r1', cls=LinuxRouter)
         r2 = self.addNode('r2', cls=LinuxRouter)
@@ -29,4 +32,4 @@ class DumbbellTopo(Topo):
         self.addLink(ts, r2, bw=100, delay='10ms')
         self.addLink(ac, r1, bw=100, delay='10ms')
         self.addLink(ats, r2, bw=100, delay='10ms')
-        self.addLink(r1, r2, bw=10, delay='10ms')  # Bottleneck link
+        self.addLink(r1, r2, cls=AQMLink, bw=bottleneck, delay='10ms', **aqm_params(aqm))  # Bottleneck link
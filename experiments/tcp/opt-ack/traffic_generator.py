@@ -1,55 +1,43 @@
 #!/usr/bin/python
 
-import time
-
-def start_normal_traffic(net):
-    print("Starting normal TCP traffic at time 0.0s")
-    tc = net.get('tc')
-    ts = net.get('ts')
-
-    # Launch iperf server on target_server
-    ts.cmd('pkill -f iperf')  # Clean up any existing iperf processes
-    ts.cmd('iperf -s > ./data/ts_server.log 2>&1 &')
-    time.sleep(1)
-
-    # Check if the server is running
-    server_pid = ts.cmd('pgrep -f "iperf -s"').strip()
-    if server_pid:
-        print(f"iperf server started on target_server with PID {server_pid}")
-    else:
-        print("WARNING: iperf server may not have started properly on target_server")
-        # Try to start it again
-        ts.cmd('iperf -s > ./data/ts_server.log 2>&1 &')
-        time.sleep(1)
-
-    # Launch iperf client on target_client
-    # iperf client will connect to the server
-    tc.cmd('iperf -c 10.0.2.2 -t 15 -i 1 > ./data/target_traffic.log 2>&1 &')
+from launcher import start_server
+from iperf_stream import Iperf3Client, IPERF3_PORT
+
+# Default iperf (v2) port; optack.py sends raw data to this sink, which an
+# iperf3 server would reject. The measured flows use iperf3 on IPERF3_PORT.
+IPERF_PORT = 5001
+
+def start_servers(net, procs):
+    """Start the target and attacker servers before the timeline begins."""
+    ts, ats = net.get('ts', 'ats')
+    start_server(ts, f'iperf3 -s -p {IPERF3_PORT}', IPERF3_PORT, './data/ts_server.log', supervisor=procs)
+    start_server(ats, f'iperf3 -s -p {IPERF3_PORT}', IPERF3_PORT, './data/ats_server.log', supervisor=procs)
+    start_server(ats, 'iperf -s', IPERF_PORT, './data/ats_optack_sink.log', supervisor=procs)
+
+def target_client(net, procs):
+    """iperf3 client of the normal flow (JSON records also kept in target_traffic.log)."""
+    return Iperf3Client(procs, net.get('tc'), f'iperf3 -c 10.0.2.2 -p {IPERF3_PORT} -t 15 -i 1',
+                        log_file='./data/target_traffic.log', name='Target')
+
+def attacker_client(net, procs):
+    """iperf3 client of the attacker flow (JSON records also kept in attacker_traffic.log)."""
+    return Iperf3Client(procs, net.get('ac'), f'iperf3 -c 10.0.4.2 -p {IPERF3_PORT} -t 55 -i 1 -w 65535',
+                        log_file='./data/attacker_traffic.log', name='Attacker')
+
+def start_normal_traffic(client):
+    print("Starting normal TCP traffic")
+
+    # iperf3 client on target_client, connecting to target_server
+    client.start()
     print("Target traffic started")
 
-def start_optimistic_acking_attack(net):
-    print("Starting Optimistic ACKing attack at time 5.0s")
+def start_optimistic_acking_attack(net, procs, client):
+    print("Starting Optimistic ACKing attack")
     ac = net.get('ac')
-    ats = net.get('ats')
-
-    # Launch iperf server on attacker_server
-    ats.cmd('pkill -f iperf')  # Clean up any existing iperf processes
-    ats.cmd('iperf -s > ./data/ats_server.log 2>&1 &')
-    time.sleep(1)  # Wait for the server to start
-
-    # Check if the server is running
-    server_pid = ats.cmd('pgrep -f "iperf -s"').strip()
-    if server_pid:
-        print(f"iperf server started on attacker_server with PID {server_pid}")
-    else:
-        print("WARNING: iperf server may not have started properly on attacker_server")
-        # Try again
-        ats.cmd('iperf -s > ./data/ats_server.log 2>&1 &')
-        time.sleep(1)
 
     # Execute the Optimistic ACKing attack script
-    ac.cmd('python3 ./optack.py > ./data/attack.log 2>&1 &')
+    procs.start(ac, 'python3 ./optack.py', './data/attack.log', name='optack')
 
-    # Also run normal iperf attack (with 1 second interval logging)
-    ac.cmd('iperf -c 10.0.4.2 -t 55 -i 1 -w 65535 > ./data/attacker_traffic.log 2>&1 &')
+    # Also run a normal iperf3 flow from the attacker (1 second interval records)
+    client.start()
     print("Attack traffic started")
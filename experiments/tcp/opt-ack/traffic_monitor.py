@@ -1,80 +1,141 @@
 #!/usr/bin/python
 
-import time
-import threading
+import json
 import os
+import time
 
-def periodic_throughput_measurement(net, interval=1.0, duration=15):
-    """Function to measure throughput periodically."""
-
-    # Get the target and attacker server names
-    ts_name = 'ts'
-    ats_name = 'ats'
-
-    # Generate data directory
-    with open('./data/throughput_log.csv', 'w') as f:
-        f.write("Time,Target_Throughput_Mbps,Attacker_Throughput_Mbps,Total_Throughput_Mbps\n")
-
-    start_time = time.time()
-    attack_start_time = start_time + 5  # Start attack after 5 seconds
-
-    # Execute the throughput measurement in a loop
-    for i in range(int(duration / interval)):
-        current_time = time.time()
-        elapsed = current_time - start_time
-
-        # Avoid measuring throughput during the attack
-        ts = net.getNodeByName(ts_name)
-        ats = net.getNodeByName(ats_name)
-
-        # Measure the target throughput
-        result_target = ts.cmd('cat /proc/net/dev | grep ts-eth0')
-        bytes_rx_target = int(result_target.split()[1]) if result_target else 0
-
-        # Measure the attacker's throughput
-        result_attacker = ats.cmd('cat /proc/net/dev | grep ats-eth0')
-        bytes_rx_attacker = int(result_attacker.split()[1]) if result_attacker else 0
-
-        # Wait for the interval
-        time.sleep(interval)
+import numpy as np
 
-        ts = net.getNodeByName(ts_name)
-        ats = net.getNodeByName(ats_name)
+from capture import Capture
+from counter_sampler import CounterSampler
+from metrics_sink import MetricsSink, load
+from pcap_analyzer import analyze, print_summary, write_series_csv
+import rtt_probe
 
-        # Measure the target throughput again
-        result_target = ts.cmd('cat /proc/net/dev | grep ts-eth0')
-        bytes_rx_target_2 = int(result_target.split()[1]) if result_target else 0
+COUNTERS_FILE = './data/counters.bin'
+RTT_FILE = './data/rtt_probe.bin'
 
-        result_attacker = ats.cmd('cat /proc/net/dev | grep ats-eth0')
-        bytes_rx_attacker_2 = int(result_attacker.split()[1]) if result_attacker else 0
+def periodic_throughput_measurement(net, interval=0.1, duration=15, attack_start=5.0, t0=None):
+    """Function to measure throughput periodically."""
 
-        # Calculate throughput (bits per second)
-        try:
-            target_throughput = (bytes_rx_target_2 - bytes_rx_target) * 8 / interval / 1000000
-            attacker_throughput = (bytes_rx_attacker_2 - bytes_rx_attacker) * 8 / interval / 1000000
-            total_throughput = target_throughput + attacker_throughput
+    # Counters of the target/attacker servers and the bottleneck side of r1
+    sampler = CounterSampler(net, interval=interval, nodes=['ts', 'ats', 'r1'],
+                             intfs=['ts-eth0', 'ats-eth0', 'r1-eth2'])
+    sink = MetricsSink(COUNTERS_FILE, sampler.columns,
+                       meta={'interval': interval, 'attack_start': attack_start})
+    target = sampler.columns.index('ts-eth0.rx_bytes')
+    attacker = sampler.columns.index('ats-eth0.rx_bytes')
+
+    # Print roughly once per second regardless of the sampling interval
+    print_every = max(1, int(round(1.0 / interval)))
+    last = {}
+
+    def on_sample(t, values):
+        sink.append(t, values)
+        if (sink.rows - 1) % print_every:
+            return
+        if last:
+            elapsed = t - last['t']
+            target_mbps = (values[target] - last['target']) * 8 / elapsed / 1000000
+            attacker_mbps = (values[attacker] - last['attacker']) * 8 / elapsed / 1000000
 
             # Display the phase of the attack
-            phase = "BEFORE ATTACK" if elapsed < 5.0 else "DURING ATTACK"
-
-            # Save the throughput data
-            with open('./data/throughput_log.csv', 'a') as f:
-                f.write(f"{elapsed:.1f},{target_throughput:.2f},{attacker_throughput:.2f},{total_throughput:.2f}\n")
-
-            # Display the throughput data
-            print(f"[{elapsed:.1f}s] {phase}: Target: {target_throughput:.2f} Mbps, Attacker: {attacker_throughput:.2f} Mbps, Total: {total_throughput:.2f} Mbps")
-        except Exception as e:
-            print(f"Error during throughput calculation: {e}")
+            phase = "BEFORE ATTACK" if last['t'] < attack_start else "DURING ATTACK"
+            print(f"[{last['t']:.1f}s] {phase}: Target: {target_mbps:.2f} Mbps, Attacker: {attacker_mbps:.2f} Mbps, Total: {target_mbps + attacker_mbps:.2f} Mbps")
+        last.update(t=t, target=values[target], attacker=values[attacker])
+
+    sampler.callback = on_sample
+    try:
+        sampler.run(duration, t0)
+    finally:
+        sampler.close()
+        sink.close()
+
+    if sampler.missed:
+        print(f"Throughput sampler missed {sampler.missed} of {sampler.samples + sampler.missed} ticks")
+
+    export_throughput_csv()
+
+def export_throughput_csv(counters_file=COUNTERS_FILE):
+    """Derive throughput_log.csv and router_throughput.csv from the recorded counters."""
+    records = load(counters_file)
+    if len(records) < 2:
+        print("Error: not enough counter samples to compute throughput.")
+        return
+
+    t = records['t']
+    elapsed = np.diff(t)
+
+    def mbps(column):
+        return np.diff(records[column].astype(np.float64)) * 8 / elapsed / 1000000
+
+    target = mbps('ts-eth0.rx_bytes')
+    attacker = mbps('ats-eth0.rx_bytes')
+    np.savetxt('./data/throughput_log.csv',
+               np.column_stack([t[:-1], target, attacker, target + attacker]),
+               delimiter=',', fmt=['%.3f', '%.2f', '%.2f', '%.2f'], comments='',
+               header="Time,Target_Throughput_Mbps,Attacker_Throughput_Mbps,Total_Throughput_Mbps")
+
+    rows = np.column_stack([t[:-1], mbps('r1-eth2.rx_bytes'), mbps('r1-eth2.tx_bytes')])
+    with open('./data/router_throughput.csv', 'w') as f:
+        f.write("Time(s),Interface,RX_Mbps,TX_Mbps\n")
+        f.writelines(f"{start:.3f},r1-eth2,{rx:.2f},{tx:.2f}\n" for start, rx, tx in rows)
+
+def monitor_traffic(net, procs):
+    r1 = net.get('r1')
+    # Monitor the traffic on the router: headers only, in gzipped 100 MB segments
+    capture = Capture(procs, r1, 'r1-eth2', './data/bottleneck', segment_mb=100, name='bottleneck')
+    return capture.start()
 
-        # Check if the attack has started
-        if elapsed >= duration:
-            break
+def stop_monitoring(capture, data_dir='./data'):
+    # Stop the capture so its buffers are flushed before analysis; its drop counters go to run.json
+    capture.stop()
+    capture.record(data_dir)
 
-def monitor_traffic(net):
+def start_detector(net, procs, intf='r1-eth2', data_dir='./data', timeout=5.0):
+    """Run optack_detector.py on r1 and return once its packet socket is open."""
     r1 = net.get('r1')
-    # Monitor the traffic on the router
-    r1.cmd('tcpdump -i r1-eth2 -w ./data/bottleneck.pcap &')
-    
-    # Execute the router throughput monitoring script
-    r1.cmd('chmod +x ./monitor.sh')
-    r1.cmd('./monitor.sh > ./data/router_monitor.log 2>&1 &')
+    log = os.path.join(data_dir, 'optack_detector.log')
+    proc = procs.start(r1, f'python3 ./optack_detector.py -i {intf} '
+                           f'--alerts {data_dir}/optack_alerts.jsonl --stats {data_dir}/optack_detector.json',
+                       log, name='optack_detector')
+    deadline = time.monotonic() + timeout
+    while 'listening on' not in open(log).read():
+        if not proc.running() or time.monotonic() > deadline:
+            raise RuntimeError(f"optack detector did not start, see {log}")
+        time.sleep(0.01)
+    return proc
+
+def stop_detector(procs, data_dir='./data'):
+    """Stop the detector; returns its counters and alerts."""
+    procs.stop(node='r1', name='optack_detector')
+    with open(os.path.join(data_dir, 'optack_detector.json')) as f:
+        stats = json.load(f)
+    with open(os.path.join(data_dir, 'optack_alerts.jsonl')) as f:
+        alerts = [json.loads(line) for line in f if line.strip()]
+    return stats, alerts
+
+def start_rtt_echo(net, procs, dst='ts'):
+    """Echo responder for the RTT probes, started with the servers before t0."""
+    return rtt_probe.start_echo(procs, net.get(dst), log_file='./data/rtt_echo.log')
+
+def start_rtt_probe(net, procs, interval, duration, t0, src='tc', dst='ts'):
+    """UDP RTT probes along the target flow's path for `duration` seconds, on the throughput sampler's t0."""
+    return rtt_probe.start_probe(procs, net.get(src), net.get(dst).IP(), RTT_FILE, interval, t0=t0,
+                                 duration=duration, log_file='./data/rtt_probe.log')
+
+def stop_rtt_probe(procs, attack_start, data_dir='./data'):
+    """Stop the probe; returns its summaries before and during the attack and writes rtt_series.csv."""
+    procs.stop(name='rtt_probe')
+    procs.stop(name='rtt_echo')
+    summaries = {'before_attack': rtt_probe.probe_summary(RTT_FILE, 0.0, attack_start),
+                 'during_attack': rtt_probe.probe_summary(RTT_FILE, attack_start)}
+    rtt_probe.write_series_csv({'tc-ts': RTT_FILE}, os.path.join(data_dir, 'rtt_series.csv'))
+    return summaries
+
+def analyze_capture(capture, t0=None):
+    """Per-flow throughput, retransmission and window analysis of the capture segments."""
+    results = analyze(capture.segments(), min_bytes=1000000, t0=t0)
+    print_summary(results)
+    write_series_csv(results, './data/bottleneck_flows.csv')
+    print("Per-flow series saved to ./data/bottleneck_flows.csv")
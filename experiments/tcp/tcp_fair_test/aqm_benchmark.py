@@ -0,0 +1,151 @@
+#!/usr/bin/env python
+
+import csv
+import os
+import sys
+import time
+
+import numpy as np
+
+from mininet.node import Host
+from mininet.log import setLogLevel
+
+# Shared experiment helpers live in experiments/common
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'common'))
+
+from tcp_fair_test import tcp_profile
+from many_flows import run_many_flows
+from session import ExperimentSession
+from bringup import BatchMininet
+from dumbbell import DumbbellTopo, pair_checks
+from netconf import check_connectivity
+from aqm import AQMS, aqm_params
+from flowgen import OK
+from report_engine import jain_index
+from run_metadata import write_metadata
+import rtt_probe
+
+# Probing before the bulk flows start, for the unloaded RTT (seconds)
+IDLE = 2.0
+
+# Statistics leave out the first seconds of load, while the flows ramp up
+WARMUP = 2.0
+
+# RTT probe interval (seconds)
+PROBE_INTERVAL = 0.01
+
+PERCENTILES = (50, 95, 99)
+
+RESULT_FIELDS = ('aqm', 'trial', 'flows', 'mbps', 'utilization', 'jain', 'failed', 'base_rtt_ms',
+                 'qdelay_p50_ms', 'qdelay_p95_ms', 'qdelay_p99_ms', 'qdelay_max_ms', 'probe_loss')
+
+def probe_stats(probe_file, load_start, load_end):
+    """Unloaded RTT, queueing delay percentiles and loss of the probes sent in [load_start, load_end).
+
+    Queueing delay is a probe's RTT above the smallest RTT seen before
+    the load started (times in seconds after the prober's t0).
+    """
+    base = rtt_probe.probe_summary(probe_file, end=load_start)['rtt_ms'].get('min', np.nan)
+    loaded = rtt_probe.probe_summary(probe_file, load_start, load_end)
+    rtt = loaded['rtt_ms']
+    stats = {'base_rtt_ms': base, 'probe_loss': loaded['loss']}
+    for name in ('p50', 'p95', 'p99', 'max'):
+        stats[f'qdelay_{name}_ms'] = rtt[name] - base if rtt else np.nan
+    return stats
+
+def latency_under_load(session, spec, pairs, flows, duration, out_dir, interval=PROBE_INTERVAL):
+    """Bulk flows over the bottleneck with `spec` as its queue discipline, with RTT probes alongside.
+
+    `flows` flows start together after IDLE seconds of probing and run
+    for `duration` seconds; client1 probes server1 throughout. Returns one
+    RESULT_FIELDS row.
+    """
+    session.configure_link('r1', 'r2', **aqm_params(spec))
+    bw = session.topo.linkInfo('r1', 'r2')['bw']
+    with session.trial() as net:
+        os.makedirs(out_dir, exist_ok=True)
+        probe_file = os.path.join(out_dir, 'rtt_probe.bin')
+        client, server = net.get('client1', 'server1')
+        rtt_probe.start_echo(session.procs, server)
+        # The probes start IDLE seconds before the flows, on the same clock
+        probe_t0 = time.monotonic() + 0.1
+        rtt_probe.start_probe(session.procs, client, server.IP(), probe_file, interval, t0=probe_t0)
+        try:
+            results = run_many_flows(net, session.procs, pairs, flows, duration, stagger=0,
+                                     out_dir=out_dir, t0=probe_t0 + IDLE)
+        finally:
+            session.procs.stop(name='rtt_probe')
+        rtt_probe.write_series_csv({'client1-server1': probe_file}, os.path.join(out_dir, 'rtt_series.csv'))
+
+    goodput = np.where(results['status'] == OK, results['goodput_mbps'], 0.0)
+    row = {'aqm': spec, 'flows': flows, 'mbps': float(goodput.sum()),
+           'utilization': float(goodput.sum() / bw), 'jain': float(jain_index(goodput)),
+           'failed': int((results['status'] != OK).sum())}
+    row.update(probe_stats(probe_file, IDLE + WARMUP, IDLE + duration))
+    write_metadata(out_dir, latency_under_load=row, probe_interval=interval)
+    return row
+
+def print_table(rows, info=sys.stdout.write):
+    info('%-28s %8s %6s %6s %9s %9s %9s %9s %7s\n' % (
+        'qdisc', 'Mbps', 'util', 'Jain', 'base RTT', 'qdel p50', 'qdel p95', 'qdel p99', 'loss'))
+    for row in rows:
+        info('%-28s %8.2f %5.1f%% %6.3f %9.1f %9.1f %9.1f %9.1f %6.2f%%\n' % (
+            row['aqm'], row['mbps'], row['utilization'] * 100, row['jain'], row['base_rtt_ms'],
+            row['qdelay_p50_ms'], row['qdelay_p95_ms'], row['qdelay_p99_ms'], row['probe_loss'] * 100))
+
+def write_results(rows, path):
+    with open(path, 'w', newline='') as f:
+        writer = csv.DictWriter(f, RESULT_FIELDS)
+        writer.writeheader()
+        writer.writerows(rows)
+
+def parse_args(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(description='Latency under load of bottleneck queue disciplines')
+    parser.add_argument('--aqm', nargs='+', default=list(AQMS), metavar='SPEC',
+                        help=f"queue disciplines ({', '.join(AQMS)}), with tc options after a colon, "
+                             "e.g. fq_codel:target=5ms,interval=100ms pie:target=15ms red:min=15000,max=45000")
+    parser.add_argument('--flows', type=int, default=4, help='concurrent bulk flows')
+    parser.add_argument('--pairs', type=int, default=2, help='client/server pairs the flows are spread over')
+    parser.add_argument('--duration', type=float, default=20, help='seconds of load')
+    parser.add_argument('--bottleneck', type=int, default=10, help='bottleneck bandwidth (Mbps)')
+    parser.add_argument('--interval', type=float, default=PROBE_INTERVAL, help='latency probe interval (seconds)')
+    parser.add_argument('--tcp', default='cubic', help='congestion control algorithm')
+    parser.add_argument('--trials', type=int, default=1, help='runs of every queue discipline')
+    parser.add_argument('--out', default='./aqm_results', help='results directory')
+    return parser.parse_args(argv)
+
+def main():
+    args = parse_args()
+    session = ExperimentSession(DumbbellTopo(args.pairs, bw_bottleneck=args.bottleneck,
+                                             bottleneck=aqm_params(args.aqm[0])),
+                                profile=tcp_profile(args.tcp), host=Host, mininet=BatchMininet)
+    net = session.start()
+    rows = []
+    try:
+        for (src, dst), ok in check_connectivity(net, pair_checks(args.pairs)).items():
+            if not ok:
+                print(f"WARNING: {src} cannot reach {dst}")
+        for spec in args.aqm:
+            for trial in range(args.trials):
+                print(f"\n*** {spec}, trial {trial + 1}/{args.trials}")
+                out_dir = os.path.join(args.out, f"{spec.replace(':', '_').replace(',', '_')}_{trial + 1:03d}")
+                row = latency_under_load(session, spec, args.pairs, args.flows, args.duration, out_dir,
+                                         args.interval)
+                rows.append(dict(row, trial=trial + 1))
+    finally:
+        session.stop()
+
+    os.makedirs(args.out, exist_ok=True)
+    results = os.path.join(args.out, 'latency_under_load.csv')
+    write_results(rows, results)
+    print(f"\nLatency under load ({args.flows} flows, {args.bottleneck} Mbps bottleneck), saved to {results}:")
+    print_table(rows)
+
+if __name__ == '__main__':
+    if os.geteuid() != 0:
+        print("This script must be run as root.")
+        print("Please run with: sudo python %s" % sys.argv[0])
+        sys.exit(1)
+    setLogLevel('warning')
+    main()
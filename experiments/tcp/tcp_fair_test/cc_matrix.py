@@ -0,0 +1,183 @@
+#!/usr/bin/env python
+
+import csv
+import itertools
+import os
+import sys
+
+import numpy as np
+
+from mininet.node import Host
+from mininet.log import setLogLevel
+
+# Shared experiment helpers live in experiments/common
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'common'))
+
+from tcp_fair_test import tcp_profile, COMPETITOR_START, CONVERGENCE_TOLERANCE, JAIN_WINDOW
+from many_flows import run_plan, write_flows_csv, write_series_csv
+from session import ExperimentSession
+from host_tuning import check_cc
+from bringup import BatchMininet
+from dumbbell import DumbbellTopo, pair_checks
+from aqm import aqm_params
+from netconf import check_connectivity
+from flowgen import make_flows, load_series, OK
+from report_engine import competition_stats
+from run_metadata import write_metadata, phase
+
+# Per-flow goodput series interval, fine enough to time convergence (seconds)
+SERIES_INTERVAL = 0.1
+
+RESULT_FIELDS = ('mix', 'trial', 'incumbent', 'newcomers', 'mbps', 'utilization', 'incumbent_share',
+                 'jain_mean', 'jain_min', 'convergence_s', 'failed', 'shares')
+
+def competition_plan(mix, duration, join=COMPETITOR_START):
+    """{pair: flow specs}: one flow per algorithm of `mix`, each on its own client/server pair.
+
+    The first (incumbent) flow starts at 0, the others join at `join`;
+    all of them end at `duration`.
+    """
+    return {i: make_flows(1, f'server{i}', first_id=i - 1, start=0.0 if i == 1 else join,
+                          duration=duration if i == 1 else duration - join, cc=cc)
+            for i, cc in enumerate(mix, 1)}
+
+def flow_name(flow, cc):
+    return f'{flow}:{cc}'
+
+def series_matrix(series_files, mix, interval=SERIES_INTERVAL):
+    """(time grid, {flow name: goodput in Mbps on the grid}); bins without a sample are 0."""
+    series = load_series(*series_files)
+    last = max((int(round(t[-1] / interval)) for t, _ in series.values() if len(t)), default=0)
+    time = np.arange(last + 1) * interval
+    flows = {}
+    for flow, cc in enumerate(mix):
+        column = np.zeros(len(time))
+        t, mbps = series.get(flow, (np.empty(0), np.empty(0)))
+        column[np.round(t / interval).astype(np.int64)] = mbps
+        flows[flow_name(flow, cc)] = column
+    return time, flows
+
+def run_mix(session, mix, duration, out_dir, join=COMPETITOR_START, tolerance=CONVERGENCE_TOLERANCE,
+            window=JAIN_WINDOW):
+    """One competition run of `mix` (see competition_plan()); returns its RESULT_FIELDS row."""
+    with session.trial() as net:
+        plan = competition_plan(mix, duration, join)
+        results, series_files = run_plan(net, session.procs, plan, out_dir, interval=SERIES_INTERVAL)
+    write_flows_csv(results, os.path.join(out_dir, 'flows.csv'))
+    write_series_csv(series_files, os.path.join(out_dir, 'flow_series.csv'), SERIES_INTERVAL)
+
+    bw = session.topo.linkInfo('r1', 'r2')['bw']
+    time, flows = series_matrix(series_files, mix)
+    stats = competition_stats(time, flows, join, tolerance, window)
+    incumbent = flow_name(0, mix[0])
+    total = sum(stats['mbps'].values())
+    row = {'mix': '+'.join(mix), 'incumbent': mix[0], 'newcomers': '+'.join(mix[1:]), 'mbps': total,
+           'utilization': total / bw, 'incumbent_share': stats['share'][incumbent],
+           'jain_mean': stats['jain_mean'], 'jain_min': stats['jain_min'],
+           'convergence_s': stats['convergence_s'], 'failed': int((results['status'] != OK).sum()),
+           'shares': ' '.join(f'{name}={share:.3f}' for name, share in stats['share'].items())}
+    write_metadata(out_dir,
+                   phases=[phase('incumbent_only', 0.0, join), phase('competing', join)],
+                   bottleneck_mbps=bw,
+                   aqm=session.topo.linkInfo('r1', 'r2').get('aqm') or 'tbf',
+                   throughput_file='flow_series.csv',
+                   cc={flow: cc for flow, cc in enumerate(mix)},
+                   competition=dict(stats, tolerance=tolerance, window=window))
+    return row
+
+def _mean(rows, field):
+    values = np.array([row[field] for row in rows], dtype=np.float64)
+    return np.nanmean(values) if np.isfinite(values).any() else np.nan
+
+def print_matrix(rows, algorithms, tolerance=CONVERGENCE_TOLERANCE):
+    """Incumbent share and convergence time of every ordered pair, averaged over trials."""
+    print(f"\nShare of the incumbent (row, from t=0) against the newcomer (column, from t={COMPETITOR_START}s), "
+          f"and time until both stay within ±{tolerance * 100:.0f}% of the fair share:")
+    print('%-12s' % 'incumbent' + ''.join('%18s' % algorithm for algorithm in algorithms))
+    for incumbent in algorithms:
+        cells = []
+        for newcomer in algorithms:
+            runs = [row for row in rows if row['mix'] == f'{incumbent}+{newcomer}']
+            if not runs:
+                cells.append('%18s' % '')
+                continue
+            share, convergence = _mean(runs, 'incumbent_share'), _mean(runs, 'convergence_s')
+            cells.append('%18s' % (f'{share * 100:.0f}% ' + (f'{convergence:.1f}s' if np.isfinite(convergence)
+                                                              else 'no conv.')))
+        print('%-12s' % incumbent + ''.join(cells))
+
+def print_mixes(rows):
+    print(f"\n{'mix':<28} {'Mbps':>7} {'Jain mean':>10} {'Jain min':>9} {'conv. (s)':>10}  shares")
+    for mix in dict.fromkeys(row['mix'] for row in rows):
+        runs = [row for row in rows if row['mix'] == mix]
+        print(f"{mix:<28} {_mean(runs, 'mbps'):>7.2f} {_mean(runs, 'jain_mean'):>10.3f} "
+              f"{_mean(runs, 'jain_min'):>9.3f} {_mean(runs, 'convergence_s'):>10.1f}  {runs[-1]['shares']}")
+
+def write_results(rows, path):
+    with open(path, 'w', newline='') as f:
+        writer = csv.DictWriter(f, RESULT_FIELDS)
+        writer.writeheader()
+        writer.writerows(rows)
+
+def parse_args(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(description='Competition matrix of TCP congestion control algorithms')
+    parser.add_argument('--cc', nargs='+', default=['cubic', 'bbr', 'reno', 'vegas'], metavar='ALGO',
+                        help='algorithms whose ordered pairs are run')
+    parser.add_argument('--mix', action='append', default=[], metavar='ALGO,ALGO,...',
+                        help='also run this N-way mix (the first from t=0, the others joining); repeatable')
+    parser.add_argument('--no-pairs', action='store_true', help='run only the --mix combinations')
+    parser.add_argument('--duration', type=float, default=30, help='seconds of the incumbent flow')
+    parser.add_argument('--bottleneck', type=int, default=10, help='bottleneck bandwidth (Mbps)')
+    parser.add_argument('--aqm', default='tbf', metavar='SPEC', help='bottleneck queue discipline')
+    parser.add_argument('--tcp', default='cubic', help="hosts' default congestion control")
+    parser.add_argument('--tolerance', type=float, default=CONVERGENCE_TOLERANCE,
+                        help='convergence band around the fair share (fraction of it)')
+    parser.add_argument('--window', type=float, default=JAIN_WINDOW,
+                        help="window of the sliding Jain's index and of the shares (seconds)")
+    parser.add_argument('--trials', type=int, default=1, help='runs of every combination')
+    parser.add_argument('--out', default='./cc_matrix', help='results directory')
+    return parser.parse_args(argv)
+
+def main():
+    args = parse_args()
+    mixes = [] if args.no_pairs else [list(pair) for pair in itertools.product(args.cc, repeat=2)]
+    mixes += [[cc.strip() for cc in mix.split(',')] for mix in args.mix]
+    if not mixes:
+        sys.exit("Nothing to run: --no-pairs needs at least one --mix")
+    check_cc([cc for mix in mixes for cc in mix] + [args.tcp])
+
+    pairs = max(len(mix) for mix in mixes)
+    session = ExperimentSession(DumbbellTopo(pairs, bw_bottleneck=args.bottleneck, bottleneck=aqm_params(args.aqm)),
+                                profile=tcp_profile(args.tcp), host=Host, mininet=BatchMininet)
+    net = session.start()
+    rows = []
+    try:
+        for (src, dst), ok in check_connectivity(net, pair_checks(pairs)).items():
+            if not ok:
+                print(f"WARNING: {src} cannot reach {dst}")
+        for mix in mixes:
+            for trial in range(args.trials):
+                print(f"\n*** {' vs '.join(mix)}, trial {trial + 1}/{args.trials}")
+                out_dir = os.path.join(args.out, f"{'+'.join(mix)}_{trial + 1:03d}")
+                row = run_mix(session, mix, args.duration, out_dir, tolerance=args.tolerance, window=args.window)
+                rows.append(dict(row, trial=trial + 1))
+    finally:
+        session.stop()
+
+    os.makedirs(args.out, exist_ok=True)
+    results = os.path.join(args.out, 'cc_matrix.csv')
+    write_results(rows, results)
+    pair_rows = [row for row in rows if '+' not in row['newcomers']]
+    if not args.no_pairs:
+        print_matrix(pair_rows, args.cc, args.tolerance)
+    print_mixes(rows)
+    print(f"\nResults saved to {results}")
+
+if __name__ == '__main__':
+    if os.geteuid() != 0:
+        print("This script must be run as root.")
+        print("Please run with: sudo python %s" % sys.argv[0])
+        sys.exit(1)
+    setLogLevel('warning')
+    main()
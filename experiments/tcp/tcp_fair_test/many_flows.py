@@ -0,0 +1,189 @@
+#!/usr/bin/env python
+
+import os
+import sys
+import time
+
+import numpy as np
+
+# Shared experiment helpers live in experiments/common
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'common'))
+
+from host_tuning import check_cc
+from netconf import check_connectivity
+from flowgen import make_flows, start_sink, start_flows, load_results, load_series, OK
+from metrics_sink import export_csv
+from report_engine import jain_index
+from run_metadata import write_metadata, phase
+
+# Interval of the sinks' per-flow received bytes series (seconds)
+SERIES_INTERVAL = 0.5
+
+# Time between starting the flowgen processes and the first flow (seconds)
+START_LEAD = 1.0
+
+def flow_plan(pairs, flows, stagger, cc=None, **targets):
+    """{pair: flow specs}: `flows` spread round-robin over the pairs, one new flow every `stagger` seconds.
+
+    `cc` lists congestion control algorithms given to the flows round-robin.
+    """
+    plan = {}
+    for flow in range(flows):
+        i = flow % pairs + 1
+        spec = make_flows(1, f'server{i}', first_id=flow, start=flow * stagger,
+                          cc=cc[flow % len(cc)] if cc else None, **targets)
+        plan.setdefault(i, []).extend(spec)
+    return plan
+
+def flow_cc(plan):
+    """{flow id: congestion control algorithm} of the flows of a plan that set one."""
+    return {spec['id']: spec['cc'] for specs in plan.values() for spec in specs if spec.get('cc')}
+
+def write_series_csv(series_files, path, interval=SERIES_INTERVAL):
+    """Per-flow goodput series of the sinks in pcap_analyzer's long format (Flow,Time,Throughput_Mbps)."""
+    series = load_series(*series_files)
+    with open(path, 'w') as f:
+        f.write('Flow,Time,Throughput_Mbps\n')
+        for flow, (times, mbps) in sorted(series.items()):
+            # Samples of different sinks land on the same grid
+            for t, value in zip(np.round(times / interval) * interval, mbps):
+                f.write(f'{flow},{t:.3f},{value:.6f}\n')
+
+def print_results(results, cc=None):
+    ok = results['status'] == OK
+    print(f"{ok.sum()}/{len(results)} flows completed, {len(results) - ok.sum()} failed or timed out")
+    if not ok.any():
+        return
+    goodput, fct = results['goodput_mbps'][ok], results['fct'][ok]
+    print(f"goodput: mean {goodput.mean():.3f} Mbps, min {goodput.min():.3f}, max {goodput.max():.3f}, "
+          f"Jain's index {float(jain_index(goodput)):.3f}")
+    print(f"FCT: median {np.median(fct):.2f} s, p99 {np.percentile(fct, 99):.2f} s")
+    if cc:
+        # Share of the total goodput taken by the flows of each algorithm
+        algorithms = np.array([cc.get(int(flow), 'default') for flow in results['flow'][ok]])
+        for algorithm in sorted(set(algorithms)):
+            mine = goodput[algorithms == algorithm]
+            print(f"  {algorithm}: {len(mine)} flows, mean {mine.mean():.3f} Mbps, "
+                  f"{mine.sum() / goodput.sum() * 100:.1f}% of the goodput")
+
+def run_plan(net, procs, plan, out_dir='.', t0=None, timeout=30.0, interval=SERIES_INTERVAL):
+    """Run the flows of a plan ({pair: flow specs}), each client's from one flowgen process.
+
+    Every server of the plan runs a flowgen sink sampling per-flow received
+    bytes every `interval` seconds. Flow starts are relative to `t0`
+    (CLOCK_MONOTONIC, default START_LEAD seconds from now). Returns the
+    per-flow results and the sinks' series files.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    for specs in plan.values():
+        for spec in specs:
+            spec['dst'] = net.get(spec['dst']).IP()
+
+    # Sinks and clients share one CLOCK_MONOTONIC t0; flowgen schedules the flow starts itself
+    if t0 is None:
+        t0 = time.monotonic() + START_LEAD
+    series_files, results_files, clients = [], [], []
+    try:
+        for i in plan:
+            series_files.append(os.path.join(out_dir, f'server{i}_series.bin'))
+            start_sink(procs, net.get(f'server{i}'), series_file=series_files[-1],
+                       interval=interval, t0=t0)
+        for i, specs in plan.items():
+            results_files.append(os.path.join(out_dir, f'client{i}_flows.bin'))
+            clients.append(start_flows(procs, net.get(f'client{i}'), specs, results_files[-1],
+                                       t0=t0, timeout=timeout))
+        # Not procs.wait(name='flowgen'): the sinks share the name and never exit on their own
+        for proc in clients:
+            proc.popen.wait()
+    finally:
+        procs.stop(name='flowgen')
+    return load_results(*results_files), series_files
+
+def write_flows_csv(results, path):
+    export_csv(path, results,
+               ['flow', 'start_us', 'connect_us', 'end_us', 'sent', 'received', 'status', 'fct', 'goodput_mbps'],
+               fmt=['%d'] * 7 + ['%.6f', '%.6f'])
+
+def run_many_flows(net, procs, pairs, flows, duration=30, stagger=0.01, size=None, rate=None,
+                   timeout=30.0, out_dir='.', t0=None, cc=None):
+    """`flows` bulk flows over the dumbbell; each client drives its flows from one flowgen process.
+
+    Flows send for `duration` seconds, or until `size` bytes if that comes
+    first, at most at `rate` bit/s. The first starts at `t0` (CLOCK_MONOTONIC,
+    default START_LEAD seconds from now). `cc` lists congestion control
+    algorithms given to the flows round-robin. Returns the per-flow results
+    (flowgen.load_results()).
+    """
+    bw_bottleneck = net.topo.linkInfo('r1', 'r2')['bw']
+    plan = flow_plan(pairs, flows, stagger, cc=cc, size=size, duration=duration, rate=rate)
+    print(f"{flows} flows over {len(plan)} pairs, {bw_bottleneck} Mbps bottleneck, "
+          f"one new flow every {stagger * 1000:.0f} ms" + (f", {'/'.join(cc)} round-robin" if cc else ''))
+
+    results, series_files = run_plan(net, procs, plan, out_dir, t0, timeout)
+    print_results(results, flow_cc(plan))
+    write_flows_csv(results, os.path.join(out_dir, 'flows.csv'))
+    write_series_csv(series_files, os.path.join(out_dir, 'flow_series.csv'))
+
+    # All flows compete once the last one has started
+    last_start = (flows - 1) * stagger
+    write_metadata(out_dir,
+                   phases=[phase('ramp_up', 0.0, last_start), phase('all_flows', last_start)],
+                   bottleneck_mbps=bw_bottleneck,
+                   aqm=net.topo.linkInfo('r1', 'r2').get('aqm') or 'tbf',
+                   throughput_file='flow_series.csv',
+                   flows=flows, pairs=pairs, stagger=stagger, size=size, rate=rate,
+                   cc=cc)
+    return results
+
+def parse_args(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(description='Many-flow TCP fairness test over a dumbbell bottleneck')
+    parser.add_argument('--flows', type=int, default=100, help='number of competing flows')
+    parser.add_argument('--pairs', type=int, default=2, help='client/server pairs the flows are spread over')
+    parser.add_argument('--duration', type=float, default=30, help='seconds each flow sends')
+    parser.add_argument('--size', type=int, help='bytes per flow (ends a flow before --duration)')
+    parser.add_argument('--rate', type=float, help='per-flow rate cap (Mbps)')
+    parser.add_argument('--stagger', type=float, default=0.01, help='seconds between flow starts')
+    parser.add_argument('--bottleneck', type=int, default=10, help='bottleneck bandwidth (Mbps)')
+    parser.add_argument('--queue', type=int, help='bottleneck max_queue_size (packets)')
+    parser.add_argument('--aqm', default='tbf', metavar='SPEC',
+                        help='bottleneck queue discipline (tbf, fq_codel, cake, pie, red[:tc options])')
+    parser.add_argument('--tcp', default='cubic', help='congestion control algorithm')
+    parser.add_argument('--cc', nargs='+', metavar='ALGO',
+                        help='congestion control algorithms given to the flows round-robin (default: --tcp)')
+    parser.add_argument('--trials', type=int, default=1, help='trials on the same network')
+    return parser.parse_args(argv)
+
+def main():
+    # Only the network needs Mininet; the flow helpers above also run without it
+    from mininet.node import Host
+    from mininet.log import setLogLevel
+    from tcp_fair_test import tcp_profile
+    from session import ExperimentSession
+    from bringup import BatchMininet
+    from dumbbell import DumbbellTopo, pair_checks
+    from aqm import aqm_params
+
+    setLogLevel('warning')
+    args = parse_args()
+    check_cc((args.cc or []) + [args.tcp])
+    bottleneck = aqm_params(args.aqm)
+    if args.queue:
+        bottleneck['max_queue_size'] = args.queue
+    session = ExperimentSession(DumbbellTopo(args.pairs, bw_bottleneck=args.bottleneck, bottleneck=bottleneck),
+                                profile=tcp_profile(args.tcp), host=Host, mininet=BatchMininet)
+    net = session.start()
+    try:
+        for (src, dst), ok in check_connectivity(net, pair_checks(args.pairs)).items():
+            if not ok:
+                print(f"WARNING: {src} cannot reach {dst}")
+        for trial in range(args.trials):
+            out_dir = '.' if args.trials == 1 else f'trial_{trial + 1:03d}'
+            with session.trial():
+                run_many_flows(net, session.procs, args.pairs, args.flows, args.duration, args.stagger,
+                               args.size, args.rate * 1e6 if args.rate else None, out_dir=out_dir, cc=args.cc)
+    finally:
+        session.stop()
+
+if __name__ == '__main__':
+    main()
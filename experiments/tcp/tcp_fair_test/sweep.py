@@ -0,0 +1,197 @@
+#!/usr/bin/env python
+
+import hashlib
+import itertools
+import json
+import os
+import random
+import sqlite3
+import sys
+
+from mininet.node import Host
+from mininet.log import setLogLevel
+
+# Shared experiment helpers live in experiments/common
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'common'))
+
+from tcp_fair_test import DumbbellTopo, check_connections, run_experiment, tcp_profile
+from session import ExperimentSession
+from bringup import BatchMininet
+from aqm import aqm_params, parse_aqm
+from report_engine import load_run, phase_stats
+
+# Swept parameters and the values used when a dimension is not given
+DEFAULTS = {
+    'bottleneck': 10,     # Mbps
+    'delay': 10,          # ms, bottleneck one-way delay
+    'queue': 17,          # packets, bottleneck max_queue_size (tbf without a limit only)
+    'aqm': 'tbf',         # bottleneck queue discipline, see aqm.parse_aqm()
+    'cc': 'cubic',
+    'flows': 1,           # parallel streams per client
+    'duration': 30,       # seconds
+}
+
+RESULT_FILE = 'result.json'
+INDEX_FILE = 'index.sqlite'
+
+def _point(values):
+    # 10.0 and 10 must hash to the same run
+    point = dict(DEFAULTS, **values)
+    # Only tbf's FIFO has the queue size; other disciplines (and a tbf limit)
+    # would give runs that differ in name only
+    kind, options = parse_aqm(point['aqm'])
+    if kind != 'tbf' or 'limit' in options:
+        del point['queue']
+    return {name: int(value) if isinstance(value, float) and value.is_integer() else value
+            for name, value in point.items()}
+
+def grid(space):
+    """Full factorial design over {parameter: [values]}."""
+    names = sorted(space)
+    for values in itertools.product(*(space[name] for name in names)):
+        yield _point(dict(zip(names, values)))
+
+def random_design(space, count, seed=0):
+    """`count` random points; a (low, high) tuple is sampled uniformly, a list by choice."""
+    rng = random.Random(seed)
+    for _ in range(count):
+        point = {}
+        for name, values in sorted(space.items()):
+            if isinstance(values, tuple):
+                low, high = values
+                point[name] = rng.randint(low, high) if isinstance(low, int) else rng.uniform(low, high)
+            else:
+                point[name] = rng.choice(values)
+        yield _point(point)
+
+def config_hash(config):
+    """Content hash identifying one run (configuration plus trial number)."""
+    return hashlib.sha256(json.dumps(config, sort_keys=True).encode()).hexdigest()[:16]
+
+def pending_runs(points, trials, results_dir):
+    runs, seen = [], set()
+    for point in points:
+        for trial in range(trials):
+            config = dict(point, trial=trial)
+            key = config_hash(config)
+            # Points that differ only in a dimension their AQM ignores are one run
+            if key in seen:
+                continue
+            seen.add(key)
+            if not os.path.exists(os.path.join(results_dir, key, RESULT_FILE)):
+                runs.append((key, config))
+    return runs
+
+def apply_config(session, config):
+    params = aqm_params(config['aqm'])
+    params.update(bw=config['bottleneck'], delay=f"{config['delay']}ms")
+    if 'queue' in config:
+        params['max_queue_size'] = config['queue']
+    session.configure_link('r1', 'r2', **params)
+    session.set_profile(tcp_profile(config['cc']))
+
+def run_sweep(points, trials, results_dir):
+    points = list(points)
+    runs = pending_runs(points, trials, results_dir)
+    print(f"Sweep: {len(points)} points x {trials} trials, {len(runs)} runs missing")
+
+    if runs:
+        session = ExperimentSession(DumbbellTopo(bw_bottleneck=runs[0][1]['bottleneck']),
+                                    profile=tcp_profile(runs[0][1]['cc']), host=Host,
+                                    mininet=BatchMininet)
+        net = session.start()
+        try:
+            check_connections(net)
+            for i, (key, config) in enumerate(runs, 1):
+                print(f"\n[{i}/{len(runs)}] {key}: {config}")
+                out_dir = os.path.join(results_dir, key)
+                apply_config(session, config)
+                with session.trial():
+                    run_experiment(net, config['duration'], out_dir, config['flows'], session.procs)
+
+                # Write the result last, so an interrupted run is redone
+                stats = phase_stats(load_run(out_dir))
+                result = {'config': config,
+                          'metrics': [[phase, metric, value] for (phase, metric), value in stats.items()]}
+                tmp = os.path.join(out_dir, RESULT_FILE + '.tmp')
+                with open(tmp, 'w') as f:
+                    json.dump(result, f, indent=2)
+                os.replace(tmp, os.path.join(out_dir, RESULT_FILE))
+        finally:
+            session.stop()
+
+    return build_index(results_dir)
+
+def build_index(results_dir):
+    """Collect every result.json under `results_dir` into one SQLite table set."""
+    path = os.path.join(results_dir, INDEX_FILE)
+    db = sqlite3.connect(path)
+    db.executescript("""
+        DROP TABLE IF EXISTS runs;
+        DROP TABLE IF EXISTS metrics;
+        CREATE TABLE runs (hash TEXT PRIMARY KEY, bottleneck REAL, delay REAL, queue INTEGER,
+                           aqm TEXT, cc TEXT, flows INTEGER, duration INTEGER, trial INTEGER);
+        CREATE TABLE metrics (hash TEXT, phase TEXT, metric TEXT, value REAL);
+    """)
+    columns = ('bottleneck', 'delay', 'queue', 'aqm', 'cc', 'flows', 'duration', 'trial')
+    for key in sorted(os.listdir(results_dir)):
+        result_file = os.path.join(results_dir, key, RESULT_FILE)
+        if not os.path.exists(result_file):
+            continue
+        with open(result_file) as f:
+            result = json.load(f)
+        config = result['config']
+        config.setdefault('aqm', DEFAULTS['aqm'])
+        db.execute('INSERT INTO runs VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                   (key,) + tuple(config.get(c) for c in columns))
+        db.executemany('INSERT INTO metrics VALUES (?, ?, ?, ?)',
+                       [(key, phase, metric, value) for phase, metric, value in result['metrics']])
+    db.executescript("""
+        CREATE INDEX runs_params ON runs (cc, aqm, bottleneck, delay, queue, flows);
+        CREATE INDEX metrics_lookup ON metrics (phase, metric, hash);
+        CREATE VIEW IF NOT EXISTS results AS
+            SELECT runs.*, metrics.phase, metrics.metric, metrics.value
+            FROM runs JOIN metrics USING (hash);
+    """)
+    db.commit()
+    count = db.execute('SELECT COUNT(*) FROM runs').fetchone()[0]
+    db.close()
+    print(f"Indexed {count} runs in {path}")
+    return path
+
+def parse_args(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(description='Parameter sweep over the TCP fairness test')
+    parser.add_argument('--bottleneck', type=float, nargs='+', help='bottleneck bandwidths (Mbps)')
+    parser.add_argument('--delay', type=float, nargs='+', help='bottleneck delays (ms)')
+    parser.add_argument('--queue', type=int, nargs='+', help='bottleneck queue sizes (packets)')
+    parser.add_argument('--aqm', nargs='+', help='bottleneck queue disciplines, e.g. tbf fq_codel cake:rtt=20ms')
+    parser.add_argument('--cc', nargs='+', help='congestion control algorithms')
+    parser.add_argument('--flows', type=int, nargs='+', help='parallel streams per client')
+    parser.add_argument('--duration', type=int, default=DEFAULTS['duration'], help='seconds per run')
+    parser.add_argument('--trials', type=int, default=1, help='repetitions of every point')
+    parser.add_argument('--random', type=int, metavar='N',
+                        help='sample N random points (two-value numeric ranges are treated as low/high)')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--results', default='./sweep_results', help='results directory')
+    return parser.parse_args(argv)
+
+def main():
+    args = parse_args()
+    space = {name: values for name in ('bottleneck', 'delay', 'queue', 'aqm', 'cc', 'flows')
+             for values in [getattr(args, name)] if values}
+    space['duration'] = [args.duration]
+
+    if args.random:
+        space = {name: tuple(values) if len(values) == 2 and not isinstance(values[0], str) else values
+                 for name, values in space.items()}
+        points = random_design(space, args.random, args.seed)
+    else:
+        points = grid(space)
+
+    os.makedirs(args.results, exist_ok=True)
+    run_sweep(points, args.trials, args.results)
+
+if __name__ == '__main__':
+    setLogLevel('info')
+    main()
@@ -1,79 +1,77 @@
 #!/usr/bin/env python
 
-from mininet.topo import Topo
-from mininet.net import Mininet
 from mininet.node import Host
-from mininet.link import TCLink
 from mininet.util import dumpNodeConnections
 from mininet.log import setLogLevel
-from mininet.cli import CLI
 
-import time
 import os
-import subprocess
-from subprocess import Popen, PIPE
-import shlex
-
-class DumbbellTopo(Topo):
-    """Dumbbell topology with two clients, two routers, and two servers."""
-    
-    def build(self, bw_bottleneck=10):
-        client1 = self.addHost('client1')
-        client2 = self.addHost('client2')
-        server1 = self.addHost('server1')
-        server2 = self.addHost('server2')
-        router1 = self.addSwitch('r1')
-        router2 = self.addSwitch('r2')
-        
-        # Edge links: 100Mbps
-        self.addLink(client1, router1, bw=100, delay='5ms')
-        self.addLink(client2, router1, bw=100, delay='5ms')
-        
-        # Bottleneck link
-        self.addLink(router1, router2, bw=bw_bottleneck, delay='10ms',
-                    jitter='1ms', max_queue_size=17, use_tbf=True)
-        
-        self.addLink(router2, server1, bw=100, delay='5ms')
-        self.addLink(router2, server2, bw=100, delay='5ms')
-
-def start_tcpdump(net, output_file="./combined_traffic.pcap"):
+import sys
+import numpy as np
+
+# Shared experiment helpers live in experiments/common
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'common'))
+
+from host_tuning import make_profile, check_cc
+from session import ExperimentSession
+from pcap_analyzer import analyze, print_summary, write_series_csv
+from run_metadata import write_metadata, phase
+from report_engine import load_run, group_flows, competition_stats
+from timeline import Timeline
+from launcher import start_server
+from capture import Capture
+import owd
+import rtt_probe
+import link_trace
+from link_trace import LinkTrace
+from supervisor import ProcessSupervisor
+from telemetry import TelemetrySampler, INFO_COLUMNS, write_qdisc_csv, write_socket_csv
+from iperf_stream import Iperf3Client, IperfError, write_intervals_csv
+from dumbbell import DumbbellTopo, pair_checks
+from netconf import check_connectivity
+from aqm import aqm_params
+from bringup import BatchMininet
+
+# Flows below this size (iperf3 control connections) are left out of the analysis
+BULK_FLOW_BYTES = 1000000
+
+# Start of the competing flow relative to the target flow (seconds)
+COMPETITOR_START = 5
+
+# Sampling interval of the qdisc and socket telemetry (seconds)
+TELEMETRY_INTERVAL = 0.05
+
+# Convergence: shares within ±10% of the fair share, over 1-second windows
+CONVERGENCE_TOLERANCE = 0.1
+JAIN_WINDOW = 1.0
+
+# Interval of the UDP RTT probes alongside each pair's flow (seconds)
+PROBE_INTERVAL = 0.01
+
+def start_tcpdump(net, procs, prefix="./combined_traffic"):
+    """Header-only capture of the bottleneck in gzipped 100 MB segments."""
     print("Starting packet capture...")
     r1 = net.get('r1')
     iface = r1.connectionsTo(net.get('r2'))[0][0].name
     
-    cmd = f"tcpdump -i {iface} -s 65535 -w {output_file}"
-    process = r1.popen(shlex.split(cmd))
-    return process
+    return Capture(procs, r1, iface, prefix, segment_mb=100, name='bottleneck').start()
 
 def check_connections(net):
     print("Testing network connectivity...")
     
-    client1, server1 = net.get('client1', 'server1')
-    result = client1.cmd(f'ping -c 2 -q {server1.IP()}')
-    print(f"client1 → server1: {'Success' if ' 0% packet loss' in result else 'Failed'}")
-    
-    client2, server2 = net.get('client2', 'server2')
-    result = client2.cmd(f'ping -c 2 -q {server2.IP()}')
-    print(f"client2 → server2: {'Success' if ' 0% packet loss' in result else 'Failed'}")
-
-def setup_tcp_congestion(net, algorithm='cubic'):
-    print(f"Setting TCP congestion control algorithm to {algorithm}...")
-    for host in net.hosts:
-        host.cmd(f'sysctl -w net.ipv4.tcp_congestion_control={algorithm}')
-
-def configure_tcp_params(net):
-    print("Configuring TCP parameters for better fairness...")
-    for host in net.hosts:
-        # TCP optimization
-        host.cmd('sysctl -w net.ipv4.tcp_rmem="4096 87380 16777216"')
-        host.cmd('sysctl -w net.ipv4.tcp_wmem="4096 16384 16777216"')
-        host.cmd('sysctl -w net.ipv4.tcp_no_metrics_save=1')
-        host.cmd('sysctl -w net.ipv4.tcp_slow_start_after_idle=0')
-        host.cmd('sysctl -w net.ipv4.tcp_initial_cwnd=10')
-        host.cmd('sysctl -w net.ipv4.tcp_ecn=1')
-        host.cmd('sysctl -w net.ipv4.tcp_adv_win_scale=1')
-        host.cmd('sysctl -w net.ipv4.tcp_app_win=31')
-        host.cmd('sysctl -w net.ipv4.tcp_moderate_rcvbuf=1')
+    for i, ((src, _), rtt) in enumerate(check_connectivity(net, pair_checks(2), count=2).items(), 1):
+        print(f"{src} → server{i}: {f'Success (RTT {rtt * 1000:.1f} ms)' if rtt else 'Failed'}")
+
+def print_competition(stats):
+    for name, share in stats['share'].items():
+        print(f"  {name}: {stats['mbps'][name]:.2f} Mbps, {share * 100:.1f}% share")
+    convergence = stats['convergence_s']
+    print(f"  Jain's index ({JAIN_WINDOW:.0f} s windows): mean {stats['jain_mean']:.3f}, min {stats['jain_min']:.3f}; "
+          + (f"converged to ±{CONVERGENCE_TOLERANCE * 100:.0f}% of the fair share after {convergence:.1f} s"
+             if np.isfinite(convergence) else "did not converge"))
+
+def tcp_profile(algorithm='cubic'):
+    """sysctl profile applied to every host (and reapplied between trials)."""
+    return make_profile('fairness', net__ipv4__tcp_congestion_control=algorithm)
 
 def display_tc_config(net):
     r1, r2 = net.get('r1', 'r2')
@@ -86,115 +84,274 @@ def display_tc_config(net):
     iface = r2.connectionsTo(r1)[0][0].name
     print(r2.cmd(f'tc -d qdisc show dev {iface}'))
 
-def run_experiment(net, duration=30):
+def start_owd_captures(net, procs, out_dir):
+    """Captures for the one-way delay of the data direction (server -> r2 -> r1 -> client).
+
+    Packets are seen entering r2 from the servers and arriving at r1 from
+    the bottleneck, so the delay covers r2's bottleneck queue and the link.
+    """
+    r1, r2 = net.get('r1', 'r2')
+    servers = [host for host in net.hosts if host.name.startswith('server')]
+    upstream = [(r2, r2.connectionsTo(server)[0][0].name) for server in servers]
+    return owd.start_captures(procs, upstream, (r1, r1.connectionsTo(r2)[0][0].name), out_dir)
+
+def run_experiment(net, duration=30, out_dir='.', streams=1, procs=None, measure_owd=False, trace=None,
+                   probe_interval=PROBE_INTERVAL, cc=(None, None)):
+    """One fairness run; background processes are started and stopped through `procs`.
+
+    With `measure_owd` the data packets are also captured on both sides of
+    the bottleneck and their one-way delay and queue sojourn are written to
+    owd.bin, owd_flows.csv and owd_series.csv. `trace` (link_trace.load_trace())
+    is replayed on the r1-r2 bottleneck from t0 and the applied values are
+    written to link_trace.csv. Every client probes its server's RTT every
+    `probe_interval` seconds (0 disables the probes); the series go to
+    rtt_series.csv. `cc` is the congestion control algorithm of the target
+    and of the competing flow (iperf3 -C; None: the hosts' default).
+    """
+    if procs is None:
+        procs = ProcessSupervisor()
+    os.makedirs(out_dir, exist_ok=True)
+    pcap_prefix = os.path.join(out_dir, 'combined_traffic')
+    flows_file = os.path.join(out_dir, 'combined_traffic_flows.csv')
+    qdisc_file = os.path.join(out_dir, 'qdisc.bin')
+    socket_file = os.path.join(out_dir, 'sockets.bin')
+    
     print("=" * 50)
     print(f"Experiment: Target traffic + Normal traffic ({duration} seconds)")
     bw_bottleneck = net.topo.linkInfo('r1', 'r2')['bw']
     print(f"Experiment configuration: Bottleneck bandwidth = {bw_bottleneck}Mbps")
     print("=" * 50)
     
+    # The bottleneck starts at the trace's first values; the clients may use its peak rate
+    bottleneck_trace = None
+    rate = bw_bottleneck
+    if trace is not None:
+        bottleneck_trace = LinkTrace(net, procs, os.path.join(out_dir, 'link_trace.bin'))
+        bottleneck_trace.add('r1', 'r2', trace).prepare()
+        if 'bw' in trace[1]:
+            rate = max(rate, float(np.nanmax(trace[1]['bw'])))
+    
     # Packet capture
-    tcpdump_process = start_tcpdump(net)
+    capture = start_tcpdump(net, procs, pcap_prefix)
+    if measure_owd:
+        owd_captures = start_owd_captures(net, procs, out_dir)
     
     client1, client2 = net.get('client1', 'client2')
     server1, server2 = net.get('server1', 'server2')
+    r1, r2 = net.get('r1', 'r2')
+    r1_iface, r2_iface = r1.connectionsTo(r2)[0]
     
     display_tc_config(net)
     
+    # Bottleneck queues in both directions (data flows server -> r2 -> r1 with -R)
+    # and the sockets of all four hosts, sampled over netlink
+    telemetry = TelemetrySampler(net, TELEMETRY_INTERVAL,
+                                 qdisc_intfs=[r1_iface.name, r2_iface.name],
+                                 socket_nodes=['client1', 'client2', 'server1', 'server2'],
+                                 qdisc_file=qdisc_file, socket_file=socket_file)
+    
     # Start servers
     print("Starting servers...")
-    server1.cmd('iperf3 -s -p 5001 &')
-    server2.cmd('iperf3 -s -p 5001 &')
-    time.sleep(2)
+    start_server(server1, 'iperf3 -s -p 5001', 5001, supervisor=procs)
+    start_server(server2, 'iperf3 -s -p 5001', 5001, supervisor=procs)
+    probe_files = {}
+    if probe_interval:
+        for client, server in ((client1, server1), (client2, server2)):
+            rtt_probe.start_echo(procs, server)
+            probe_files[f'{client.name}-{server.name}'] = os.path.join(out_dir, f'rtt_{client.name}.bin')
     
-    configure_tcp_params(net)
+    # iperf3 clients; their per-interval JSON records are ingested while they run.
+    # The servers send (-R), with the algorithm the client asks for (-C)
+    default_cc = server1.cmd('sysctl -n net.ipv4.tcp_congestion_control').strip()
+    target_cc, competitor_cc = (algorithm or default_cc for algorithm in cc)
+    target = Iperf3Client(procs, client1, f'iperf3 -c {server1.IP()} -p 5001 -t {duration} -b {rate}M -P {streams} -R -Z -w 256K -C {target_cc}',
+                          log_file=os.path.join(out_dir, 'target_iperf3.json'), name='target')
+    competitor = Iperf3Client(procs, client2, f'iperf3 -c {server2.IP()} -p 5001 -t {duration - COMPETITOR_START} -b {rate}M -P {streams} -R -Z -w 256K -C {competitor_cc}',
+                              log_file=os.path.join(out_dir, 'competitor_iperf3.json'), name='competitor')
     
-    # Target traffic (t=0s)
-    print("Starting target client (0 seconds)...")
-    client1.cmd(f'iperf3 -c {server1.IP()} -p 5001 -t {duration} -b {bw_bottleneck}M -R -Z -w 256K &')
+    def start_target():
+        print("Starting target client (0 seconds)...")
+        target.start()
     
-    # Check bandwidth
-    time.sleep(3)
-    r1 = net.get('r1')
-    iface = r1.connectionsTo(net.get('r2'))[0][0].name
-    print(r1.cmd(f'tc -s qdisc show dev {iface}'))
-    
-    # Competing traffic (t=5s)
-    print("Starting normal client in 5 seconds...")
-    time.sleep(2)
-    print("Starting normal client (5 seconds)...")
-    client2.cmd(f'iperf3 -c {server2.IP()} -p 5001 -t {duration-5} -b {bw_bottleneck}M -R -Z -w 256K &')
-    
-    # Monitor bandwidth
-    time.sleep(3)
-    print("Bandwidth usage after normal client starts:")
-    print(r1.cmd(f'tc -s qdisc show dev {iface}'))
-    
-    # Periodic monitoring
-    print("Monitoring bandwidth usage every 5 seconds...")
-    for i in range(1, duration//5):
-        time.sleep(5)
-        print(f"\nBandwidth usage at {5*i+8} seconds:")
-        print(r1.cmd(f'tc -s qdisc show dev {iface}'))
-        
-        print("\nTCP connection states:")
-        for host in [client1, client2, server1, server2]:
-            print(f"\n{host.name} TCP connections:")
-            print(host.cmd('ss -tni'))
-    
-    # Complete experiment
-    remaining_time = duration - (5 * (duration//5)) + 2
-    if remaining_time > 0:
-        time.sleep(remaining_time)
-    
-    # Cleanup
-    print("Stopping capture and cleaning up...")
-    tcpdump_process.terminate()
-    os.system("sudo killall -9 iperf3 > /dev/null 2>&1")
+    def start_probes():
+        # The probes share the timeline's t0 with the telemetry and the iperf3 intervals
+        for (client, server), probe_file in zip(((client1, server1), (client2, server2)), probe_files.values()):
+            rtt_probe.start_probe(procs, client, server.IP(), probe_file, probe_interval, t0=timeline.t0,
+                                  duration=duration)
+    
+    def start_competitor():
+        print(f"Starting normal client ({COMPETITOR_START} seconds)...")
+        competitor.start()
+    
+    def show_stats():
+        # Latest telemetry sample: bottleneck queues, then the data-sending sockets
+        print(f"\nt={timeline.now():.1f}s")
+        for client in (target, competitor):
+            if client.sum:
+                print(f"  {client.name}: {client.latest_mbps():.2f} Mbps (last iperf3 interval)")
+        columns, values = telemetry.qdisc_columns, telemetry.qdiscs
+        for column, value in zip(columns, values):
+            if column.endswith(('.backlog', '.drops')):
+                print(f"  {column} = {value}")
+        for host in (server1, server2):
+            for _, _, sport, _, dport, info in telemetry.sockets.get(host.name, []):
+                stats = dict(zip(INFO_COLUMNS, info))
+                if stats['bytes_acked'] >= BULK_FLOW_BYTES:
+                    print(f"  {host.name} :{sport}->:{dport} cwnd={stats['cwnd']} "
+                          f"rtt={stats['rtt_us'] / 1000:.1f}ms retrans={stats['total_retrans']} "
+                          f"delivery={stats['delivery_rate'] * 8 / 1e6:.2f}Mbps")
+    
+    # Target traffic at t=0s, competing traffic at t=5s, telemetry throughout, summaries every 5 seconds
+    timeline = Timeline()
+    timeline.at(0, 'start_telemetry', lambda: telemetry.start(t0=timeline.t0))
+    if bottleneck_trace:
+        timeline.at(0, 'start_trace', lambda: bottleneck_trace.start(t0=timeline.t0))
+    if probe_files:
+        timeline.at(0, 'start_rtt_probes', start_probes)
+    timeline.at(0, 'start_target', start_target)
+    timeline.at(3, 'show_stats', show_stats)
+    timeline.at(COMPETITOR_START, 'start_competitor', start_competitor)
+    timeline.every(COMPETITOR_START + 3, duration, 5, 'show_stats', show_stats)
+    timeline.at(duration + 2, 'stop', lambda: None)
+    try:
+        timeline.run()
+        for client in (target, competitor):
+            try:
+                summary = client.wait(timeout=5).summary()
+                print(f"{client.name}: {summary['mbps']:.2f} Mbps received, {summary['retransmits']} retransmits")
+            except IperfError as e:
+                print(f"ERROR: {e}")
+    finally:
+        # Cleanup: only the processes of this run, the capture after them so it sees everything,
+        # telemetry last since it raises if its sampler thread failed
+        print("Stopping capture and cleaning up...")
+        if bottleneck_trace:
+            bottleneck_trace.stop()
+        procs.stop(name='iperf3')
+        procs.stop(name='rtt_probe')
+        procs.stop(name='rtt_echo')
+        capture.stop()
+        if measure_owd:
+            for owd_capture in owd_captures[0] + [owd_captures[1]]:
+                owd_capture.stop()
+        telemetry.close()
     
     print("Experiment completed.")
-    print(f"\nCapture file is available at: ./combined_traffic.pcap")
-    print("\nWireshark data analysis command:")
-    print("wireshark ./combined_traffic.pcap")
-    print("\nWireshark filter examples:")
-    print(f"ip.addr=={server1.IP()}  # server1 (target) traffic")
-    print(f"ip.addr=={server2.IP()}  # server2 (normal) traffic")
+    segments = capture.segments()
+    print(f"\nCapture ({len(segments)} segments, {capture.disk_bytes() / 1e6:.1f} MB) is available at: {pcap_prefix}.pcap*")
+    
+    # Per-flow analysis of the capture
+    print("\nPer-flow analysis of the bottleneck capture:")
+    results = analyze(segments, min_bytes=BULK_FLOW_BYTES, t0=timeline.t0_wall)
+    print_summary(results)
+    write_series_csv(results, flows_file)
+    print(f"Per-flow throughput/in-flight/window series saved to {flows_file}")
+    print(f"server1 (target) traffic: {server1.IP()}, server2 (normal) traffic: {server2.IP()}")
+    
+    # iperf3 intervals, telemetry and flow series share the timeline's t0
+    write_intervals_csv([target, competitor], os.path.join(out_dir, 'iperf_intervals.csv'), timeline.t0)
+    write_qdisc_csv(qdisc_file, os.path.join(out_dir, 'qdisc_stats.csv'))
+    write_socket_csv(socket_file, os.path.join(out_dir, 'socket_stats.csv'))
+    print(f"Qdisc and socket telemetry ({telemetry.samples} samples every {TELEMETRY_INTERVAL * 1000:.0f} ms, "
+          f"{telemetry.missed} missed) saved to qdisc_stats.csv and socket_stats.csv")
+    
+    # Phase boundaries (actual dispatch times relative to t0) and capacity for report_engine
+    target_start = timeline.dispatched('start_target')
+    competitor_start = timeline.dispatched('start_competitor')
+    write_metadata(out_dir,
+                   phases=[phase('target_only', target_start, competitor_start),
+                           phase('competing', competitor_start)],
+                   bottleneck_mbps=bw_bottleneck,
+                   aqm=net.topo.linkInfo('r1', 'r2').get('aqm') or 'tbf',
+                   throughput_file='combined_traffic_flows.csv',
+                   cc={'target': target_cc, 'competitor': competitor_cc},
+                   timeline=timeline.metadata())
+    capture.record(out_dir)
+    
+    # Shares of the two senders (all their streams) once both compete, and how fast they got there
+    senders = {server1.IP(): 'target', server2.IP(): 'competitor'}
+    run = load_run(out_dir)
+    flows = group_flows(run.flows, lambda name: senders.get(name.split(':')[0]))
+    flows.pop(None, None)
+    if len(flows) == 2:
+        competition = competition_stats(run.time, flows, competitor_start, CONVERGENCE_TOLERANCE, JAIN_WINDOW)
+        print(f"\n{target_cc} (target) vs {competitor_cc} (competitor) from t={competitor_start:.1f}s:")
+        print_competition(competition)
+        write_metadata(out_dir, competition=dict(competition, tolerance=CONVERGENCE_TOLERANCE, window=JAIN_WINDOW))
+    if probe_files:
+        # Latency seen by each pair's probes alone and once the flows compete
+        print(f"\nRTT probes (every {probe_interval * 1000:.0f} ms, series saved to rtt_series.csv):")
+        phases = {'target_only': (target_start, competitor_start), 'competing': (competitor_start, None)}
+        summaries = {}
+        for name, probe_file in probe_files.items():
+            summaries[name] = {p: rtt_probe.probe_summary(probe_file, *bounds) for p, bounds in phases.items()}
+            for p, summary in summaries[name].items():
+                rtt_probe.print_summary(f'{name} ({p})', summary)
+        rtt_probe.write_series_csv(probe_files, os.path.join(out_dir, 'rtt_series.csv'))
+        write_metadata(out_dir, rtt_probe={'interval': probe_interval, 'file': 'rtt_series.csv',
+                                           'summary': summaries})
+    if bottleneck_trace:
+        trace_csv = bottleneck_trace.write_csv(os.path.join(out_dir, 'link_trace.csv'))
+        print("\nBottleneck trace (applied values saved to link_trace.csv):")
+        link_trace.print_summary(bottleneck_trace.summary())
+        meta = {'link_trace': bottleneck_trace.metadata(trace_csv)}
+        if 'bw' in trace[1]:
+            # report_engine takes the capacity at each sample from the applied trace
+            meta['capacity_trace'] = {'file': 'link_trace.csv', 'column': 'r1-r2.bw'}
+        write_metadata(out_dir, **meta)
+    
+    if measure_owd:
+        print("\nOne-way delay across the bottleneck (r2 ingress -> r1):")
+        owd.print_stats(*owd.measure(*owd_captures, out_dir, t0=timeline.t0_wall)[1:])
+
+def parse_args(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(description='TCP fairness test over a dumbbell bottleneck')
+    parser.add_argument('--duration', type=int, default=30, help='experiment duration (seconds)')
+    parser.add_argument('--bottleneck', type=int, default=10, help='bottleneck bandwidth (Mbps)')
+    parser.add_argument('--tcp', default='cubic', help='congestion control algorithm')
+    parser.add_argument('--streams', type=int, default=1, help='parallel TCP streams per client')
+    parser.add_argument('--trials', type=int, default=1, help='trials on the same network')
+    parser.add_argument('--owd', action='store_true',
+                        help='also capture both sides of the bottleneck and measure one-way queueing delay')
+    parser.add_argument('--aqm', default='tbf', metavar='SPEC',
+                        help='bottleneck queue discipline: tbf, fq_codel, cake, pie or red, with tc options '
+                             'after a colon, e.g. fq_codel:target=5ms,interval=100ms')
+    parser.add_argument('--cc', nargs='+', metavar='ALGO',
+                        help='congestion control of the target flow and, if given, of the competing flow '
+                             '(default: --tcp for both), e.g. --cc cubic bbr')
+    parser.add_argument('--probe-interval', type=float, default=PROBE_INTERVAL,
+                        help='seconds between UDP RTT probes of each client/server pair (0: no probes)')
+    parser.add_argument('--trace', metavar='FILE',
+                        help="bottleneck trace: 't,bw,delay,jitter,loss' CSV (Mbps, ms, %%) or 'time,Mbps' lines")
+    return parser.parse_args(argv)
 
 def main():
-    # Experiment parameters
-    duration = 30
-    bw_bottleneck = 10
-    tcp_algorithm = 'cubic'
-    
-    # Parse CLI arguments
-    import sys
-    i = 1
-    while i < len(sys.argv):
-        if sys.argv[i] == "--duration" and i+1 < len(sys.argv):
-            duration = int(sys.argv[i+1])
-            i += 2
-        elif sys.argv[i] == "--bottleneck" and i+1 < len(sys.argv):
-            bw_bottleneck = int(sys.argv[i+1])
-            i += 2
-        elif sys.argv[i] == "--tcp" and i+1 < len(sys.argv):
-            tcp_algorithm = sys.argv[i+1]
-            i += 2
-        else:
-            print(f"Unknown option: {sys.argv[i]}")
-            print(f"Usage: {sys.argv[0]} [--duration seconds] [--bottleneck bandwidth(Mbps)] [--tcp algorithm]")
-            sys.exit(1)
-    
-    # Setup and run
-    topo = DumbbellTopo(bw_bottleneck=bw_bottleneck)
-    net = Mininet(topo=topo, host=Host, link=TCLink)
-    net.start()
-    
-    dumpNodeConnections(net.hosts)
-    setup_tcp_congestion(net, tcp_algorithm)
-    check_connections(net)
-    run_experiment(net, duration)
-    
-    net.stop()
+    args = parse_args()
+    duration = args.duration
+    bw_bottleneck = args.bottleneck
+    tcp_algorithm = args.tcp
+    trials = args.trials
+    trace = link_trace.load_trace(args.trace) if args.trace else None
+    cc = tuple((args.cc or []) + [None, None])[:2]
+    check_cc(cc + (tcp_algorithm,))
+    
+    # Setup once, then run every trial on the same network
+    print(f"Configuring TCP parameters for better fairness ({tcp_algorithm})...")
+    session = ExperimentSession(DumbbellTopo(bw_bottleneck=bw_bottleneck, bottleneck=aqm_params(args.aqm)),
+                                profile=tcp_profile(tcp_algorithm), host=Host, mininet=BatchMininet)
+    net = session.start()
+    
+    try:
+        dumpNodeConnections(net.hosts)
+        check_connections(net)
+        for trial in range(trials):
+            out_dir = '.' if trials == 1 else f'trial_{trial + 1:03d}'
+            with session.trial():
+                run_experiment(net, duration, out_dir, args.streams, session.procs, args.owd, trace,
+                               args.probe_interval, cc)
+    finally:
+        session.stop()
 
 if __name__ == '__main__':
     setLogLevel('info')
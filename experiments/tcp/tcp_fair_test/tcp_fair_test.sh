@@ -3,13 +3,15 @@
 SCRIPT_DIR="$(pwd)"
 DURATION=30
 BOTTLENECK_BW=10
+NAMESPACES="client1 client2 router1 router2 server1 server2"
 
 cleanup() {
     echo "Cleaning up environment..."
-    sudo killall -9 python3 tcpdump iperf iperf3 2>/dev/null
-    
-    for ns in $(sudo ip netns list | cut -d' ' -f1); do
-        [ -n "$ns" ] && sudo ip netns delete $ns 2>/dev/null
+    # Only this script's namespaces: processes it left behind die with them,
+    # and other experiments on the machine are not touched
+    for ns in $NAMESPACES; do
+        sudo ip netns pids $ns 2>/dev/null | xargs -r sudo kill -9 2>/dev/null
+        sudo ip netns delete $ns 2>/dev/null
     done
     
     rm -f ./combined_traffic.pcap 2>/dev/null
@@ -20,7 +22,7 @@ cleanup() {
 setup_dumbbell_network() {
     echo "Building dumbbell network topology..."
     
-    for ns in client1 client2 router1 router2 server1 server2; do
+    for ns in $NAMESPACES; do
         sudo ip netns add $ns
     done
     
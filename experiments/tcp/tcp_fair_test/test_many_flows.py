@@ -0,0 +1,51 @@
+#!/usr/bin/env python
+
+import os
+import subprocess
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from many_flows import flow_plan, run_plan
+from flowgen import OK, load_series
+from metrics_sink import load
+from supervisor import ProcessSupervisor
+
+class LocalNode:
+    """Stand-in for a Mininet host: commands run on this machine, the node is reached over loopback."""
+
+    def __init__(self, name):
+        self.name = name
+        # wait_listening() reads the sockets of this namespace, which is the local one
+        self.pid = os.getpid()
+
+    def IP(self):
+        return '127.0.0.1'
+
+    def popen(self, args, **params):
+        # A session of its own, like mnexec -d, so the supervisor can signal the group
+        return subprocess.Popen(args, start_new_session=True, **params)
+
+class LocalNet:
+    def __init__(self):
+        self.nodes = {}
+
+    def get(self, *names):
+        nodes = [self.nodes.setdefault(name, LocalNode(name)) for name in names]
+        return nodes[0] if len(nodes) == 1 else nodes
+
+def test_run_plan(tmp_path):
+    procs = ProcessSupervisor()
+    plan = flow_plan(1, 3, stagger=0.1, duration=1.0, rate=20e6)
+    results, series_files = run_plan(LocalNet(), procs, plan, str(tmp_path), timeout=5.0, interval=0.1)
+
+    assert sorted(results['flow']) == [0, 1, 2]
+    assert (results['status'] == OK).all()
+    assert (results['received'] > 0).all()
+    assert sorted(load_series(*series_files)) == [0, 1, 2]
+    # Every flow's series ends on the bytes the sink confirmed to the client
+    series = load(series_files[0])
+    for flow, received in zip(results['flow'], results['received']):
+        assert series['bytes'][series['flow'] == flow][-1] == received
+    # Clients exited on their own and the sink was stopped
+    assert not procs.processes()